@@ -0,0 +1,61 @@
+"""
+Server calls spent on chats that send several messages in a row: one call
+per message (the previous ``handle_message``) versus ``ChatScheduler``'s one
+call in flight per chat with superseded messages merged or dropped.
+
+Each chat sends a burst of messages a fraction of a second apart, as users
+do when they split a question over several messages or repeat it while
+waiting; the simulated server takes ``--answer-seconds`` per call.
+
+Run from the ``bot`` directory: ``python -m bench.chat_scheduler``.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from services.chat_scheduler import ChatScheduler
+
+
+async def _run(chats: int, burst: int, gap: float, answer_seconds: float, mode: str) -> tuple:
+    calls = 0
+    scheduler = ChatScheduler(mode) if mode != "none" else None
+
+    async def answer(message, text: str) -> None:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(answer_seconds)
+
+    async def chat(chat_id: int) -> None:
+        rng = random.Random(chat_id)
+        handlers = []
+        for i in range(burst):
+            text = f"повідомлення {i} з чату {chat_id}"
+            if scheduler is None:
+                handlers.append(asyncio.create_task(answer(None, text)))
+            else:
+                handlers.append(asyncio.create_task(scheduler.submit(chat_id, None, text, answer)))
+            await asyncio.sleep(rng.uniform(0, 2 * gap))
+        await asyncio.gather(*handlers)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(chat(chat_id) for chat_id in range(chats)))
+    return calls, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--burst", type=int, default=5, help="messages each chat sends in a row")
+    parser.add_argument("--gap", type=float, default=0.3, help="mean seconds between a chat's messages")
+    parser.add_argument("--answer-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    messages = args.chats * args.burst
+    for mode in ("none", "merge", "drop"):
+        calls, elapsed = asyncio.run(_run(args.chats, args.burst, args.gap, args.answer_seconds, mode))
+        print(f"{mode:<6} {messages} messages -> {calls:4d} server calls ({calls / messages:.0%}) in {elapsed:5.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+N concurrent chats against a local stub of the chat server: the old blocking
+``requests`` call made from the event loop versus the pooled async ChatService.
+
+The stub answers after a fixed delay and can fail a share of first attempts
+with 503 to exercise the retries. It reports how many requests it was
+serving at once and over how many TCP connections. The async client should
+finish in about one answer's latency, not N of them.
+
+Run from the ``bot`` directory: ``python -m bench.chat_service --chats 20``.
+"""
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+
+os.environ.setdefault("FICE_QA_TELEGRAM_BOT_TOKEN", "bench")
+os.environ.setdefault("FICE_QA_CHAT_API_URL", "http://127.0.0.1")
+os.environ.setdefault("FICE_QA_CONVERSATION_DB_URL", "sqlite://")
+
+import requests  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+from services.chat_service import ChatService  # noqa: E402
+
+
+class StubServer:
+    def __init__(self, latency: float, fail_rate: float):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.in_flight = self.peak = self.failed = 0
+        self.connections: set = set()
+        self._seen: set = set()
+        self._loop = asyncio.new_event_loop()
+        self.port = None
+
+    async def _chat(self, request: web.Request) -> web.Response:
+        self.connections.add(request.transport.get_extra_info("peername"))
+        question = (await request.json())["conversation"][-1]["content"]
+        if question not in self._seen and random.random() < self.fail_rate:
+            self._seen.add(question)
+            self.failed += 1
+            return web.Response(status=503)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return web.json_response({"answer": f"Відповідь на: {question}"})
+
+    def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/chat", self._chat)
+        runner = web.AppRunner(app)
+        self._loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        self._loop.run_until_complete(site.start())
+        self.port = runner.addresses[0][1]
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+
+    def reset(self) -> None:
+        self.in_flight = self.peak = self.failed = 0
+        self.connections.clear()
+        self._seen.clear()
+
+
+def _conversation(chat: int) -> list:
+    return [{"role": "user", "content": f"Коли дедлайн подачі документів? (чат {chat})"}]
+
+
+async def _legacy_chat(api_url: str, chat: int) -> str:
+    # What ChatService.query_chat used to do: a blocking call made straight from the coroutine.
+    response = requests.post(f"{api_url}/chat", json={"conversation": _conversation(chat)}, timeout=180)
+    response.raise_for_status()
+    return response.json()["answer"]
+
+
+async def _run(name: str, server: StubServer, chats: int) -> None:
+    api_url = f"http://127.0.0.1:{server.port}"
+    server.reset()
+    service = ChatService(api_url=api_url, retries=2, backoff=0.1)
+    start = time.perf_counter()
+    if name == "legacy":
+        results = await asyncio.gather(*(_legacy_chat(api_url, i) for i in range(chats)), return_exceptions=True)
+    else:
+        results = await asyncio.gather(*(service.query_chat(_conversation(i)) for i in range(chats)),
+                                       return_exceptions=True)
+        await service.close()
+    elapsed = time.perf_counter() - start
+    errors = sum(isinstance(r, Exception) for r in results)
+    print(f"{name:<7} {chats} chats in {elapsed:6.2f} s, peak in flight {server.peak:>3}, "
+          f"connections {len(server.connections):>3}, 503s {server.failed:>2}, failed chats {errors}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per stub answer")
+    parser.add_argument("--fail-rate", type=float, default=0.2, help="share of first attempts answered with 503")
+    args = parser.parse_args()
+
+    server = StubServer(args.latency, args.fail_rate)
+    server.start()
+    for name in ("legacy", "async"):
+        asyncio.run(_run(name, server, args.chats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Conversation store throughput on SQLite: the previous synchronous
+ConversationService (COUNT + SELECT + per-row DELETE + INSERT per append, one
+session per call) versus the ring-buffer store with async write-through.
+
+Each turn does what ``handle_message`` does: append the user message, read
+the conversation, append the answer. Turns of different chats are
+interleaved, as they are when many users write at once.
+
+Run from the ``bot`` directory: ``python -m bench.conversation_store``.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("FICE_QA_TELEGRAM_BOT_TOKEN", "bench")
+os.environ.setdefault("FICE_QA_CHAT_API_URL", "http://127.0.0.1")
+os.environ.setdefault("FICE_QA_CONVERSATION_DB_URL", "sqlite://")
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from services.conversation_service import Base, Conversation, ConversationService  # noqa: E402
+
+MESSAGE_LIMIT = 4
+
+
+class LegacyConversationStore:
+    """The store as it was: synchronous, a session per call, trimming row by row."""
+
+    def __init__(self, url: str, message_limit: int):
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        self._session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self._message_limit = message_limit
+
+    def append_message(self, chat_id: int, message: dict) -> None:
+        with self._session_local() as session:
+            count = session.query(Conversation).filter(Conversation.chat_id == chat_id).count()
+            if count >= self._message_limit:
+                for msg in (session.query(Conversation).filter(Conversation.chat_id == chat_id)
+                            .order_by(Conversation.timestamp.asc())
+                            .limit(count - self._message_limit + 1).all()):
+                    session.delete(msg)
+            session.add(Conversation(chat_id=chat_id, role=message["role"], content=message["content"]))
+            session.commit()
+
+    def get_conversation(self, chat_id: int) -> list:
+        with self._session_local() as session:
+            records = (session.query(Conversation).filter(Conversation.chat_id == chat_id)
+                       .order_by(Conversation.timestamp.asc()).all())
+            return [{"role": r.role, "content": r.content} for r in records]
+
+
+def _messages(chat: int, turn: int) -> tuple[dict, dict]:
+    return ({"role": "user", "content": f"Питання {turn} з чату {chat}: коли сесія?"},
+            {"role": "assistant", "content": f"Відповідь {turn}: сесія починається у грудні. " * 5})
+
+
+def bench_legacy(url: str, chats: int, turns: int) -> float:
+    store = LegacyConversationStore(url, MESSAGE_LIMIT)
+    start = time.perf_counter()
+    for turn in range(turns):
+        for chat in range(chats):
+            question, answer = _messages(chat, turn)
+            store.append_message(chat, question)
+            store.get_conversation(chat)
+            store.append_message(chat, answer)
+    return time.perf_counter() - start
+
+
+async def bench_ring_buffer(url: str, chats: int, turns: int) -> float:
+    store = ConversationService(message_limit=MESSAGE_LIMIT, database_url=url, ttl=0)
+    await store.start()
+
+    async def chat_session(chat: int) -> None:
+        for turn in range(turns):
+            question, answer = _messages(chat, turn)
+            await store.append_message(chat, question)
+            await store.get_conversation(chat)
+            await store.append_message(chat, answer)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(chat_session(chat) for chat in range(chats)))
+    elapsed = time.perf_counter() - start
+    await store.close()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=10)
+    args = parser.parse_args()
+
+    messages = args.chats * args.turns * 2
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("legacy", "ring-buffer"):
+            url = f"sqlite:///{Path(tmp) / name}.db"
+            if name == "legacy":
+                elapsed = bench_legacy(url, args.chats, args.turns)
+            else:
+                elapsed = asyncio.run(bench_ring_buffer(url, args.chats, args.turns))
+            print(f"{name:<12} {messages} messages in {elapsed:6.2f} s: {messages / elapsed:8.1f} messages/s")
+
+
+if __name__ == "__main__":
+    main()
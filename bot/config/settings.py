@@ -6,6 +6,18 @@ load_dotenv()
 TELEGRAM_BOT_TOKEN = os.getenv("FICE_QA_TELEGRAM_BOT_TOKEN")
 CHAT_API_URL = os.getenv("FICE_QA_CHAT_API_URL")
 DATABASE_URL = os.getenv("FICE_QA_CONVERSATION_DB_URL")
+STREAMING_ENABLED = os.getenv("FICE_QA_STREAMING", "false").lower() in ("1", "true", "yes")
+STREAM_EDIT_INTERVAL = float(os.getenv("FICE_QA_STREAM_EDIT_INTERVAL", "1.5"))
+CHAT_API_TIMEOUT = float(os.getenv("FICE_QA_CHAT_API_TIMEOUT", "180"))
+CHAT_API_MAX_CONCURRENCY = int(os.getenv("FICE_QA_CHAT_API_MAX_CONCURRENCY", "32"))
+CHAT_API_RETRIES = int(os.getenv("FICE_QA_CHAT_API_RETRIES", "2"))
+# Let the server keep each chat's history (session mode) instead of resending it every turn.
+SERVER_SESSIONS = os.getenv("FICE_QA_SERVER_SESSIONS", "false").lower() in ("1", "true", "yes")
+CONVERSATION_TTL = float(os.getenv("FICE_QA_CONVERSATION_TTL", str(7 * 24 * 60 * 60)))
+CONVERSATION_PURGE_INTERVAL = float(os.getenv("FICE_QA_CONVERSATION_PURGE_INTERVAL", "3600"))
+CONVERSATION_CACHE_CHATS = int(os.getenv("FICE_QA_CONVERSATION_CACHE_CHATS", "10000"))
+# What happens to messages sent while the chat's previous question is being answered: "merge" or "drop".
+SUPERSEDED_MESSAGES = os.getenv("FICE_QA_SUPERSEDED_MESSAGES", "merge").lower()
 
 if not TELEGRAM_BOT_TOKEN:
     raise ValueError("FICE_QA_TELEGRAM_BOT_TOKEN must be set")
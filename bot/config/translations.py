@@ -6,7 +6,10 @@ class Translations:
             'help': 'Просто надішліть повідомлення з питанням, що вас цікавить. Використайте /reset або /start щоб '
                     'очистити історію розмови.',
             'reset': 'Історію розмови очищено.',
-            'error': 'Вибачте, сталася помилка під час обробки вашого запиту.'
+            'searching': 'Бот шукає інформацію. Будь ласка, очікуйте на відповідь.',
+            'error': 'Вибачте, сталася помилка під час обробки вашого запиту.',
+            'busy': 'Зараз надто багато запитів. Будь ласка, спробуйте ще раз за хвилину.',
+            'superseded': 'Це повідомлення замінено новішим, я відповім на нього.'
         }
     }
 
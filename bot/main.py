@@ -3,9 +3,13 @@ from aiogram import Bot, Dispatcher, types
 from aiogram.enums import ChatAction, ParseMode
 from aiogram.filters import Command
 
-from config.settings import TELEGRAM_BOT_TOKEN
-from services.chat_service import ChatService
+from config.settings import (
+    TELEGRAM_BOT_TOKEN, STREAMING_ENABLED, STREAM_EDIT_INTERVAL, SERVER_SESSIONS, SUPERSEDED_MESSAGES
+)
+from services.chat_scheduler import ChatScheduler
+from services.chat_service import ChatService, ServerBusy
 from services.conversation_service import ConversationService
+from services.stream_reply import StreamingReply
 from config.translations import Translations as t
 from telegramify_markdown import markdownify
 
@@ -13,9 +17,43 @@ logger = logging.getLogger(__name__)
 conversation_service = ConversationService(message_limit=4)
 chat_service = ChatService()
 
+
+async def _superseded(message: types.Message) -> None:
+    """
+    Replies to a message dropped for a newer one (FICE_QA_SUPERSEDED_MESSAGES=drop).
+    """
+    await message.reply(t.get('superseded'))
+
+
+chat_scheduler = ChatScheduler(mode=SUPERSEDED_MESSAGES, on_superseded=_superseded)
+
 dp = Dispatcher()
 
 
+def _session_id(chat_id: int) -> str | None:
+    """
+    The server-side session of a chat, when session mode is enabled.
+    """
+    return f"tg-{chat_id}" if SERVER_SESSIONS else None
+
+
+async def _reset(chat_id: int) -> None:
+    await conversation_service.reset_conversation(chat_id)
+    if SERVER_SESSIONS:
+        await chat_service.reset_session(_session_id(chat_id))
+
+
+@dp.startup()
+async def on_startup() -> None:
+    await conversation_service.start()
+
+
+@dp.shutdown()
+async def on_shutdown() -> None:
+    await chat_service.close()
+    await conversation_service.close()
+
+
 @dp.message(Command("start"))
 async def start_command(message: types.Message) -> None:
     """
@@ -23,7 +61,7 @@ async def start_command(message: types.Message) -> None:
     Resets the conversation history and sends a welcome message.
     """
     chat_id = message.chat.id
-    conversation_service.reset_conversation(chat_id)
+    await _reset(chat_id)
     await message.answer(t.get('start'))
 
 
@@ -43,39 +81,80 @@ async def reset_command(message: types.Message) -> None:
     Resets the conversation history.
     """
     chat_id = message.chat.id
-    conversation_service.reset_conversation(chat_id)
+    await _reset(chat_id)
     await message.answer(t.get('reset'))
 
 
 @dp.message()
 async def handle_message(message: types.Message) -> None:
+    """
+    Answers the message, one question per chat at a time: messages sent while
+    the previous one is being answered are merged (or dropped, see
+    FICE_QA_SUPERSEDED_MESSAGES) and answered next.
+    """
+    answer = _answer_streaming if STREAMING_ENABLED else _answer
+    await chat_scheduler.submit(message.chat.id, message, message.text.strip(), answer)
+
+
+def _error_text(e: Exception) -> str:
+    return t.get('busy') if isinstance(e, ServerBusy) else t.get('error')
+
+
+async def _answer(message: types.Message, user_text: str) -> None:
+    """
+    Answers with a single message once the whole answer has been generated.
+    """
     chat_id = message.chat.id
-    user_text = message.text.strip()
     loading_msg = None
 
     try:
         loading_msg = await message.answer_animation(
             animation="https://media1.tenor.com/m/uaLasm_ExBcAAAAd/a-parakeet-admiring-himself-parakeet.gif",
-            caption="Бот шукає інформацію. Будь ласка, очікуйте на відповідь."
+            caption=t.get('searching')
         )
 
-        conversation_service.append_message(chat_id, {"role": "user", "content": user_text})
-        conversation = conversation_service.get_conversation(chat_id)
+        await conversation_service.append_message(chat_id, {"role": "user", "content": user_text})
+        conversation = await conversation_service.get_conversation(chat_id)
         await message.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
-        raw_answer = chat_service.query_chat(conversation)
-        conversation_service.append_message(chat_id, {"role": "assistant", "content": raw_answer})
+        raw_answer = await chat_service.query_chat(conversation, _session_id(chat_id), f"tg-{chat_id}")
+        await conversation_service.append_message(chat_id, {"role": "assistant", "content": raw_answer})
         answer = markdownify(raw_answer)
         await message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2, disable_web_page_preview=True)
 
     except Exception as e:
         logger.exception("Error processing message: %s", e)
-        await message.answer(t.get('error'))
+        await message.answer(_error_text(e))
 
     finally:
         if loading_msg:
             await message.bot.delete_message(chat_id=chat_id, message_id=loading_msg.message_id)
 
 
+async def _answer_streaming(message: types.Message, user_text: str) -> None:
+    """
+    Answers by editing one message as the answer streams in from the server.
+    """
+    chat_id = message.chat.id
+    reply = StreamingReply(message, min_interval=STREAM_EDIT_INTERVAL)
+
+    try:
+        await conversation_service.append_message(chat_id, {"role": "user", "content": user_text})
+        conversation = await conversation_service.get_conversation(chat_id)
+        await reply.start(t.get('searching'))
+
+        raw_answer = ""
+        async for token in chat_service.stream_chat(conversation, _session_id(chat_id), f"tg-{chat_id}"):
+            raw_answer += token
+            await reply.update(raw_answer)
+
+        await conversation_service.append_message(chat_id, {"role": "assistant", "content": raw_answer})
+        await reply.finish(raw_answer)
+
+    except Exception as e:
+        logger.exception("Error processing message: %s", e)
+        await reply.fail(_error_text(e))
+
+
 if __name__ == "__main__":
     import asyncio
 
@@ -0,0 +1,95 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SUPERSEDE_MODES = ("merge", "drop")
+
+# Answers one message: (the message to reply to, the question text).
+Handler = Callable[[Any, str], Awaitable[None]]
+# Tells the sender of a dropped message that it will not be answered.
+SupersededHandler = Callable[[Any], Awaitable[None]]
+
+
+class _ChatState:
+    def __init__(self):
+        self.pending: Optional[Tuple[Any, str]] = None
+
+
+class ChatScheduler:
+    """
+    Allows one server call in flight per chat.
+
+    Messages that arrive while a chat's question is being answered wait as a
+    single pending question, answered next. Each newer message supersedes the
+    pending one: in ``merge`` mode their texts are joined into one question,
+    in ``drop`` mode only the newest is kept and ``on_superseded`` is called
+    with each dropped message, so its sender still gets a reply. Five
+    messages sent in a row while the first is being answered therefore cost
+    two server calls.
+    """
+
+    def __init__(self, mode: str = "merge", on_superseded: Optional[SupersededHandler] = None):
+        if mode not in SUPERSEDE_MODES:
+            raise ValueError(f"Unknown supersede mode {mode!r}, expected one of {SUPERSEDE_MODES}")
+        self.mode = mode
+        self._on_superseded = on_superseded
+        self._chats: Dict[int, _ChatState] = {}
+        self.superseded = 0
+
+    def busy(self, chat_id: int) -> bool:
+        """
+        Whether a question of the chat is being answered.
+
+        Args:
+            chat_id (int): The Telegram chat.
+        """
+        return chat_id in self._chats
+
+    async def submit(self, chat_id: int, message: Any, text: str, handler: Handler) -> None:
+        """
+        Answers ``text`` now, or queues it behind the chat's question in flight.
+
+        Returns once the chat has nothing left to answer when called on an idle
+        chat, and immediately when the message was queued.
+
+        Args:
+            chat_id (int): The Telegram chat.
+            message (Any): The message to reply to.
+            text (str): The question.
+            handler (Handler): Answers one (message, text) pair.
+        """
+        state = self._chats.get(chat_id)
+        if state is not None:
+            superseded, state.pending = state.pending, None
+            if superseded is not None:
+                self.superseded += 1
+                if self.mode == "merge":
+                    text = f"{superseded[1]}\n{text}"
+            state.pending = (message, text)
+            if superseded is not None and self.mode == "drop" and self._on_superseded is not None:
+                try:
+                    await self._on_superseded(superseded[0])
+                except Exception as e:
+                    logger.exception("Replying to a superseded message in chat %s failed: %s", chat_id, e)
+            return
+
+        state = self._chats[chat_id] = _ChatState()
+        try:
+            while True:
+                try:
+                    await handler(message, text)
+                except Exception as e:
+                    logger.exception("Answering chat %s failed: %s", chat_id, e)
+                if state.pending is None:
+                    return
+                (message, text), state.pending = state.pending, None
+        finally:
+            del self._chats[chat_id]
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Chats with a question in flight and messages superseded so far.
+        """
+        return {"in_flight": len(self._chats), "superseded": self.superseded}
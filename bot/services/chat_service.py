@@ -1,43 +1,208 @@
+import asyncio
+import json
 import logging
-from typing import List, Dict
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Dict, Optional
 
-import requests
+import aiohttp
 from config import settings
 
 logger = logging.getLogger(__name__)
 
 
+class ServerBusy(Exception):
+    """
+    The chat server shed the request because its LLM queue is full.
+    """
+
+
 class ChatService:
-    def __init__(self):
-        self.api_url = settings.CHAT_API_URL
+    """
+    Client of the FastAPI chat server.
+
+    All calls share one keep-alive connection pool and a concurrency limit. Each
+    call has a deadline that covers its retries. Connection errors and 5xx
+    responses are retried with jittered exponential backoff, except 503 "busy":
+    the server is shedding load, and retrying would only add to it.
+    """
+
+    def __init__(self,
+                 api_url: Optional[str] = None,
+                 timeout: float = settings.CHAT_API_TIMEOUT,
+                 max_concurrency: int = settings.CHAT_API_MAX_CONCURRENCY,
+                 retries: int = settings.CHAT_API_RETRIES,
+                 backoff: float = 0.5):
+        self.api_url = api_url or settings.CHAT_API_URL
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily: a session must be opened inside the running event loop.
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """
+        Closes the connection pool.
+        """
+        if self._session is not None:
+            await self._session.close()
+
+    @asynccontextmanager
+    async def _post(self, path: str, payload: dict,
+                    client_id: Optional[str] = None) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        POSTs ``payload`` and yields a successful response, retrying transient
+        failures until ``self.timeout`` seconds after the call started.
+
+        ``client_id`` is the unit the server queues fairly (one chat).
+
+        Raises:
+            TimeoutError: If the deadline passes.
+            ServerBusy: If the server sheds the request.
+            aiohttp.ClientError: If the last attempt fails or the server returns a 4xx.
+        """
+        headers = {"X-Client-Id": client_id} if client_id else None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        async with self._slots:
+            for attempt in range(self.retries + 1):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise TimeoutError
+                try:
+                    response = await self._get_session().post(
+                        f'{self.api_url}{path}', json=payload, headers=headers,
+                        timeout=aiohttp.ClientTimeout(total=remaining)
+                    )
+                except aiohttp.ClientConnectionError as e:
+                    if attempt == self.retries:
+                        raise
+                    logger.warning("Chat API connection failed (attempt %d): %s", attempt + 1, e)
+                else:
+                    if response.status == 503:
+                        response.release()
+                        raise ServerBusy
+                    if response.status < 500 or attempt == self.retries:
+                        async with response:
+                            response.raise_for_status()
+                            yield response
+                        return
+                    logger.warning("Chat API returned %d (attempt %d)", response.status, attempt + 1)
+                    response.release()
 
-    def query_chat(self, conversation: List[Dict[str, str]]) -> str:
+                # Full jitter keeps retries from many chats from arriving in lockstep.
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                await asyncio.sleep(min(delay, max(deadline - loop.time(), 0)))
+
+    @staticmethod
+    def _payload(conversation: List[Dict[str, str]], session_id: Optional[str]) -> dict:
+        if session_id is None:
+            return {"conversation": conversation}
+        # The server holds the history of a session and answers from it. The bot's short
+        # window goes along only to seed a session the server no longer has (restart, eviction).
+        return {"session_id": session_id, "message": conversation[-1]["content"],
+                "conversation": conversation[:-1]}
+
+    async def query_chat(self, conversation: List[Dict[str, str]], session_id: Optional[str] = None,
+                         client_id: Optional[str] = None) -> str:
         """
         Sends the conversation history to the FastAPI chat endpoint and returns the answer.
 
         Args:
             conversation (List[Dict[str, str]]): List of conversation messages with 'role' and 'content'.
+            session_id (Optional[str]): Server-side session to continue, seeded from the earlier messages if it is gone.
+            client_id (Optional[str]): Who the server queues the request for, e.g. the chat.
 
         Returns:
             str: The answer received from the API.
 
         Raises:
+            ServerBusy: If the server is overloaded.
             Exception: If the request fails, times out, or returns an invalid response.
         """
         try:
-            response = requests.post(
-                f'{self.api_url}/chat',
-                json={"conversation": conversation},
-                timeout=180
-            )
-            response.raise_for_status()
-            return response.json()["answer"]
-        except requests.Timeout:
+            async with self._post('/chat', self._payload(conversation, session_id), client_id) as response:
+                return (await response.json())["answer"]
+        except TimeoutError:
             logger.error("Request to chat API timed out")
             raise Exception("Request timeout")
-        except requests.RequestException as e:
+        except aiohttp.ClientError as e:
             logger.exception("API request failed: %s", e)
             raise Exception(f"API request failed: {str(e)}")
         except (KeyError, ValueError) as e:
             logger.exception("Invalid API response: %s", e)
             raise Exception("Invalid API response")
+
+    async def stream_chat(self, conversation: List[Dict[str, str]], session_id: Optional[str] = None,
+                          client_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Streams the answer from the FastAPI ``/chat/stream`` endpoint token by token.
+
+        Only establishing the stream is retried: once tokens have been shown to
+        the user, a failure is reported instead.
+
+        Args:
+            conversation (List[Dict[str, str]]): List of conversation messages with 'role' and 'content'.
+            session_id (Optional[str]): Server-side session to continue, seeded from the earlier messages if it is gone.
+            client_id (Optional[str]): Who the server queues the request for, e.g. the chat.
+
+        Yields:
+            str: The next chunk of the answer.
+
+        Raises:
+            ServerBusy: If the server is overloaded.
+            Exception: If the request fails, times out, or the server reports an error mid-stream.
+        """
+        try:
+            async with self._post('/chat/stream', self._payload(conversation, session_id), client_id) as response:
+                event = "message"
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").rstrip("\r\n")
+                    if not line:
+                        event = "message"
+                    elif line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    elif line.startswith("data:"):
+                        data = json.loads(line[len("data:"):])
+                        if event == "done":
+                            return
+                        if event == "error" and data.get("detail") == "busy":
+                            raise ServerBusy
+                        if event == "error":
+                            raise Exception(f"API stream failed: {data.get('detail')}")
+                        yield data["token"]
+        except TimeoutError:
+            logger.error("Streaming request to chat API timed out")
+            raise Exception("Request timeout")
+        except aiohttp.ClientError as e:
+            logger.exception("API stream request failed: %s", e)
+            raise Exception(f"API request failed: {str(e)}")
+        except (KeyError, ValueError) as e:
+            logger.exception("Invalid API stream event: %s", e)
+            raise Exception("Invalid API response")
+
+    async def reset_session(self, session_id: str) -> None:
+        """
+        Forgets a server-side session.
+
+        Args:
+            session_id (str): The session to delete.
+        """
+        try:
+            async with self._slots:
+                async with self._get_session().delete(
+                        f'{self.api_url}/chat/sessions/{session_id}',
+                        timeout=aiohttp.ClientTimeout(total=self.timeout)
+                ) as response:
+                    response.raise_for_status()
+        except (aiohttp.ClientError, TimeoutError) as e:
+            logger.exception("Failed to reset session %s: %s", session_id, e)
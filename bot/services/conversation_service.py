@@ -1,20 +1,30 @@
+import asyncio
 import logging
-from contextlib import contextmanager
-from typing import List, Dict, Any
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Deque, Optional
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, func
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import Column, Integer, String, DateTime, delete, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 
-from config.settings import DATABASE_URL
+from config.settings import (
+    DATABASE_URL, CONVERSATION_TTL, CONVERSATION_PURGE_INTERVAL, CONVERSATION_CACHE_CHATS
+)
 
 logger = logging.getLogger(__name__)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-_SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
 Base = declarative_base()
 
+# Async drivers for the synchronous URLs used in FICE_QA_CONVERSATION_DB_URL.
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
 
 class Conversation(Base):
     __tablename__ = "conversation"
@@ -26,88 +36,153 @@ class Conversation(Base):
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
 
-Base.metadata.create_all(bind=engine)
+def async_database_url(url: str) -> str:
+    """
+    Maps a synchronous database URL (``sqlite:///conversation.db``) to its async driver.
+    """
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
 
 
 class ConversationService:
-    def __init__(self, message_limit: int = 10):
+    """
+    Keeps the last ``message_limit`` messages of each chat.
+
+    Reads are served from an in-memory ring buffer per chat. Writes go to the
+    buffer and through to the database, which restores a chat's window after a
+    restart or an eviction from memory. Chats idle for longer than ``ttl``
+    seconds are purged from both by a background task.
+    """
+
+    def __init__(self,
+                 message_limit: int = 10,
+                 database_url: str = DATABASE_URL,
+                 ttl: float = CONVERSATION_TTL,
+                 purge_interval: float = CONVERSATION_PURGE_INTERVAL,
+                 max_cached_chats: int = CONVERSATION_CACHE_CHATS):
         """
-        Initializes the service with a _SessionLocal factory.
+        Initializes the service with an async engine for ``database_url``.
         """
-        self._session_local = _SessionLocal
+        self._engine = create_async_engine(async_database_url(database_url))
+        self._session_local = async_sessionmaker(self._engine, expire_on_commit=False)
         self._message_limit = message_limit
-
-    @contextmanager
-    def session_scope(self) -> Session:
+        self._ttl = ttl
+        self._purge_interval = purge_interval
+        self._max_cached_chats = max_cached_chats
+        # chat_id -> (messages, monotonic time of the last activity), least recently used first.
+        self._windows: "OrderedDict[int, tuple[Deque[Dict[str, Any]], float]]" = OrderedDict()
+        self._purge_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
         """
-        Provides a transactional scope around operations.
-
-        Yields:
-            Session: The active SQLAlchemy session.
+        Creates the table if needed and starts the background TTL purge.
         """
-        session: Session = self._session_local()
-        try:
-            yield session
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            session.close()
+        async with self._engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        if self._ttl > 0 and self._purge_task is None:
+            self._purge_task = asyncio.create_task(self._purge_loop())
 
-    def reset_conversation(self, chat_id: int) -> None:
+    async def close(self) -> None:
+        """
+        Stops the purge task and closes the database connections.
+        """
+        if self._purge_task is not None:
+            self._purge_task.cancel()
+            try:
+                await self._purge_task
+            except asyncio.CancelledError:
+                pass
+            self._purge_task = None
+        await self._engine.dispose()
+
+    def _touch(self, chat_id: int, window: Deque[Dict[str, Any]]) -> None:
+        self._windows[chat_id] = (window, time.monotonic())
+        self._windows.move_to_end(chat_id)
+        while len(self._windows) > self._max_cached_chats:
+            self._windows.popitem(last=False)
+
+    async def _window(self, session: Optional[AsyncSession], chat_id: int) -> Deque[Dict[str, Any]]:
+        """
+        Returns the chat's ring buffer, loading it from the database on a miss.
+        """
+        cached = self._windows.get(chat_id)
+        if cached is not None:
+            return cached[0]
+
+        async def load(s: AsyncSession) -> List[Dict[str, Any]]:
+            rows = (await s.execute(
+                select(Conversation.role, Conversation.content)
+                .where(Conversation.chat_id == chat_id)
+                .order_by(Conversation.id.desc())
+                .limit(self._message_limit)
+            )).all()
+            return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+        if session is None:
+            async with self._session_local() as s:
+                messages = await load(s)
+        else:
+            messages = await load(session)
+        # Another coroutine may have loaded (and appended to) the window meanwhile; keep that one.
+        cached = self._windows.get(chat_id)
+        if cached is not None:
+            return cached[0]
+        window = deque(messages, maxlen=self._message_limit)
+        self._touch(chat_id, window)
+        return window
+
+    async def reset_conversation(self, chat_id: int) -> None:
         """
         Deletes all conversation records for the specified chat ID.
 
         Args:
             chat_id (int): The identifier for the conversation records.
         """
+        self._windows.pop(chat_id, None)
         try:
-            with self.session_scope() as session:
-                session.query(Conversation).filter(Conversation.chat_id == chat_id).delete()
+            async with self._session_local.begin() as session:
+                await session.execute(delete(Conversation).where(Conversation.chat_id == chat_id))
         except Exception as e:
             logger.exception(
                 'Failed to reset conversation: chat_id=%s, error=%s', chat_id, str(e)
             )
 
-    def append_message(self, chat_id: int, message: Dict[str, Any]) -> None:
+    async def append_message(self, chat_id: int, message: Dict[str, Any]) -> None:
         """
-        Appends a new message to the conversation.
+        Appends a new message to the conversation and trims it to the message limit.
 
         Args:
             chat_id (int): The chat ID to associate with this message.
             message (Dict[str, Any]): A dictionary containing 'role' and 'content' fields.
         """
+        record = {"role": message.get("role", "unknown"), "content": message.get("content", "")}
         try:
-            with self.session_scope() as session:
-                count = session.query(Conversation).filter(
-                    Conversation.chat_id == chat_id
-                ).count()
-
-                if count >= self._message_limit:
-                    oldest_messages = session.query(Conversation).filter(
-                        Conversation.chat_id == chat_id
-                    ).order_by(
-                        Conversation.timestamp.asc()
-                    ).limit(count - self._message_limit + 1).all()
-
-                    for msg in oldest_messages:
-                        session.delete(msg)
-
-                record = Conversation(
-                    chat_id=chat_id,
-                    role=message.get("role", "unknown"),
-                    content=message.get("content", "")
+            async with self._session_local.begin() as session:
+                window = await self._window(session, chat_id)
+                window.append(record)
+                self._touch(chat_id, window)
+
+                session.add(Conversation(chat_id=chat_id, **record))
+                await session.flush()
+                # Everything older than the newest ``message_limit`` rows, in one statement.
+                cutoff = (select(Conversation.id)
+                          .where(Conversation.chat_id == chat_id)
+                          .order_by(Conversation.id.desc())
+                          .offset(self._message_limit)
+                          .limit(1)
+                          .scalar_subquery())
+                await session.execute(
+                    delete(Conversation).where(Conversation.chat_id == chat_id, Conversation.id <= cutoff)
                 )
-                session.add(record)
         except Exception as e:
             logger.exception(
                 'Failed to append message for chat_id=%s with error=%s', chat_id, str(e)
             )
 
-    def get_conversation(self, chat_id: int) -> List[Dict[str, Any]]:
+    async def get_conversation(self, chat_id: int) -> List[Dict[str, Any]]:
         """
-        Retrieves all messages for the specified chat ID, sorted by timestamp.
+        Retrieves the chat's recent messages, oldest first.
 
         Args:
             chat_id (int): The identifier for the conversation.
@@ -116,15 +191,41 @@ class ConversationService:
             List[Dict[str, Any]]: A list of messages with 'role' and 'content'.
         """
         try:
-            with self.session_scope() as session:
-                records = (session.query(Conversation)
-                           .filter(Conversation.chat_id == chat_id)
-                           .order_by(Conversation.timestamp.asc())
-                           .all())
-                conversation = [{"role": rec.role, "content": rec.content} for rec in records]
-                return conversation
+            window = await self._window(None, chat_id)
+            self._touch(chat_id, window)
+            return list(window)
         except Exception as e:
             logger.exception(
                 'Failed to get conversation: chat_id=%s, error=%s', chat_id, str(e)
             )
             return []
+
+    async def purge_expired(self) -> int:
+        """
+        Deletes chats whose last message is older than the TTL.
+
+        Returns:
+            int: The number of deleted rows.
+        """
+        expired = [chat_id for chat_id, (_, last) in self._windows.items()
+                   if time.monotonic() - last > self._ttl]
+        for chat_id in expired:
+            del self._windows[chat_id]
+
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=self._ttl)
+        abandoned = (select(Conversation.chat_id)
+                     .group_by(Conversation.chat_id)
+                     .having(func.max(Conversation.timestamp) < cutoff))
+        async with self._session_local.begin() as session:
+            result = await session.execute(delete(Conversation).where(Conversation.chat_id.in_(abandoned)))
+        return result.rowcount or 0
+
+    async def _purge_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._purge_interval)
+            try:
+                deleted = await self.purge_expired()
+                if deleted:
+                    logger.info('Purged %d messages of abandoned chats', deleted)
+            except Exception as e:
+                logger.exception('Failed to purge abandoned chats: %s', str(e))
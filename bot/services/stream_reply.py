@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from aiogram import types
+from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from telegramify_markdown import markdownify
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+class StreamingReply:
+    """
+    A single Telegram message that is progressively edited while an answer streams in.
+
+    Intermediate edits are plain text and throttled to at most one per ``min_interval``
+    seconds; a flood-control response from Telegram pushes the next edit further out
+    instead of blocking the stream. The final edit is rendered as MarkdownV2.
+    """
+
+    def __init__(self, message: types.Message, min_interval: float = 1.5):
+        self._message = message
+        self._min_interval = min_interval
+        self._reply: Optional[types.Message] = None
+        self._shown_text = ""
+        self._next_edit_at = 0.0
+
+    async def start(self, placeholder: str) -> None:
+        """
+        Sends the placeholder message that will be edited as the answer arrives.
+
+        Args:
+            placeholder (str): Text shown until the first chunk arrives.
+        """
+        self._reply = await self._message.answer(placeholder)
+        self._shown_text = placeholder
+        self._next_edit_at = time.monotonic() + self._min_interval
+
+    async def update(self, text: str) -> None:
+        """
+        Shows the partial answer if the edit interval has elapsed since the last edit.
+
+        Args:
+            text (str): The answer accumulated so far.
+        """
+        if time.monotonic() < self._next_edit_at:
+            return
+        preview = text[:TELEGRAM_MESSAGE_LIMIT - 1] + "…"
+        try:
+            await self._edit(preview)
+        except TelegramRetryAfter as e:
+            self._next_edit_at = time.monotonic() + e.retry_after
+
+    async def finish(self, text: str) -> None:
+        """
+        Replaces the partial answer with the final, Markdown-formatted one.
+
+        Args:
+            text (str): The complete answer.
+        """
+        answer = markdownify(text)
+        if len(answer) > TELEGRAM_MESSAGE_LIMIT:
+            await self._delete()
+            await self._message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2, disable_web_page_preview=True)
+            return
+        await self._edit_with_retry(answer, parse_mode=ParseMode.MARKDOWN_V2)
+
+    async def fail(self, text: str) -> None:
+        """
+        Replaces the partial answer with an error message.
+
+        Args:
+            text (str): The error message.
+        """
+        if self._reply is None:
+            await self._message.answer(text)
+            return
+        await self._edit_with_retry(text)
+
+    async def _edit_with_retry(self, text: str, parse_mode: Optional[str] = None) -> None:
+        delay = self._next_edit_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            await self._edit(text, parse_mode)
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            await self._edit(text, parse_mode)
+
+    async def _edit(self, text: str, parse_mode: Optional[str] = None) -> None:
+        if text == self._shown_text:
+            return
+        try:
+            await self._reply.edit_text(text, parse_mode=parse_mode, disable_web_page_preview=True)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                raise
+        self._shown_text = text
+        self._next_edit_at = time.monotonic() + self._min_interval
+
+    async def _delete(self) -> None:
+        try:
+            await self._reply.delete()
+        except TelegramBadRequest as e:
+            logger.warning("Failed to delete streamed message: %s", e)
@@ -0,0 +1,6 @@
+import os
+
+# config.settings refuses to import without these; the tests never reach them.
+os.environ.setdefault("FICE_QA_TELEGRAM_BOT_TOKEN", "test")
+os.environ.setdefault("FICE_QA_CHAT_API_URL", "http://127.0.0.1")
+os.environ.setdefault("FICE_QA_CONVERSATION_DB_URL", "sqlite://")
@@ -0,0 +1,148 @@
+import asyncio
+import socket
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+
+import services.chat_service
+from services.chat_service import ChatService, ServerBusy
+
+CONVERSATION = [{"role": "user", "content": "Коли прийом документів?"}]
+BACKOFF = 0.02
+
+
+class StubServer:
+    """
+    Stands in for the chat server: answers ``/chat`` with each of ``statuses``
+    in turn (200 carries an answer), then 200 for good; sleeps ``delay`` first.
+    """
+
+    def __init__(self, statuses=(), delay: float = 0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.attempts = 0
+
+    async def _chat(self, request: web.Request) -> web.Response:
+        self.attempts += 1
+        await asyncio.sleep(self.delay)
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status != 200:
+            return web.Response(status=status)
+        return web.json_response({"answer": "Відповідь"})
+
+    @asynccontextmanager
+    async def serve(self):
+        app = web.Application()
+        app.router.add_post("/chat", self._chat)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            await runner.cleanup()
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """The (upper bound, delay) of every backoff the client draws."""
+    drawn = []
+    uniform = services.chat_service.random.uniform
+
+    def record(low, high):
+        delay = uniform(low, high)
+        assert low == 0
+        drawn.append((high, delay))
+        return delay
+
+    monkeypatch.setattr(services.chat_service.random, "uniform", record)
+    return drawn
+
+
+def _query(stub: StubServer, **kwargs) -> str:
+    async def run():
+        async with stub.serve() as url:
+            service = ChatService(url, backoff=BACKOFF, **kwargs)
+            try:
+                return await service.query_chat(CONVERSATION)
+            finally:
+                await service.close()
+
+    return asyncio.run(run())
+
+
+def _assert_full_jitter(backoffs, count):
+    assert [high for high, _ in backoffs] == [BACKOFF * 2 ** attempt for attempt in range(count)]
+    assert all(0 <= delay <= high for high, delay in backoffs)
+
+
+def test_retries_5xx_until_an_answer(backoffs):
+    stub = StubServer([500, 502])
+    assert _query(stub, retries=2) == "Відповідь"
+    assert stub.attempts == 3
+    _assert_full_jitter(backoffs, 2)
+
+
+def test_gives_up_after_the_last_retry(backoffs):
+    stub = StubServer([500, 502, 504, 500])
+    with pytest.raises(Exception, match="^API request failed: 504"):
+        _query(stub, retries=2)
+    assert stub.attempts == 3
+    _assert_full_jitter(backoffs, 2)
+
+
+def test_busy_server_is_not_retried(backoffs):
+    stub = StubServer([503])
+    with pytest.raises(ServerBusy):
+        _query(stub, retries=2)
+    assert stub.attempts == 1
+    assert backoffs == []
+
+
+def test_client_errors_are_not_retried(backoffs):
+    stub = StubServer([422])
+    with pytest.raises(Exception, match="^API request failed: 422"):
+        _query(stub, retries=2)
+    assert stub.attempts == 1
+    assert backoffs == []
+
+
+def test_deadline_covers_the_retries(backoffs):
+    stub = StubServer(delay=1.0)
+
+    async def run():
+        async with stub.serve() as url:
+            service = ChatService(url, timeout=0.2, retries=2, backoff=BACKOFF)
+            started = time.monotonic()
+            try:
+                with pytest.raises(Exception, match="^Request timeout$"):
+                    await service.query_chat(CONVERSATION)
+                return time.monotonic() - started
+            finally:
+                await service.close()
+
+    assert asyncio.run(run()) < 0.5
+    assert stub.attempts == 1
+    assert backoffs == []
+
+
+def test_retries_connection_errors(backoffs):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    async def run():
+        # Nothing listens on the port: every attempt is refused.
+        service = ChatService(f"http://127.0.0.1:{port}", retries=2, backoff=BACKOFF)
+        try:
+            return await service.query_chat(CONVERSATION)
+        finally:
+            await service.close()
+
+    with pytest.raises(Exception, match="^API request failed: Cannot connect"):
+        asyncio.run(run())
+    _assert_full_jitter(backoffs, 2)
@@ -0,0 +1,195 @@
+"""
+Crawl benchmark on a local static fixture site: the previous spider, which
+extracted text inline on the reactor thread (and round-tripped PDFs through a
+temp file after downloading them twice), versus ContentSpider with its
+extraction process pool.
+
+The fixture is generated into a temp directory and served over HTTP with an
+artificial per-request latency, so the crawl is only fast if downloads keep
+going while pages and PDFs are being parsed. Each variant runs in its own
+subprocess and reports pages/s.
+
+    python bench_crawl.py --pages 400 --pdfs 40 --pdf-pages 30 --latency-ms 50
+"""
+import argparse
+import functools
+import hashlib
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from bench_indexing import WORDS
+
+# PDF base fonts have no Cyrillic glyphs; the text only has to cost the same to parse.
+PDF_WORDS = ("vstup stypendiia kafedra spetsialnist navchannia bakalavr mahistr rozklad sesiia "
+             "dekanat fakultet informatyky dokumenty dedlain konkurs biudzhet kontrakt praktyka").split()
+
+
+def build_site(root: Path, pages: int, pdfs: int, pdf_pages: int, seed: int = 0) -> None:
+    import fitz
+
+    rng = random.Random(seed)
+    for i in range(pdfs):
+        with fitz.open() as pdf:
+            for _ in range(pdf_pages):
+                page = pdf.new_page()
+                text = "\n".join(" ".join(rng.choices(PDF_WORDS, k=12)) for _ in range(50))
+                page.insert_textbox(page.rect + (36, 36, -36, -36), text, fontsize=9)
+            pdf.save(root / f"doc_{i}.pdf")
+
+    for i in range(pages):
+        links = [f"page_{rng.randrange(pages)}.html" for _ in range(5)]
+        if pdfs:
+            links.append(f"doc_{rng.randrange(pdfs)}.pdf")
+        paragraphs = "".join(f"<p>{' '.join(rng.choices(WORDS, k=rng.randint(40, 120)))}</p>"
+                             for _ in range(rng.randint(3, 10)))
+        nav = "".join(f'<li><a href="{href}">{href}</a></li>' for href in links)
+        (root / f"page_{i}.html").write_text(
+            f'<html lang="uk"><head><title>Сторінка {i}</title></head><body>'
+            f"<nav><ul>{nav}</ul></nav><article><h1>Сторінка {i}</h1>{paragraphs}</article>"
+            f"<footer>ФІОТ КПІ</footer></body></html>",
+            encoding="utf-8",
+        )
+    # Every page is reachable within the spider's depth limit.
+    index = "".join(f'<a href="page_{i}.html">{i}</a> ' for i in range(pages))
+    (root / "index.html").write_text(f"<html><body>{index}</body></html>", encoding="utf-8")
+
+
+def serve(root: Path, latency_ms: float) -> ThreadingHTTPServer:
+    class Handler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency_ms / 1000)
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(Handler, directory=str(root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def legacy_spider():
+    import tempfile as tmpfile
+
+    import scrapy
+    import trafilatura
+    from langchain_community.document_loaders import PyMuPDFLoader
+
+    import scrape_to_files
+
+    class LegacySpider(scrapy.Spider):
+        name = "legacy"
+        custom_settings = scrape_to_files.ContentSpider.custom_settings
+        incremental = False
+        seen_hashes: set[str] = set()
+
+        def parse(self, response, **kwargs):
+            url = response.url
+            if url.lower().endswith(".pdf"):
+                yield scrapy.Request(url, callback=self.parse_pdf, dont_filter=True)
+                return
+            text = trafilatura.extract(response.text, include_comments=False, include_tables=False)
+            if text:
+                item_hash = hashlib.md5(text.encode("utf-8")).hexdigest()
+                if item_hash not in self.seen_hashes:
+                    self.seen_hashes.add(item_hash)
+                    yield {"content": text, "metadata": {"source": url, "md5": item_hash}}
+            for href in response.css("a::attr(href)").getall():
+                full_url, _ = urldefrag(urljoin(url, href))
+                parsed = urlparse(full_url)
+                if (parsed.netloc in scrape_to_files.ALLOWED_DOMAINS
+                        and any(parsed.path.lower().endswith(ext) for ext in scrape_to_files.FOLLOW_FILETYPES)):
+                    yield response.follow(full_url, callback=self.parse)
+
+        def parse_pdf(self, response):
+            with tmpfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+                tmp.write(response.body)
+                tmp.flush()
+                for doc in PyMuPDFLoader(tmp.name).load():
+                    item_hash = hashlib.md5(doc.page_content.encode("utf-8")).hexdigest()
+                    if item_hash not in self.seen_hashes:
+                        self.seen_hashes.add(item_hash)
+                        doc.metadata.update({"source": response.url, "md5": item_hash})
+                        yield {"content": doc.page_content, "metadata": doc.metadata}
+
+    return LegacySpider
+
+
+def run_variant(variant: str, start_url: str, workers: int) -> dict:
+    from scrapy.crawler import CrawlerProcess
+
+    import scrape_to_files
+
+    scrape_to_files.ALLOWED_DOMAINS = {urlparse(start_url).netloc}
+    process = CrawlerProcess(settings={
+        "TWISTED_REACTOR": scrape_to_files.ASYNCIO_REACTOR,
+        "LOG_LEVEL": "WARNING",
+    })
+    if variant == "legacy":
+        crawler = process.create_crawler(legacy_spider())
+        kwargs = {"start_urls": [start_url]}
+    else:
+        crawler = process.create_crawler(scrape_to_files.ContentSpider)
+        kwargs = {"start_urls": [start_url], "extract_workers": workers}
+    started = time.perf_counter()
+    process.crawl(crawler, **kwargs)
+    process.start()
+    elapsed = time.perf_counter() - started
+    responses = crawler.stats.get_value("response_received_count", 0)
+    return {
+        "variant": variant,
+        "seconds": round(elapsed, 2),
+        "responses": responses,
+        "items": crawler.stats.get_value("item_scraped_count", 0),
+        "pages_per_s": round(responses / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--pdfs", type=int, default=40)
+    parser.add_argument("--pdf-pages", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--workers", type=int, default=4, help="extraction processes for the new spider")
+    parser.add_argument("--variant", choices=["legacy", "pool"], help=argparse.SUPPRESS)
+    parser.add_argument("--start-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.start_url, args.workers)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        site = Path(tmp) / "site"
+        site.mkdir()
+        build_site(site, args.pages, args.pdfs, args.pdf_pages)
+        server = serve(site, args.latency_ms)
+        start_url = f"http://127.0.0.1:{server.server_port}/index.html"
+        print(f"fixture: {args.pages} pages, {args.pdfs} PDFs x {args.pdf_pages} pages, "
+              f"{args.latency_ms:.0f} ms latency")
+        try:
+            for variant in ("legacy", "pool"):
+                # A fresh working directory each: the spider keeps its output and crawl state in ./data.
+                workdir = Path(tmp) / variant
+                workdir.mkdir()
+                out = subprocess.run(
+                    [sys.executable, str(Path(__file__).resolve()), "--variant", variant,
+                     "--start-url", start_url, "--workers", str(args.workers)],
+                    cwd=workdir, check=True, capture_output=True, text=True,
+                ).stdout
+                print(json.loads(out.strip().splitlines()[-1]))
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Indexing benchmark on a synthetic corpus: the previous load-everything
+indexer versus the streaming pipeline in index_to_chroma.py.
+
+Each variant runs in its own subprocess against a fresh Chroma directory and
+reports wall time, chunks/s and peak RSS. ``--embeddings fake`` (default)
+uses a deterministic hash embedder so the numbers isolate reading, splitting,
+batching and writing; both variants embed exactly the same chunks, so pass
+``--embeddings torch`` to add the (identical) model cost.
+
+    python bench_indexing.py --docs 100000 --workers 8
+"""
+import argparse
+import json
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+WORDS = ("вступ стипендія кафедра спеціальність навчання бакалавр магістр розклад сесія "
+         "деканат факультет інформатики обчислювальної техніки програмної інженерії "
+         "документи дедлайн конкурс бюджет контракт гуртожиток практика диплом").split()
+
+
+def generate_corpus(path: Path, docs: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    with path.open("w", encoding="utf-8") as fh:
+        for i in range(docs):
+            paragraphs = [" ".join(rng.choices(WORDS, k=rng.randint(40, 120))) for _ in range(rng.randint(1, 8))]
+            fh.write(json.dumps({
+                "content": "\n\n".join(paragraphs),
+                "metadata": {"source": f"https://example.kpi.ua/page/{i}", "md5": f"{seed}-{i}"},
+            }, ensure_ascii=False) + "\n")
+
+
+def _embeddings(kind: str):
+    if kind == "fake":
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        return DeterministicFakeEmbedding(size=384)
+    from index_to_chroma import build_embeddings
+    return build_embeddings(kind, 64).inner
+
+
+def run_legacy(raw_file: Path, persist_dir: Path, kind: str) -> int:
+    from langchain.docstore.document import Document
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain.vectorstores import Chroma
+
+    docs = []
+    with raw_file.open(encoding="utf-8") as fh:
+        for line in fh:
+            rec = json.loads(line)
+            docs.append(Document(page_content=rec["content"], metadata=rec["metadata"]))
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100).split_documents(docs)
+    vectordb = Chroma(collection_name="bench", persist_directory=str(persist_dir),
+                      embedding_function=_embeddings(kind))
+    for i in range(0, len(chunks), 5000):
+        vectordb.add_documents(chunks[i:i + 5000])
+    return len(chunks)
+
+
+def run_pipeline(raw_file: Path, persist_dir: Path, kind: str, workers: int, batch_size: int) -> int:
+    from index_to_chroma import run_index
+    from services.embedding_batcher import CachedEmbeddings
+
+    stats = run_index(raw_file, persist_dir, "bench", workers, batch_size,
+                      embeddings=CachedEmbeddings(_embeddings(kind)), progress_every=30)
+    return stats.embedded
+
+
+def _child(args) -> None:
+    persist_dir = Path(tempfile.mkdtemp(prefix="bench-chroma-"))
+    try:
+        start = time.perf_counter()
+        if args.child == "legacy":
+            chunks = run_legacy(args.raw_file, persist_dir, args.embeddings)
+        else:
+            chunks = run_pipeline(args.raw_file, persist_dir, args.embeddings, args.workers, args.batch_size)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(persist_dir, ignore_errors=True)
+    print(json.dumps({
+        "variant": args.child,
+        "chunks": chunks,
+        "seconds": round(elapsed, 1),
+        "chunks_per_s": round(chunks / elapsed, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }), flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--embeddings", choices=["fake", "torch", "onnx"], default="fake")
+    parser.add_argument("--raw-file", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--child", choices=["legacy", "pipeline"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_file = Path(tmp) / "raw_docs.jsonl"
+        generate_corpus(raw_file, args.docs)
+        for variant in ("legacy", "pipeline"):
+            subprocess.run(
+                [sys.executable, __file__, "--child", variant, "--raw-file", str(raw_file),
+                 "--embeddings", args.embeddings, "--workers", str(args.workers),
+                 "--batch-size", str(args.batch_size)],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Near-duplicate benchmark: index size and retrieval latency with and without
+near_dup.py on a crawl (``--raw-file``) or on a synthetic corpus in which a
+share of documents are lightly edited copies of others, as with news
+reposted across the department sites.
+
+Both variants are indexed with index_to_chroma.run_index; retrieval latency
+is the server's NumpyVectorIndex MMR over the resulting vectors.
+
+    python bench_near_dup.py --docs 5000 --copies 0.4 --threshold 0.8
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bench_indexing import WORDS, _embeddings, generate_corpus
+from index_to_chroma import run_index
+from near_dup import DEFAULT_THRESHOLD, NearDuplicateIndex, dedupe
+from services.embedding_batcher import CachedEmbeddings
+from services.lexical import LEXICAL_INDEX_FILE
+from services.numpy_index import NumpyVectorIndex
+
+
+def add_near_copies(src: Path, dst: Path, share: float, seed: int = 0) -> None:
+    """
+    Copies ``src`` and appends, for ``share`` of its documents, a copy on another
+    URL with a few words replaced and a date line added.
+    """
+    rng = random.Random(seed)
+    with src.open(encoding="utf-8") as fh:
+        records = [json.loads(line) for line in fh]
+    with dst.open("w", encoding="utf-8") as out:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        for i, record in enumerate(rng.sample(records, int(len(records) * share))):
+            words = record["content"].split(" ")
+            for j in rng.sample(range(len(words)), max(1, len(words) // 50)):
+                words[j] = rng.choice(WORDS)
+            out.write(json.dumps({
+                "content": " ".join(words) + f"\n\nОновлено {rng.randint(1, 28)}.0{rng.randint(1, 9)}.2024",
+                "metadata": {"source": f"https://copy.kpi.ua/news/{i}", "md5": f"copy-{i}"},
+            }, ensure_ascii=False) + "\n")
+
+
+def measure(raw_file: Path, persist_dir: Path, kind: str, queries: int) -> dict:
+    import chromadb
+
+    stats = run_index(raw_file, persist_dir, "bench", embeddings=CachedEmbeddings(_embeddings(kind)),
+                      progress_every=60)
+    data = chromadb.PersistentClient(path=str(persist_dir)).get_collection("bench").get(
+        include=["embeddings", "documents", "metadatas"])
+    vectors = np.asarray(data["embeddings"], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = NumpyVectorIndex(vectors, data["ids"], data["documents"], data["metadatas"])
+
+    rng = np.random.default_rng(0)
+    timings = []
+    for _ in range(queries):
+        query = rng.standard_normal(vectors.shape[1]).astype(np.float32)
+        start = time.perf_counter()
+        index.mmr(query, k=5, fetch_k=50, lambda_mult=0.3)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "chunks": stats.embedded,
+        "vectors_mb": round(vectors.nbytes / 2 ** 20, 1),
+        "chroma_mb": round(sum(f.stat().st_size for f in persist_dir.rglob("*") if f.is_file()) / 2 ** 20, 1),
+        "bm25_kb": round((persist_dir / LEXICAL_INDEX_FILE).stat().st_size / 1024, 1),
+        "mmr_p50_ms": round(float(np.percentile(timings, 50)), 3),
+        "mmr_p95_ms": round(float(np.percentile(timings, 95)), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw-file", type=Path, help="a real crawl instead of the synthetic corpus")
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--copies", type=float, default=0.4, help="share of documents that get a near-copy")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--embeddings", choices=["fake", "torch", "onnx"], default="fake")
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        raw_file = args.raw_file
+        if raw_file is None:
+            generate_corpus(tmp / "base.jsonl", args.docs)
+            raw_file = tmp / "raw_docs.jsonl"
+            add_near_copies(tmp / "base.jsonl", raw_file, args.copies)
+
+        index = NearDuplicateIndex(args.threshold)
+        deduped = tmp / "raw_docs.dedup.jsonl"
+        start = time.perf_counter()
+        with raw_file.open(encoding="utf-8") as src, deduped.open("w", encoding="utf-8") as out:
+            kept = sum(out.write(json.dumps(r, ensure_ascii=False) + "\n") > 0
+                       for r in dedupe((json.loads(line) for line in src), index))
+        print(json.dumps({
+            "dedup_seconds": round(time.perf_counter() - start, 2),
+            "kept_docs": kept,
+            "dropped_docs": sum(len(c) for c in index.clusters.values()),
+            "clusters": len(index.clusters),
+        }))
+
+        for variant, path in (("exact", raw_file), ("near_dup", deduped)):
+            print(json.dumps({"variant": variant, **measure(path, tmp / variant, args.embeddings, args.queries)}))
+
+
+if __name__ == "__main__":
+    main()
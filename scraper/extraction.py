@@ -0,0 +1,36 @@
+"""
+CPU-heavy text extraction for scrape_to_files.py.
+
+These functions run in a process pool so Scrapy's reactor keeps downloading
+while pages and PDFs are parsed; they take and return plain picklable data.
+"""
+from typing import Optional
+
+import fitz
+import trafilatura
+
+from near_dup import signature
+
+
+def extract_html(html: str) -> tuple[Optional[str], Optional[list[int]]]:
+    """
+    Returns the page's main text and its MinHash signature (None without text).
+    """
+    text = trafilatura.extract(html, include_comments=False, include_tables=False)
+    return text, signature(text).tolist() if text else None
+
+
+def extract_pdf(body: bytes) -> list[tuple[str, dict, list[int]]]:
+    """
+    Parses a PDF straight from the downloaded bytes into ``(text, metadata,
+    signature)`` per page. Metadata carries the document info plus ``page``
+    (0-based) and ``total_pages``, as PyMuPDFLoader's does.
+    """
+    pages = []
+    with fitz.open(stream=body, filetype="pdf") as pdf:
+        info = {key: value for key, value in (pdf.metadata or {}).items() if value}
+        for page in pdf:
+            text = page.get_text()
+            pages.append((text, {**info, "page": page.number, "total_pages": pdf.page_count},
+                          signature(text).tolist()))
+    return pages
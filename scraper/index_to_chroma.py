@@ -1,39 +1,445 @@
+"""
+Incremental indexer: data/raw_docs.jsonl -> Chroma collection + BM25 index
++ the NumPy snapshot the server memory-maps at startup.
+
+Runs as a streaming pipeline so memory stays bounded regardless of crawl size:
+
+    read JSONL -> split (process pool) -> embed (thread) -> write (thread)
+
+Stages are connected by bounded queues/windows, so a slow stage applies
+back-pressure to the ones before it instead of letting chunks pile up.
+"""
+import argparse
+import hashlib
 import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
 
-from langchain.docstore.document import Document
+import chromadb
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import Chroma
+
+# One embedding layer and one implementation of each artifact the server reads
+# (BM25, NumPy snapshot, ONNX model), so they cannot drift apart; none of these
+# modules needs the server's settings.
+sys.path.append(str(Path(__file__).resolve().parent.parent / "server"))
+from services.embedding_batcher import CachedEmbeddings  # noqa: E402
+from services.lexical import LEXICAL_INDEX_FILE, BM25Index  # noqa: E402
+from services.numpy_index import NUMPY_INDEX_DIR, SNAPSHOT_ONNX_DIR, NumpyVectorIndex  # noqa: E402
+from services.onnx_embeddings import OnnxEmbeddings  # noqa: E402
 
 RAW_FILE = Path("data/raw_docs.jsonl")
+# Written by ``scrape_to_files.py --incremental``.
+DELTA_FILE = Path("data/changes.jsonl")
 COLL_NAME = "fice_docs"
 PERSIST_DIR = "../chroma"
-BATCH_SIZE = 5000
+WRITE_BATCH_SIZE = 1024
+# Same switch as the server's FICE_EMBEDDING_BACKEND: "torch" or "onnx".
+EMBEDDING_BACKEND = os.getenv("FICE_EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("FICE_ONNX_MODEL_DIR", "../models/minilm-onnx-int8")
+# Read by the server to invalidate caches built on a previous index.
+INDEX_VERSION_FILE = "index_version"
+# Document key -> {"md5": ..., "chunks": [chunk ids]} as of the last run.
+MANIFEST_FILE = "index_manifest.json"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+
+_splitter: Optional[RecursiveCharacterTextSplitter] = None
+_DONE = object()
+
+
+def doc_key(metadata: dict) -> str:
+    """
+    Identifies a scraped document across runs: its URL, plus the page for PDFs.
+    """
+    if "page" in metadata:
+        return f"{metadata['source']}#page={metadata['page']}"
+    return metadata["source"]
+
+
+def chunk_id(key: str, text: str) -> str:
+    """
+    Stable chunk id: the same text from the same document always maps to the same id.
+    """
+    return hashlib.md5(f"{key}\0{text}".encode("utf-8")).hexdigest()
+
+
+def load_manifest(persist_dir: Path) -> Optional[dict]:
+    path = persist_dir / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with path.open(encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def save_manifest(persist_dir: Path, manifest: dict) -> None:
+    path = persist_dir / MANIFEST_FILE
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def build_embeddings(backend: str, batch_size: int) -> CachedEmbeddings:
+    # The cache skips re-embedding chunks repeated across pages (footers, shared news).
+    if backend == "onnx":
+        base_emb = OnnxEmbeddings(ONNX_MODEL_DIR, batch_size=batch_size)
+    else:
+        base_emb = HuggingFaceEmbeddings(
+            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+            encode_kwargs={"batch_size": batch_size},
+        )
+    return CachedEmbeddings(base_emb, cache_size=20000)
+
+
+@dataclass
+class Chunk:
+    id: str
+    text: str
+    metadata: dict
+
+
+@dataclass
+class IndexStats:
+    docs: int = 0
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+    skipped: int = 0
+    # Unchanged chunks of changed documents whose metadata was rewritten.
+    relabelled: int = 0
+    embedded: int = 0
+    # The index version written by this run, None if nothing changed.
+    version: Optional[str] = None
+    started_at: float = field(default_factory=time.monotonic)
+
+    def report(self, final: bool = False) -> str:
+        elapsed = time.monotonic() - self.started_at
+        line = (f"{'готово' if final else 'прогрес'}: {self.docs} документів, "
+                f"{self.embedded} чанків вбудовано ({self.embedded / elapsed if elapsed else 0:.1f}/с), "
+                f"{elapsed:.1f} с")
+        if final:
+            line += (f"; додано {self.added}, оновлено {self.updated}, "
+                     f"видалено {self.deleted}, пропущено {self.skipped} чанків "
+                     f"(з них метадані оновлено в {self.relabelled})")
+        return line
+
+
+def read_records(path: Path) -> Iterator[dict]:
+    with path.open(encoding="utf-8") as fh:
+        for line in fh:
+            yield json.loads(line)
+
+
+def delta_records(path: Path, manifest: dict) -> Iterator[dict]:
+    """
+    Applies a crawl delta to ``manifest`` (a copy of the previous one): ``remove``
+    ops drop every document of that URL, ``upsert`` records are yielded for indexing.
+    """
+    for op in read_records(path):
+        if op.get("op") == "remove":
+            source = op["source"]
+            for key in [k for k in manifest if k == source or k.startswith(f"{source}#page=")]:
+                del manifest[key]
+        else:
+            manifest.pop(doc_key(op["metadata"]), None)
+            yield {"content": op["content"], "metadata": op["metadata"]}
+
+
+def doc_md5(record: dict) -> str:
+    """The crawler's content hash, or one of the content for records written without it."""
+    return record["metadata"].get("md5") or hashlib.md5(record["content"].encode("utf-8")).hexdigest()
+
+
+def split_record(record: dict) -> tuple[str, str, list[tuple[str, dict]]]:
+    """
+    Runs in a worker process: returns the document key, its md5 and its chunks.
+    """
+    global _splitter
+    if _splitter is None:
+        # start_index lets the server merge neighbouring chunks without their overlap.
+        _splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+                                                   add_start_index=True)
+    metadata = record["metadata"]
+    chunks = _splitter.create_documents([record["content"]], [metadata])
+    return doc_key(metadata), doc_md5(record), [(chunk.page_content, chunk.metadata) for chunk in chunks]
+
+
+def split_stage(records: Iterable[dict], pool: ProcessPoolExecutor, window: int) \
+        -> Iterator[tuple[str, str, list[tuple[str, dict]]]]:
+    """
+    Splits records in the pool, in order, with at most ``window`` records in flight.
+    """
+    pending: deque = deque()
+    for record in records:
+        pending.append(pool.submit(split_record, record))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def changed_records(records: Iterable[dict], old_manifest: dict, manifest: dict, stats: IndexStats) \
+        -> Iterator[dict]:
+    """
+    Drops documents whose md5 matches the manifest before they are split; the
+    only place unchanged documents are skipped.
+    """
+    for record in records:
+        stats.docs += 1
+        key = doc_key(record["metadata"])
+        previous = old_manifest.get(key)
+        if previous is not None and previous["md5"] == doc_md5(record):
+            manifest[key] = previous
+            stats.skipped += len(previous["chunks"])
+            continue
+        yield record
+
+
+def new_chunks(split_docs: Iterable[tuple[str, str, list[tuple[str, dict]]]],
+               old_manifest: dict, indexed_ids: set, manifest: dict, stats: IndexStats,
+               relabel: Optional[list[tuple[str, dict]]] = None) -> Iterator[Chunk]:
+    """
+    Yields the chunks to embed from the new or changed documents that
+    ``changed_records`` let through. Chunks of a changed document whose text is
+    already indexed are not re-embedded, but their new metadata (``md5``,
+    title, and the ``start_index`` the server merges neighbours by) is
+    appended to ``relabel`` as ``(chunk id, metadata)``.
+    """
+    for key, md5, pieces in split_docs:
+        previous = old_manifest.get(key)
+        ids = manifest.setdefault(key, {"md5": md5, "chunks": []})["chunks"]
+        seen = set(ids)
+        for text, metadata in pieces:
+            cid = chunk_id(key, text)
+            if cid in seen:
+                continue
+            seen.add(cid)
+            ids.append(cid)
+            if cid in indexed_ids:
+                stats.skipped += 1
+                if previous is not None and relabel is not None:
+                    relabel.append((cid, metadata))
+                continue
+            if previous is None:
+                stats.added += 1
+            else:
+                stats.updated += 1
+            yield Chunk(cid, text, metadata)
+
+
+def batched(chunks: Iterable[Chunk], size: int) -> Iterator[list[Chunk]]:
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _start(target, *args) -> tuple[threading.Thread, list]:
+    errors: list = []
+
+    def run():
+        try:
+            target(*args)
+        except BaseException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, errors
+
+
+def _put(q: queue.Queue, item, consumer: threading.Thread) -> bool:
+    """
+    Blocks while the queue is full (back-pressure), but gives up if its consumer died.
+    """
+    while consumer.is_alive():
+        try:
+            q.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _embed_loop(embed_queue: queue.Queue, write_queue: queue.Queue,
+                emb: CachedEmbeddings, stats: IndexStats) -> None:
+    try:
+        while (batch := embed_queue.get()) is not _DONE:
+            vectors = emb.embed_documents([chunk.text for chunk in batch])
+            write_queue.put((batch, vectors))
+            stats.embedded += len(batch)
+    finally:
+        write_queue.put(_DONE)
+
+
+def _write_loop(write_queue: queue.Queue, collection, write_batch_size: int) -> None:
+    pending_chunks: list[Chunk] = []
+    pending_vectors: list = []
+
+    def flush():
+        if pending_chunks:
+            collection.upsert(
+                ids=[c.id for c in pending_chunks],
+                documents=[c.text for c in pending_chunks],
+                metadatas=[c.metadata for c in pending_chunks],
+                embeddings=pending_vectors,
+            )
+            pending_chunks.clear()
+            pending_vectors.clear()
+
+    try:
+        while (item := write_queue.get()) is not _DONE:
+            batch, vectors = item
+            pending_chunks.extend(batch)
+            pending_vectors.extend(vectors)
+            if len(pending_chunks) >= write_batch_size:
+                flush()
+        flush()
+    except BaseException:
+        # Keep draining so the embedding thread is never stuck on a full queue.
+        while write_queue.get() is not _DONE:
+            pass
+        raise
+
+
+def collection_documents(collection, page_size: int = 5000) -> Iterator[tuple[str, str]]:
+    offset = 0
+    while True:
+        page = collection.get(include=["documents"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield from zip(page["ids"], page["documents"])
+        offset += page_size
+
+
+def run_index(raw_file: Path = RAW_FILE,
+              persist_dir: Path = Path(PERSIST_DIR),
+              collection_name: str = COLL_NAME,
+              workers: int = os.cpu_count() or 1,
+              batch_size: int = 64,
+              write_batch_size: int = WRITE_BATCH_SIZE,
+              embeddings: Optional[CachedEmbeddings] = None,
+              progress_every: float = 10.0,
+              delta_file: Optional[Path] = None,
+              snapshot_onnx: bool = False) -> IndexStats:
+    """
+    Indexes ``raw_file`` (a full crawl: documents missing from it are deleted), or,
+    with ``delta_file``, only the changes recorded there on top of the previous run.
+    With ``snapshot_onnx`` the ONNX model is copied into the snapshot, so the
+    server can load it from there.
+    """
+    stats = IndexStats()
+    client = chromadb.PersistentClient(path=str(persist_dir))
+    collection = client.get_or_create_collection(collection_name)
+
+    old_manifest = load_manifest(persist_dir)
+    if delta_file is not None and old_manifest is None:
+        raise FileNotFoundError(f"{persist_dir / MANIFEST_FILE} is missing: run a full index before a delta")
+    if old_manifest is not None:
+        indexed_ids = {cid for entry in old_manifest.values() for cid in entry["chunks"]}
+    else:
+        # A collection built before the manifest existed has random chunk ids; treat them all as stale.
+        old_manifest = {}
+        indexed_ids = set(collection.get(include=[])["ids"])
+    # A delta only touches the documents it mentions; everything else carries over.
+    manifest: dict = dict(old_manifest) if delta_file is not None else {}
+    relabel: list[tuple[str, dict]] = []
+
+    emb = embeddings
+    embed_queue: queue.Queue = queue.Queue(maxsize=2)
+    write_queue: queue.Queue = queue.Queue(maxsize=2)
+    embedder = writer = None
+    next_report = time.monotonic() + progress_every
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        source = delta_records(delta_file, manifest) if delta_file is not None else read_records(raw_file)
+        records = changed_records(source, old_manifest, manifest, stats)
+        chunks = new_chunks(split_stage(records, pool, window=workers * 4),
+                            old_manifest, indexed_ids, manifest, stats, relabel)
+        for batch in batched(chunks, batch_size):
+            if embedder is None:
+                # Load the model only once there is something to embed: a no-op run never pays for it.
+                emb = emb or build_embeddings(EMBEDDING_BACKEND, batch_size)
+                embedder = _start(_embed_loop, embed_queue, write_queue, emb, stats)
+                writer = _start(_write_loop, write_queue, collection, write_batch_size)
+            if writer[1] or not _put(embed_queue, batch, embedder[0]):
+                break
+            if time.monotonic() >= next_report:
+                print(stats.report(), flush=True)
+                next_report = time.monotonic() + progress_every
+
+    if embedder is not None:
+        _put(embed_queue, _DONE, embedder[0])
+        for thread, errors in (embedder, writer):
+            thread.join()
+            if errors:
+                raise errors[0]
 
-docs: list[Document] = []
-with RAW_FILE.open(encoding="utf-8") as fh:
-    for line in fh:
-        rec = json.loads(line)
-        docs.append(Document(page_content=rec["content"], metadata=rec["metadata"]))
+    live_ids = {cid for entry in manifest.values() for cid in entry["chunks"]}
+    stale_ids = sorted(indexed_ids - live_ids)
+    stats.deleted = len(stale_ids)
+    for i in range(0, len(stale_ids), write_batch_size):
+        collection.delete(ids=stale_ids[i:i + write_batch_size])
+    # Metadata only: the stored vectors and texts stay.
+    stats.relabelled = len(relabel)
+    for i in range(0, len(relabel), write_batch_size):
+        batch = relabel[i:i + write_batch_size]
+        collection.update(ids=[cid for cid, _ in batch], metadatas=[metadata for _, metadata in batch])
 
-splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-chunks = splitter.split_documents(docs)
+    if stats.added or stats.updated or stale_ids or relabel or not (persist_dir / MANIFEST_FILE).exists():
+        version = uuid.uuid4().hex
+        BM25Index.build(collection_documents(collection)).save(persist_dir / LEXICAL_INDEX_FILE)
+        # Written before the version, so a server that sees the new version never finds an older snapshot.
+        snapshot_dir = persist_dir / NUMPY_INDEX_DIR
+        NumpyVectorIndex.from_chroma(collection, version).save(snapshot_dir)
+        if snapshot_onnx:
+            shutil.copytree(ONNX_MODEL_DIR, snapshot_dir / SNAPSHOT_ONNX_DIR, dirs_exist_ok=True)
+        save_manifest(persist_dir, manifest)
+        (persist_dir / INDEX_VERSION_FILE).write_text(version, encoding="utf-8")
+        stats.version = version
+    return stats
 
-emb = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-)
 
-vectordb = Chroma(
-    collection_name=COLL_NAME,
-    persist_directory=PERSIST_DIR,
-    embedding_function=emb,
-)
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Index scraped documents into Chroma")
+    parser.add_argument("--raw-file", type=Path, default=RAW_FILE)
+    parser.add_argument("--persist-dir", type=Path, default=Path(PERSIST_DIR))
+    parser.add_argument("--collection", default=COLL_NAME)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes used to split documents into chunks")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="chunks per embedding forward pass")
+    parser.add_argument("--write-batch-size", type=int, default=WRITE_BATCH_SIZE,
+                        help="chunks per Chroma upsert")
+    parser.add_argument("--delta", type=Path, nargs="?", const=DELTA_FILE, default=None,
+                        help=f"apply an incremental crawl delta (default {DELTA_FILE}) instead of --raw-file")
+    parser.add_argument("--snapshot-onnx", action="store_true",
+                        help=f"copy the ONNX model ({ONNX_MODEL_DIR}) into the index snapshot")
+    args = parser.parse_args()
 
-for i in range(0, len(chunks), BATCH_SIZE):
-    batch = chunks[i:i + BATCH_SIZE]
-    vectordb.add_documents(batch)
+    stats = run_index(args.raw_file, args.persist_dir, args.collection,
+                      args.workers, args.batch_size, args.write_batch_size, delta_file=args.delta,
+                      snapshot_onnx=args.snapshot_onnx)
+    print(f"Chroma «{args.collection}» (директорія: {args.persist_dir}): {stats.report(final=True)}")
+    # The FAQ is bound to the index version written above.
+    if stats.version is not None:
+        print(f"Нова версія індексу {stats.version}: оновіть FAQ командою `python -m jobs.mine_faq` у директорії server")
 
-vectordb.persist()
 
-print(f"Додано {len(chunks)} чанків у Chroma «{COLL_NAME}» (директорія: {PERSIST_DIR})")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
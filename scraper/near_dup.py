@@ -0,0 +1,172 @@
+"""
+Near-duplicate detection for scraped texts.
+
+Each text gets a MinHash signature over its word shingles; LSH buckets the
+signatures by bands so a new text is only compared with likely matches. The
+first text of a cluster is its canonical copy and keeps its own source URL;
+later near-copies are dropped and listed in the cluster report.
+
+Also usable on an existing crawl before indexing:
+
+    python near_dup.py --in data/raw_docs.jsonl --out data/raw_docs.dedup.jsonl
+"""
+import argparse
+import json
+import re
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.8
+
+_WORD = re.compile(r"\w+")
+# Universal hashing modulo a prime just above 2**32 (crc32 range); a < 2**31 keeps a * x within uint64.
+_PRIME = np.uint64(4294967311)
+_rng = np.random.RandomState(20240501)
+_A = _rng.randint(1, 2 ** 31, NUM_PERM, dtype=np.int64).astype(np.uint64)
+_B = _rng.randint(0, 2 ** 31, NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def signature(text: str) -> np.ndarray:
+    """
+    MinHash signature (``NUM_PERM`` uint64 values) of the text's word shingles.
+    """
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64)
+    if not len(hashes):
+        return np.full(NUM_PERM, _PRIME, dtype=np.uint64)
+    return ((hashes[:, None] * _A + _B) % _PRIME).min(axis=0)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def lsh_bands(threshold: float, num_perm: int = NUM_PERM) -> tuple[int, int]:
+    """
+    ``(bands, rows)`` whose S-curve midpoint ``(1 / bands) ** (1 / rows)`` is
+    closest to ``threshold``, rounding towards recall: candidates are verified anyway.
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [o for o in options if (1 / o[0]) ** (1 / o[1]) <= threshold] or options
+    return min(below, key=lambda o: threshold - (1 / o[0]) ** (1 / o[1]))
+
+
+class NearDuplicateIndex:
+    """
+    Online MinHash-LSH index: ``match`` returns the canonical key of an already
+    added near-duplicate, ``add`` registers a new canonical text.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.bands, self.rows = lsh_bands(threshold)
+        self._buckets: list[dict[bytes, list[str]]] = [defaultdict(list) for _ in range(self.bands)]
+        self._signatures: dict[str, np.ndarray] = {}
+        self.clusters: dict[str, list[tuple[str, float]]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _band_keys(self, sig: np.ndarray) -> Iterator[tuple[int, bytes]]:
+        for band in range(self.bands):
+            yield band, sig[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key: str, sig: Sequence[int]) -> None:
+        sig = np.asarray(sig, dtype=np.uint64)
+        self._signatures[key] = sig
+        for band, band_key in self._band_keys(sig):
+            self._buckets[band][band_key].append(key)
+
+    def discard(self, url: str) -> None:
+        """Forgets the texts of ``url`` (its keys ``url`` and ``url#...``); their buckets are skipped lazily."""
+        for key in [k for k in self._signatures if k == url or k.startswith(f"{url}#")]:
+            del self._signatures[key]
+
+    def match(self, sig: Sequence[int], exclude: Optional[str] = None) -> Optional[tuple[str, float]]:
+        """
+        Best ``(key, similarity)`` at or above the threshold, ignoring keys of the
+        ``exclude`` URL (its previous version when a page is re-crawled).
+        """
+        sig = np.asarray(sig, dtype=np.uint64)
+        candidates = {key for band, band_key in self._band_keys(sig)
+                      for key in self._buckets[band].get(band_key, ())}
+        best = None
+        for key in candidates:
+            if key not in self._signatures or (exclude and (key == exclude or key.startswith(f"{exclude}#"))):
+                continue
+            score = similarity(sig, self._signatures[key])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def check(self, key: str, sig: Sequence[int], exclude: Optional[str] = None) -> Optional[str]:
+        """
+        Returns the canonical key if ``sig`` nearly duplicates an indexed text
+        (recording ``key`` in its cluster); otherwise adds it and returns None.
+        """
+        found = self.match(sig, exclude)
+        if found is None:
+            self.add(key, sig)
+            return None
+        canonical, score = found
+        self.clusters[canonical].append((key, round(score, 3)))
+        return canonical
+
+    def report(self) -> dict:
+        """Collapsed clusters: canonical key -> near-copies with their similarity."""
+        return {canonical: [{"source": key, "similarity": score} for key, score in copies]
+                for canonical, copies in sorted(self.clusters.items())}
+
+    def save_report(self, path: Path) -> None:
+        with path.open("w", encoding="utf-8") as fh:
+            json.dump({"threshold": self.threshold, "clusters": self.report()}, fh, ensure_ascii=False, indent=1)
+
+
+def record_key(metadata: dict) -> str:
+    if "page" in metadata:
+        return f"{metadata['source']}#page={metadata['page']}"
+    return metadata["source"]
+
+
+def dedupe(records: Iterable[dict], index: NearDuplicateIndex) -> Iterator[dict]:
+    """Yields the canonical records, in order, dropping near-copies of earlier ones."""
+    for record in records:
+        if index.check(record_key(record["metadata"]), signature(record["content"])) is None:
+            yield record
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drop near-duplicate documents from a crawl")
+    parser.add_argument("--in", dest="src", type=Path, default=Path("data/raw_docs.jsonl"))
+    parser.add_argument("--out", type=Path, default=Path("data/raw_docs.dedup.jsonl"))
+    parser.add_argument("--report", type=Path, default=Path("data/near_duplicates.json"))
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    index = NearDuplicateIndex(args.threshold)
+    kept = 0
+    with args.src.open(encoding="utf-8") as src, args.out.open("w", encoding="utf-8") as out:
+        for record in dedupe((json.loads(line) for line in src), index):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            kept += 1
+        total = kept + sum(len(copies) for copies in index.clusters.values())
+    index.save_report(args.report)
+    print(f"Залишено {kept} з {total} документів, {len(index.clusters)} кластерів дублікатів "
+          f"(звіт: {args.report})")
+
+
+if __name__ == "__main__":
+    main()
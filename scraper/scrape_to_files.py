@@ -1,13 +1,22 @@
+import argparse
+import asyncio
 import hashlib
 import json
-import tempfile
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Iterator, Optional
 from urllib.parse import urlparse, urljoin, urldefrag
 
 import scrapy
-import trafilatura
-from langchain_community.document_loaders import PyMuPDFLoader
+from scrapy import signals
 from scrapy.crawler import CrawlerProcess
+from scrapy.exceptions import DontCloseSpider
+
+from extraction import extract_html, extract_pdf
+from near_dup import DEFAULT_THRESHOLD, NearDuplicateIndex
 
 START_URLS = [
     "https://fiot.kpi.ua/",
@@ -22,11 +31,124 @@ START_URLS = [
 RAW_PATH = Path("data")
 RAW_PATH.mkdir(parents=True, exist_ok=True)
 OUT_FILE = RAW_PATH / "raw_docs.jsonl"
+# Incremental mode: per-URL validators and hashes, kept between runs.
+CRAWL_STATE_FILE = RAW_PATH / "crawl_state.json"
+# Incremental mode: {"op": "remove", "source": url} / {"op": "upsert", content, metadata} lines
+# for index_to_chroma.py --delta.
+DELTA_FILE = RAW_PATH / "changes.jsonl"
+NEW_ITEMS_FILE = RAW_PATH / "raw_docs.new.jsonl"
+# Near-copies dropped by this crawl, grouped under the canonical URL that was kept.
+NEAR_DUP_REPORT = RAW_PATH / "near_duplicates.json"
 MAX_DEPTH = 5
+# Processes parsing HTML/PDF off the reactor thread.
+EXTRACT_WORKERS = os.cpu_count() or 1
+# Callbacks await the extraction pool, which needs Twisted on top of asyncio.
+ASYNCIO_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 FOLLOW_FILETYPES = (".html", ".php", ".pdf", "/")
+# The only answers taken as proof that a page was removed; timeouts and other errors are not.
+GONE_STATUSES = (404, 410)
 
 ALLOWED_DOMAINS = {urlparse(url).netloc for url in START_URLS}
 
+
+class CrawlState:
+    """
+    What the previous crawls saw at each URL: HTTP validators (ETag,
+    Last-Modified), a hash of the content, the hashes and MinHash signatures of
+    the items it produced, the links it contained and when it was last seen.
+    A page whose texts were dropped as copies also records the canonical URLs
+    it duplicates.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.pages: dict[str, dict] = {}
+        if path.exists():
+            with path.open(encoding="utf-8") as fh:
+                self.pages = json.load(fh)
+        self.seen: set[str] = set()
+
+    def conditional_headers(self, url: str) -> dict:
+        page = self.pages.get(url, {})
+        headers = {}
+        if page.get("etag"):
+            headers["If-None-Match"] = page["etag"]
+        if page.get("last_modified"):
+            headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    def is_unchanged(self, url: str, content_md5: str) -> bool:
+        page = self.pages.get(url)
+        return page is not None and page.get("content_md5") == content_md5
+
+    def links(self, url: str) -> list[str]:
+        return self.pages.get(url, {}).get("links", [])
+
+    def item_owners(self) -> dict[str, str]:
+        """Item hash -> the URL that produced it."""
+        return {h: url for url, page in self.pages.items() for h in page.get("items", [])}
+
+    def duplicates_of(self, url: str) -> list[str]:
+        """URLs whose texts were dropped as copies of ``url``'s."""
+        return [other for other, page in self.pages.items() if url in page.get("duplicate_of", ())]
+
+    def signatures(self) -> Iterator[tuple[str, list[int]]]:
+        for page in self.pages.values():
+            yield from page.get("signatures", {}).items()
+
+    def mark_seen(self, url: str) -> None:
+        self.seen.add(url)
+        if url in self.pages:
+            self.pages[url]["last_seen"] = _now()
+
+    def update(self, url: str, response, content_md5: str,
+               items: Optional[list[str]] = None, links: Optional[list[str]] = None,
+               signatures: Optional[dict[str, list[int]]] = None,
+               duplicate_of: Optional[set[str]] = None) -> None:
+        page = self.pages.get(url, {})
+        page.update({
+            "etag": _header(response, "ETag"),
+            "last_modified": _header(response, "Last-Modified"),
+            "content_md5": content_md5,
+            "last_seen": _now(),
+        })
+        page.pop("duplicate_of", None)
+        if duplicate_of:
+            # Not recorded as fresh: re-parsed on every crawl, so a copy comes back
+            # once its canonical changes or disappears.
+            page.update({"etag": None, "last_modified": None, "content_md5": None,
+                         "duplicate_of": sorted(duplicate_of)})
+        if items is not None:
+            page["items"] = items
+        if links is not None:
+            page["links"] = links
+        if signatures is not None:
+            page["signatures"] = signatures
+        self.pages[url] = page
+        self.seen.add(url)
+
+    def unseen(self) -> list[str]:
+        return [url for url in self.pages if url not in self.seen]
+
+    def remove(self, url: str) -> None:
+        self.pages.pop(url, None)
+
+    def save(self) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as fh:
+            json.dump(self.pages, fh, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+def _header(response, name: str) -> Optional[str]:
+    value = response.headers.get(name)
+    return value.decode("latin-1") if value else None
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
 class ContentSpider(scrapy.Spider):
     name = "content"
     start_urls = START_URLS
@@ -37,23 +159,166 @@ class ContentSpider(scrapy.Spider):
         "ITEM_PIPELINES": {__name__ + ".JsonlPipeline": 300},
         "LOG_LEVEL": "INFO",
     }
+    handle_httpstatus_list = [304]
+
+    def __init__(self, incremental: bool = False, extract_workers: int = EXTRACT_WORKERS,
+                 near_dup_threshold: float = DEFAULT_THRESHOLD, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.incremental = incremental
+        self.state = CrawlState(CRAWL_STATE_FILE)
+        self.changed_sources: set[str] = set()
+        # URLs answered with a GONE_STATUSES code.
+        self.gone: set[str] = set()
+        self._verified_unseen = False
+        self.extract_pool = ProcessPoolExecutor(max_workers=int(extract_workers))
+        self.near_dups = NearDuplicateIndex(float(near_dup_threshold))
+        # Item hash -> URL of the text kept for it.
+        self.item_owners: dict[str, str] = {}
+        if incremental:
+            # Unchanged pages are not re-parsed, but their texts still count as seen.
+            self.item_owners.update(self.state.item_owners())
+            for key, sig in self.state.signatures():
+                self.near_dups.add(key, sig)
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.verify_unseen, signal=signals.spider_idle)
+        return spider
+
+    def start_requests(self):
+        for url in self.start_urls:
+            yield self._request(url)
+
+    def _request(self, url: str, recheck: bool = False) -> scrapy.Request:
+        """``recheck`` fetches ``url`` again even if this crawl already did."""
+        headers = self.state.conditional_headers(url) if self.incremental else {}
+        return scrapy.Request(url, callback=self.parse, errback=self.on_error, headers=headers,
+                              dont_filter=recheck)
+
+    def on_error(self, failure):
+        """
+        A request that failed (timeout, a 5xx after retries, another non-2xx)
+        says nothing about whether the page still exists: its stored state is
+        kept and its stored links are still followed. Only a 404 or 410 marks
+        the URL as gone.
+        """
+        url = failure.request.url
+        response = getattr(failure.value, "response", None)
+        if response is not None and response.status in GONE_STATUSES:
+            self.gone.add(url)
+            if self.incremental:
+                yield from self._release_copies(url)
+            return
+        self.logger.warning("Запит %s не вдався (%r); попередній стан сторінки збережено", url, failure.value)
+        if self.incremental:
+            self.state.mark_seen(url)
+        for link in self.state.links(url):
+            yield self._request(link)
+
+    def verify_unseen(self):
+        """
+        Before an incremental crawl closes, requests the known URLs no link led
+        to, so a page is removed only on its own 404/410.
+        """
+        if not self.incremental or self._verified_unseen:
+            return
+        self._verified_unseen = True
+        unseen = [url for url in self.state.unseen() if url not in self.gone]
+        for url in unseen:
+            self.crawler.engine.crawl(self._request(url))
+        if unseen:
+            raise DontCloseSpider
+
+    async def _extract(self, fn, *args):
+        """
+        Runs ``fn`` in the extraction pool without blocking the reactor.
+        """
+        return await asyncio.wrap_future(self.extract_pool.submit(fn, *args))
 
-    seen_hashes: set[str] = set()
+    def _canonical(self, key: str, url: str, item_hash: str, sig: list[int]) -> Optional[str]:
+        """
+        The URL of a text kept earlier that this one copies, or None if it is new.
+        Exact copies are caught by md5; near-copies (shared news, footers with small
+        edits) by MinHash against every text kept so far, except ``url``'s own
+        previous version.
+        """
+        owner = self.item_owners.get(item_hash)
+        if owner is not None and owner != url:
+            return owner
+        self.item_owners[item_hash] = url
+        canonical = self.near_dups.check(key, sig, exclude=url)
+        return canonical.split("#", 1)[0] if canonical is not None else None
 
-    def parse(self, response, **kwargs):
+    def _release_copies(self, url: str) -> Iterator[scrapy.Request]:
+        """
+        ``url``'s previous texts are leaving the index: forgets them and
+        fetches again the pages whose texts were dropped as their copies.
+        """
+        self.near_dups.discard(url)
+        self.item_owners = {h: owner for h, owner in self.item_owners.items() if owner != url}
+        for copy in self.state.duplicates_of(url):
+            yield self._request(copy, recheck=True)
+
+    def _changed(self, url: str) -> Optional[dict]:
+        """
+        Marks ``url`` as changed; a URL indexed before gets a ``remove`` marker
+        so the indexer drops its old chunks before the new ones arrive.
+        """
+        self.changed_sources.add(url)
+        if url in self.state.pages:
+            return {"op": "remove", "source": url}
+        return None
+
+    async def parse(self, response, **kwargs):
         url = response.url
 
+        if response.status == 304:
+            # Unchanged since the last crawl: nothing to extract, but keep walking its links.
+            self.state.mark_seen(url)
+            for link in self.state.links(url):
+                yield self._request(link)
+            return
+
         if url.lower().endswith(".pdf"):
-            yield scrapy.Request(url, callback=self.parse_pdf, dont_filter=True)
+            async for item in self.parse_pdf(response):
+                yield item
             return
 
-        text = trafilatura.extract(
-            response.text, include_comments=False, include_tables=False
-        )
+        links = []
+        for href in response.css("a::attr(href)").getall():
+            full_url = urljoin(url, href)
+            full_url, _ = urldefrag(full_url)
+
+            parsed = urlparse(full_url)
+            if (
+                    parsed.netloc in ALLOWED_DOMAINS
+                    and any(parsed.path.lower().endswith(ext) for ext in FOLLOW_FILETYPES)
+            ):
+                links.append(full_url)
+        # Schedule the links first so downloads go on while this page is extracted.
+        for link in links:
+            yield self._request(link)
+
+        text, sig = await self._extract(extract_html, response.text)
+        content_md5 = hashlib.md5((text or "").encode("utf-8")).hexdigest()
+        if self.incremental and self.state.is_unchanged(url, content_md5):
+            self.state.update(url, response, content_md5, links=links)
+            return
+
+        if self.incremental and (marker := self._changed(url)):
+            yield marker
+            copies = list(self._release_copies(url))
+        else:
+            copies = []
+        items, signatures, duplicate_of = [], {}, set()
         if text:
-            item_hash = hashlib.md5(text.encode("utf-8")).hexdigest()
-            if item_hash not in self.seen_hashes:
-                self.seen_hashes.add(item_hash)
+            item_hash = content_md5
+            if canonical := self._canonical(url, url, item_hash, sig):
+                duplicate_of.add(canonical)
+            else:
+                items.append(item_hash)
+                signatures[url] = sig
                 yield {
                     "content": text,
                     "metadata": {
@@ -63,47 +328,121 @@ class ContentSpider(scrapy.Spider):
                         "language": response.css("html::attr(lang)").get(default="uk"),
                     },
                 }
+        self.state.update(url, response, content_md5, items=items, links=links, signatures=signatures,
+                          duplicate_of=duplicate_of)
+        # After the page's own new texts, so its copies are compared against them.
+        for request in copies:
+            yield request
 
-        for href in response.css("a::attr(href)").getall():
-            full_url = urljoin(url, href)
-            full_url, _ = urldefrag(full_url)
+    async def parse_pdf(self, response):
+        # The raw bytes decide whether the PDF changed, so an unchanged one is not parsed at all.
+        content_md5 = hashlib.md5(response.body).hexdigest()
+        if self.incremental and self.state.is_unchanged(response.url, content_md5):
+            self.state.update(response.url, response, content_md5)
+            return
 
-            parsed = urlparse(full_url)
-            if (
-                    parsed.netloc in ALLOWED_DOMAINS
-                    and any(parsed.path.lower().endswith(ext) for ext in FOLLOW_FILETYPES)
-            ):
-                yield response.follow(full_url, callback=self.parse)
+        if self.incremental and (marker := self._changed(response.url)):
+            yield marker
+            copies = list(self._release_copies(response.url))
+        else:
+            copies = []
+        items, signatures, duplicate_of = [], {}, set()
+        for page_content, metadata, sig in await self._extract(extract_pdf, response.body):
+            item_hash = hashlib.md5(page_content.encode("utf-8")).hexdigest()
+            key = f"{response.url}#page={metadata['page']}"
+            if canonical := self._canonical(key, response.url, item_hash, sig):
+                duplicate_of.add(canonical)
+            else:
+                items.append(item_hash)
+                signatures[key] = sig
+                metadata.update({"source": response.url, "md5": item_hash})
+                yield {"content": page_content, "metadata": metadata}
+        self.state.update(response.url, response, content_md5, items=items, signatures=signatures,
+                          duplicate_of=duplicate_of)
+        for request in copies:
+            yield request
 
-    def parse_pdf(self, response):
-        with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
-            tmp.write(response.body)
-            tmp.flush()
-            for doc in PyMuPDFLoader(tmp.name).load():
-                item_hash = hashlib.md5(doc.page_content.encode("utf-8")).hexdigest()
-                if item_hash not in self.seen_hashes:
-                    self.seen_hashes.add(item_hash)
-                    doc.metadata.update({"source": response.url, "md5": item_hash})
-                    yield {"content": doc.page_content, "metadata": doc.metadata}
+    def closed(self, reason):
+        self.extract_pool.shutdown(cancel_futures=True)
+        self.near_dups.save_report(NEAR_DUP_REPORT)
+        print(f"\nВідкинуто {sum(len(c) for c in self.near_dups.clusters.values())} майже-дублікатів "
+              f"у {len(self.near_dups.clusters)} кластерах ({NEAR_DUP_REPORT})")
+        if not self.incremental:
+            # A full crawl rewrote raw_docs.jsonl; the state just has to match it.
+            if reason == "finished":
+                for url in self.state.unseen():
+                    self.state.remove(url)
+            self.state.save()
+            return
+
+        # Only a 404/410 proves that a page disappeared; unreachable or failing pages are kept.
+        removed = sorted(url for url in self.gone if url in self.state.pages)
+        with DELTA_FILE.open("a", encoding="utf-8") as delta:
+            for url in removed:
+                delta.write(json.dumps({"op": "remove", "source": url}, ensure_ascii=False) + "\n")
+                self.state.remove(url)
+
+        # Rewrite the full snapshot: previous records minus changed/removed pages, plus the new ones.
+        dropped = self.changed_sources | set(removed)
+        tmp = OUT_FILE.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as out:
+            if OUT_FILE.exists():
+                with OUT_FILE.open(encoding="utf-8") as old:
+                    for line in old:
+                        if json.loads(line)["metadata"]["source"] not in dropped:
+                            out.write(line)
+            with NEW_ITEMS_FILE.open(encoding="utf-8") as new:
+                shutil.copyfileobj(new, out)
+        os.replace(tmp, OUT_FILE)
+        NEW_ITEMS_FILE.unlink()
+        self.state.save()
+        print(f"\nЗміни: {len(self.changed_sources)} нових/змінених, {len(removed)} видалених URL "
+              f"у {DELTA_FILE}")
 
 
 class JsonlPipeline:
     def open_spider(self, spider):
-        self.fh = OUT_FILE.open("w", encoding="utf-8")
+        self.count = 0
+        if spider.incremental:
+            self.fh = NEW_ITEMS_FILE.open("w", encoding="utf-8")
+            self.delta = DELTA_FILE.open("w", encoding="utf-8")
+        else:
+            self.fh = OUT_FILE.open("w", encoding="utf-8")
+            self.delta = None
 
     def close_spider(self, spider):
         self.fh.close()
-        print(f"\nЗбережено {len(ContentSpider.seen_hashes)} "
+        if self.delta:
+            self.delta.close()
+        print(f"\nЗбережено {self.count} "
               f"унікальних документів у {OUT_FILE}")
 
     def process_item(self, item, spider):
-        self.fh.write(json.dumps(item, ensure_ascii=False) + "\n")
+        if item.get("op") == "remove":
+            self.delta.write(json.dumps(item, ensure_ascii=False) + "\n")
+            return item
+        line = json.dumps(item, ensure_ascii=False)
+        self.fh.write(line + "\n")
+        if self.delta:
+            self.delta.write(json.dumps({"op": "upsert", **item}, ensure_ascii=False) + "\n")
+        self.count += 1
         return item
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl the faculty sites into data/raw_docs.jsonl")
+    parser.add_argument("--incremental", action="store_true",
+                        help="send conditional requests, skip unchanged pages and write a delta")
+    parser.add_argument("--extract-workers", type=int, default=EXTRACT_WORKERS,
+                        help="processes parsing HTML and PDFs")
+    parser.add_argument("--near-dup-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="estimated Jaccard similarity above which a text is dropped as a near-copy")
+    args = parser.parse_args()
+
     process = CrawlerProcess(settings={
         "USER_AGENT": "KPISpider/1.0 (+https://fiot.kpi.ua)",
+        "TWISTED_REACTOR": ASYNCIO_REACTOR,
     })
-    process.crawl(ContentSpider)
+    process.crawl(ContentSpider, incremental=args.incremental, extract_workers=args.extract_workers,
+                  near_dup_threshold=args.near_dup_threshold)
     process.start()
@@ -0,0 +1,43 @@
+from fastapi import APIRouter
+
+from api.deps import ApiKey
+from services.answer_cache import get_answer_cache
+from services.embeddings import get_embeddings
+from services.faq import get_faq_store
+from services.rag import get_chain_registry
+from services.sessions import get_session_store
+
+router = APIRouter(prefix="/admin")
+
+
+@router.post("/reload", dependencies=[ApiKey])
+def reload_chain():
+    get_chain_registry().reload()
+    return {"status": "reloaded"}
+
+
+@router.get("/cache", dependencies=[ApiKey])
+def answer_cache_stats():
+    cache = get_answer_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+
+@router.get("/condense", dependencies=[ApiKey])
+def condense_stats():
+    return get_chain_registry().get().condenser.stats()
+
+
+@router.get("/embeddings", dependencies=[ApiKey])
+def embedding_stats():
+    return get_embeddings().stats()
+
+
+@router.get("/faq", dependencies=[ApiKey])
+def faq_stats():
+    faq = get_faq_store()
+    return faq.stats() if faq else {"enabled": False}
+
+
+@router.get("/sessions", dependencies=[ApiKey])
+def session_stats():
+    return get_session_store().stats()
@@ -1,35 +1,160 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Tuple
-from langchain.chains import ConversationalRetrievalChain
+import json
+import logging
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
 
-from schemas import ChatReq, ChatResp
-from api.deps import QAChain, ApiKey
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from schemas import ChatReq, ChatResp, Msg
+from api.deps import QAChain, ApiKey, Sessions
+from core.config import get_settings
+from services.admission import Overloaded, current_client
+from services.llm import get_llm_slots
+from services.rag import RagPipeline
+from services.sessions import SessionState
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Called with (standalone question, answer) once an answer is complete.
+OnAnswer = Callable[[str, str], Awaitable[None]]
+# Seconds a shed client is told to wait before retrying.
+BUSY_RETRY_AFTER = 5
 
-@router.post("/chat", response_model=ChatResp, dependencies=[ApiKey])
-async def chat_endpoint(
-        req: ChatReq,
-        qa_chain: ConversationalRetrievalChain = QAChain
-):
-    if not req.conversation:
-        raise HTTPException(400, "Empty dialog")
 
-    user_question = req.conversation[-1].content.strip()
+def _history(messages: List[Msg]) -> List[Tuple[str, str]]:
     history: List[Tuple[str, str]] = []
 
     last_user_msg = None
-    for msg in req.conversation[:-1]:
+    for msg in messages:
         if msg.role == "user":
             last_user_msg = msg.content
         elif msg.role != "user" and last_user_msg:
             history.append ((last_user_msg, msg.content))
             last_user_msg = None
+    return history
+
+
+def _chain_inputs(req: ChatReq) -> dict:
+    if not req.conversation:
+        raise HTTPException(400, "Empty dialog")
+
+    return {
+        "input": req.conversation[-1].content.strip(),
+        "chat_history": _history(req.conversation[:-1]),
+    }
+
+
+async def _resolve(req: ChatReq, sessions) -> Tuple[dict, Optional[OnAnswer]]:
+    """
+    Chain inputs for the request, and in session mode a callback that records
+    the finished turn in the session.
+    """
+    if req.session_id is None:
+        return _chain_inputs(req), None
+
+    if req.message is not None:
+        message, earlier = req.message, req.conversation
+    elif req.conversation:
+        message, earlier = req.conversation[-1].content, req.conversation[:-1]
+    else:
+        raise HTTPException(400, "Empty dialog")
+
+    settings = get_settings()
+    state = await sessions.get(req.session_id)
+    if state is None:
+        # A new or expired session; a client that still has the history may seed it.
+        state = SessionState(turns=_history(earlier)[-settings.session_max_turns:])
+
+    async def on_answer(standalone: str, answer: str) -> None:
+        state.record(standalone, answer, settings.session_max_turns, settings.session_answer_chars)
+        await sessions.save(req.session_id, state)
+
+    return state.chain_inputs(message.strip()), on_answer
+
+
+def _admit(request: Request, req: ChatReq) -> str:
+    """
+    Sheds the request at once when the LLM queue is full; otherwise returns
+    the client its LLM calls queue under: the caller's ``X-Client-Id``, else
+    the session, else the remote address.
+    """
+    if get_llm_slots().overloaded():
+        raise HTTPException(503, "busy", headers={"Retry-After": str(BUSY_RETRY_AFTER)})
+    client = request.headers.get("X-Client-Id") or req.session_id
+    if client is None and request.client is not None:
+        client = request.client.host
+    return client or "anonymous"
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_answer(qa_chain, inputs: dict, client: str,
+                         on_answer: Optional[OnAnswer] = None) -> AsyncIterator[str]:
+    current_client.set(client)
+    standalone, answer = inputs["input"], ""
+    try:
+        async for chunk in qa_chain.astream(inputs):
+            standalone = chunk.get("standalone", standalone)
+            token = chunk.get("answer")
+            if token:
+                answer += token
+                yield _sse("token", {"token": token})
+        if on_answer is not None and answer:
+            await on_answer(standalone, answer)
+    except Overloaded:
+        yield _sse("error", {"detail": "busy"})
+        return
+    except Exception as e:
+        logger.exception("Streaming answer failed: %s", e)
+        yield _sse("error", {"detail": "Answer generation failed"})
+        return
+    yield _sse("done", {})
+
+
+@router.post("/chat", response_model=ChatResp, dependencies=[ApiKey])
+async def chat_endpoint(
+        req: ChatReq,
+        request: Request,
+        qa_chain: RagPipeline = QAChain,
+        sessions=Sessions
+):
+    current_client.set(_admit(request, req))
+    inputs, on_answer = await _resolve(req, sessions)
+    try:
+        result = await qa_chain.ainvoke(inputs)
+    except Overloaded:
+        raise HTTPException(503, "busy", headers={"Retry-After": str(BUSY_RETRY_AFTER)})
+    if on_answer is not None:
+        await on_answer(result["standalone"], result["answer"])
+    return ChatResp(answer=result["answer"], session_id=req.session_id)
+
+
+@router.post("/chat/stream", dependencies=[ApiKey])
+async def chat_stream_endpoint(
+        req: ChatReq,
+        request: Request,
+        qa_chain: RagPipeline = QAChain,
+        sessions=Sessions
+):
+    """
+    Streams the answer as Server-Sent Events: one ``token`` event per LLM
+    chunk, then ``done`` (or ``error`` if generation fails mid-stream, with
+    detail ``busy`` if the LLM queue filled up in the meantime).
+    """
+    client = _admit(request, req)
+    inputs, on_answer = await _resolve(req, sessions)
+    return StreamingResponse(
+        _stream_answer(qa_chain, inputs, client, on_answer),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    result = qa_chain.invoke({
-        "input": user_question,
-        "chat_history": history,
-    })
-    return ChatResp(answer=result["answer"])
 
+@router.delete("/chat/sessions/{session_id}", dependencies=[ApiKey])
+async def delete_session(session_id: str, sessions=Sessions):
+    await sessions.delete(session_id)
+    return {"status": "deleted"}
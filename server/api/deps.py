@@ -1,6 +1,8 @@
 from fastapi import Depends
 from core.security import verify_api_key
-from services.rag import get_qa_chain
+from services.rag import get_chain
+from services.sessions import get_session_store
 
-QAChain = Depends(get_qa_chain)
+QAChain = Depends(get_chain)
+Sessions = Depends(get_session_store)
 ApiKey = Depends(verify_api_key)
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from services.rag import get_chain_registry
+
+router = APIRouter(prefix="/health")
+
+# Both are async so they answer on the event loop even while the blocking
+# executor is busy warming up, and need no API key so probes can call them.
+
+
+@router.get("/live")
+async def live():
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def ready():
+    status = get_chain_registry().status()
+    return JSONResponse(status, status_code=200 if status["status"] == "ready" else 503)
@@ -0,0 +1,62 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from api.deps import ApiKey
+from services import metrics
+from services.answer_cache import get_answer_cache
+from services.embeddings import get_embeddings
+from services.faq import get_faq_store
+from services.llm import get_llm_slots
+from services.rag import get_chain_registry
+from services.sessions import get_session_store
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _samples(prefix: str, stats: dict, help_text: str, counters=()):
+    """
+    Only the numeric stats; versions and store names stay on the /admin
+    endpoints. The cumulative ones named in ``counters`` become ``_total`` counters.
+    """
+    return [(f"{prefix}_{key}_total", "counter", help_text, {(): float(value)}) if key in counters
+            else (f"{prefix}_{key}", "gauge", help_text, {(): float(value)})
+            for key, value in stats.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)]
+
+
+def _component_stats():
+    samples = []
+    cache = get_answer_cache()
+    if cache is not None:
+        samples += _samples("fice_answer_cache", cache.stats(), "Semantic answer cache, as in /admin/cache.",
+                            ("hits", "misses", "evictions", "expirations"))
+    faq = get_faq_store()
+    if faq is not None:
+        samples += _samples("fice_faq", faq.stats(), "Mined FAQ answers, as in /admin/faq.",
+                            ("exact_hits", "vector_hits", "misses"))
+    # A scrape must never build the pipeline or load the model: during warm-up that
+    # would block, and after a failed one it would retry the build and fail the scrape.
+    pipeline = get_chain_registry().ready_pipeline()
+    if pipeline is not None:
+        samples += _samples("fice_condense", pipeline.condenser.stats(),
+                            "Question condensation, as in /admin/condense.",
+                            ("total", "skipped_no_history", "skipped_self_contained", "rewritten", "memo_hits"))
+        if pipeline.flights is not None:
+            samples.append(("fice_rag_flights_in_flight", "gauge",
+                            "Distinct pipeline runs in flight, coalesced requests aside.",
+                            {(): pipeline.flights.in_flight()}))
+        samples += _samples("fice_embeddings", get_embeddings().stats(), "Query embeddings, as in /admin/embeddings.",
+                            ("cache_hits", "cache_misses", "batches"))
+    samples += _samples("fice_sessions", get_session_store().stats(), "Chat sessions, as in /admin/sessions.")
+    samples += _samples("fice_llm", get_llm_slots().stats(), "LLM admission queue.")
+    return samples
+
+
+metrics.register_collector(_component_stats)
+
+
+@router.get("/metrics", dependencies=[ApiKey], response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
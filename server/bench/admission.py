@@ -0,0 +1,119 @@
+"""
+Overload simulation of the LLM admission queue.
+
+Simulated LLM calls (exponential service time, ``--slots`` at once) arrive
+faster than they can be served: many light clients asking now and then, plus
+one client flooding the server. The unbounded FIFO semaphore used before is
+compared with ``FairLimiter``'s bounded round-robin queue: time spent queued
+(p50/p95/p99, overall and for the light clients), share of calls shed with
+"busy" and goodput.
+
+    python -m bench.admission --load 1.5 --seconds 20
+
+Pure asyncio, no models or index. Run from the ``server`` directory.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+
+from services.admission import FairLimiter, Overloaded, current_client
+
+
+class _FifoLimiter:
+    """The old ``asyncio.Semaphore``: unbounded and first come, first served."""
+
+    def __init__(self, slots: int):
+        self._semaphore = asyncio.Semaphore(slots)
+
+    async def acquire(self) -> None:
+        await self._semaphore.acquire()
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+
+async def _call(limiter, client: str, service: float, waits: dict, shed: list) -> None:
+    current_client.set(client)
+    start = time.perf_counter()
+    try:
+        await limiter.acquire()
+    except Overloaded:
+        shed.append(client)
+        return
+    waits.setdefault(client, []).append(time.perf_counter() - start)
+    try:
+        await asyncio.sleep(service)
+    finally:
+        limiter.release()
+
+
+async def _simulate(limiter, args) -> dict:
+    rng = random.Random(args.seed)
+    capacity = args.slots / args.service
+    rate = capacity * args.load
+    flood_rate = rate * args.flood_share
+
+    arrivals = []
+    # One flooding client and many light ones, each a Poisson process.
+    for client, client_rate in [("flood", flood_rate)] + [
+            (f"chat-{i}", (rate - flood_rate) / args.clients) for i in range(args.clients)]:
+        t = rng.expovariate(client_rate)
+        while t < args.seconds:
+            arrivals.append((t, client, rng.expovariate(1 / args.service)))
+            t += rng.expovariate(client_rate)
+    arrivals.sort()
+
+    waits, shed, tasks = {}, [], []
+    start = time.perf_counter()
+    for at, client, service in arrivals:
+        delay = at - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(_call(limiter, client, service, waits, shed)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    def percentiles(values):
+        ms = np.asarray(values) * 1000
+        return {f"p{p}": round(float(np.percentile(ms, p)), 1) for p in (50, 95, 99)} if len(ms) else {}
+
+    light = [w for client, values in waits.items() if client != "flood" for w in values]
+    served = sum(len(values) for values in waits.values())
+    return {
+        "calls": len(arrivals),
+        "shed_share": round(len(shed) / len(arrivals), 3),
+        "goodput_per_s": round(served / elapsed, 1),
+        "queue_ms": percentiles([w for values in waits.values() for w in values]),
+        "light_clients_queue_ms": percentiles(light),
+    }
+
+
+def _print(label: str, result: dict) -> None:
+    queue, light = result["queue_ms"], result["light_clients_queue_ms"]
+    print(f"{label:<6} calls={result['calls']:<5} shed={result['shed_share']:6.1%} "
+          f"goodput={result['goodput_per_s']:6.1f}/s  "
+          f"queue p50/p95/p99={queue.get('p50')}/{queue.get('p95')}/{queue.get('p99')} ms  "
+          f"light clients p99={light.get('p99')} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LLM admission queue under overload")
+    parser.add_argument("--slots", type=int, default=4, help="concurrent LLM calls (FICE_LLM_MAX_CONCURRENCY)")
+    parser.add_argument("--max-queue", type=int, default=16, help="queued calls before shedding (FICE_LLM_MAX_QUEUE)")
+    parser.add_argument("--service", type=float, default=0.2, help="mean seconds per LLM call")
+    parser.add_argument("--load", type=float, default=1.5, help="offered load as a multiple of capacity")
+    parser.add_argument("--flood-share", type=float, default=0.5, help="share of the load from one client")
+    parser.add_argument("--clients", type=int, default=50, help="light clients")
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    _print("before", asyncio.run(_simulate(_FifoLimiter(args.slots), args)))
+    _print("after", asyncio.run(_simulate(FairLimiter(args.slots, args.max_queue), args)))
+
+
+if __name__ == "__main__":
+    main()
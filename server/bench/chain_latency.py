@@ -0,0 +1,43 @@
+"""
+Per-request chain overhead: building the RAG chain on every call (the old
+``Depends(get_qa_chain)`` wiring) versus fetching it from the registry.
+
+Run from the ``server`` directory: ``python -m bench.chain_latency``.
+"""
+import argparse
+import statistics
+import time
+
+from services.rag import get_chain_registry, get_qa_chain
+
+
+def _measure(fn, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<10} mean={statistics.mean(timings):8.3f} ms  "
+          f"p50={statistics.median(timings):8.3f} ms  p95={p95:8.3f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    registry = get_chain_registry()
+    registry.warm()
+
+    _report("before", _measure(get_qa_chain, args.runs))
+    _report("after", _measure(registry.get, args.runs))
+
+
+if __name__ == "__main__":
+    main()
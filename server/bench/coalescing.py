@@ -0,0 +1,106 @@
+"""
+LLM calls spent on a burst of identical questions, with and without
+single-flight coalescing.
+
+Fires ``--burst`` simultaneous copies of one first-turn question (the
+"results are out" spike) at the real pipeline over a fixture index, with
+``FakeChatModel`` counting the calls. Small variations in case, spacing and
+final punctuation are mixed in, as real users type them.
+
+    python -m bench.coalescing --burst 200
+    python -m bench.coalescing --burst 200 --stream
+
+Fully offline with the default fake embeddings. Run from the ``server`` directory.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bench.offline import configure
+
+QUESTION = "Коли закінчується прийом документів на бакалаврат?"
+VARIANTS = [QUESTION, QUESTION.lower(), QUESTION.rstrip("?"), "  " + QUESTION.replace(" ", "  ") + "  "]
+
+
+async def _ask(pipeline, question: str, stream: bool) -> float:
+    start = time.perf_counter()
+    inputs = {"input": question, "chat_history": []}
+    if stream:
+        async for _ in pipeline.astream(inputs):
+            pass
+    else:
+        await pipeline.ainvoke(inputs)
+    return time.perf_counter() - start
+
+
+async def _burst(pipeline, size: int, stream: bool) -> dict:
+    from services.llm import get_llm
+
+    llm = get_llm()
+    calls = llm.calls
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(_ask(pipeline, VARIANTS[i % len(VARIANTS)], stream) for i in range(size)),
+                                     return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    errors = [latency for latency in latencies if isinstance(latency, BaseException)]
+    ms = np.asarray([latency for latency in latencies if not isinstance(latency, BaseException)]) * 1000
+    return {
+        "llm_calls": llm.calls - calls,
+        "errors": len(errors),
+        "seconds": round(elapsed, 2),
+        "latency_p50_ms": round(float(np.percentile(ms, 50)), 1) if len(ms) else None,
+        "latency_p99_ms": round(float(np.percentile(ms, 99)), 1) if len(ms) else None,
+    }
+
+
+async def _compare(pipeline, flights, size: int, stream: bool) -> dict:
+    pipeline.flights = None
+    before = await _burst(pipeline, size, stream)
+    pipeline.flights = flights
+    after = await _burst(pipeline, size, stream)
+    return {"before": before, "after": after}
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench-index-") as tmp:
+        directory = Path(tmp)
+        configure(directory, args)
+
+        from bench.fixtures import build_index
+        from services.embeddings import get_embeddings
+        from services.rag import get_qa_chain
+        from services.single_flight import SingleFlight
+
+        build_index(directory, get_embeddings(), args.docs)
+        pipeline = get_qa_chain()
+        results = asyncio.run(_compare(pipeline, SingleFlight(), args.burst, args.stream))
+
+    return {"burst": args.burst, "stream": args.stream, **results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LLM calls for a burst of identical questions")
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--stream", action="store_true", help="use the streaming pipeline")
+    parser.add_argument("--docs", type=int, default=2000, help="fixture index size in chunks")
+    parser.add_argument("--embeddings", choices=["fake", "torch", "onnx"], default="fake")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fake LLM seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    args = parser.parse_args()
+    # The before pass would otherwise leave the answer cached for the after pass. It cannot
+    # absorb a burst either way: nothing is cached until the first answer completes.
+    args.answer_cache = False
+
+    sys.stdout.write(json.dumps(run(args), ensure_ascii=False, indent=1) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Server cold start: import time, time to first answer and memory per worker.
+
+Starts ``--workers`` server processes at once on a fixture index, as when
+restarting or scaling out, and reports for each: seconds to import ``main``,
+seconds from spawn until ``/health/live`` answers, until ``/health/ready``
+and until the first ``/chat`` answer (sent as soon as the server listens),
+and its resident (RSS) and proportional (PSS, shared pages split between
+the processes sharing them) memory after answering.
+
+``before`` replays the previous startup: the modules ``main`` used to import
+eagerly (chromadb, the DeepSeek client, ``langchain``) are imported up front,
+there is no snapshot, so every worker exports one from Chroma, and warm-up
+blocks serving. ``after`` starts from the snapshot the indexer writes, with
+lazy imports and warm-up in the background.
+
+    python -m bench.cold_start --workers 4 --out cold_start.json
+
+Linux only (memory is read from ``/proc``). Offline with the default fake
+embeddings; ``--embeddings torch`` or ``onnx`` load the real model, the
+bulk of a real warm-up. Run from the ``server`` directory.
+
+With the defaults (4 workers, 20000 chunks, fake embeddings; mean / max
+over workers):
+
+             import s      live s      ready s  1st answer s     RSS MB     PSS MB
+    before  9.39/9.47  14.43/14.60  14.44/14.62  15.19/15.22  273/475  211/404
+    after   5.05/5.31   6.28/6.56    8.06/8.13    8.29/8.37  171/171  122/122
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bench.offline import _free_port, configure
+
+# What ``main`` imported before the heavy dependencies were deferred.
+EAGER_IMPORTS = ["langchain_chroma", "langchain_deepseek", "langchain.chains.combine_documents"]
+
+
+def _worker(args) -> None:
+    """Runs in the child process: one server worker."""
+    import importlib
+
+    start = time.perf_counter()
+    configure(args.directory, args)
+    if args.mode == "before":
+        for module in EAGER_IMPORTS:
+            importlib.import_module(module)
+    from main import app
+    print(json.dumps({"import_seconds": time.perf_counter() - start}), flush=True)
+
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=args.worker, log_level="warning")
+
+
+def _memory_mb(pid: int) -> dict:
+    memory = {}
+    for path, key, name in ((f"/proc/{pid}/status", "VmRSS:", "rss_mb"),
+                            (f"/proc/{pid}/smaps_rollup", "Pss:", "pss_mb")):
+        try:
+            with open(path) as fh:
+                for line in fh:
+                    if line.startswith(key):
+                        memory[name] = round(int(line.split()[1]) / 1024, 1)
+                        break
+        except OSError:
+            pass
+    return memory
+
+
+def _first_answer(url: str, spawned: float, timeout: float, result: dict) -> None:
+    import httpx
+
+    response = httpx.post(f"{url}/chat", timeout=timeout, json={"conversation": [
+        {"role": "user", "content": "Як отримати академічну стипендію?"}]})
+    response.raise_for_status()
+    result["first_answer_seconds"] = time.perf_counter() - spawned
+
+
+def _probe(process: subprocess.Popen, url: str, spawned: float, timeout: float, result: dict) -> None:
+    import httpx
+
+    try:
+        result.update(json.loads(process.stdout.readline()))
+        deadline = spawned + timeout
+        with httpx.Client(timeout=timeout) as client:
+            while "live_seconds" not in result:
+                try:
+                    client.get(f"{url}/health/live").raise_for_status()
+                    result["live_seconds"] = time.perf_counter() - spawned
+                except httpx.HTTPError:
+                    if time.perf_counter() > deadline or process.poll() is not None:
+                        raise RuntimeError("did not start")
+                    time.sleep(0.02)
+
+            # Asked as soon as the server listens: waits for the warm-up if it is still running.
+            answer = threading.Thread(target=_first_answer, args=(url, spawned, timeout, result))
+            answer.start()
+            while client.get(f"{url}/health/ready").status_code != 200:
+                if time.perf_counter() > deadline:
+                    raise RuntimeError("never got ready")
+                time.sleep(0.02)
+            result["ready_seconds"] = time.perf_counter() - spawned
+            answer.join()
+    except Exception as e:
+        result["error"] = repr(e)
+
+
+def _start(args, mode: str) -> dict:
+    os.environ["FICE_WARM_IN_BACKGROUND"] = str(mode == "after").lower()
+    processes, probes, results = [], [], []
+    try:
+        for _ in range(args.workers):
+            port = _free_port()
+            command = [sys.executable, "-m", "bench.cold_start", "--worker", str(port), "--mode", mode,
+                       "--directory", str(args.directory), "--embeddings", args.embeddings,
+                       "--llm-latency", str(args.llm_latency)]
+            spawned = time.perf_counter()
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+            processes.append(process)
+            result: dict = {}
+            results.append(result)
+            probe = threading.Thread(target=_probe, args=(process, f"http://127.0.0.1:{port}", spawned,
+                                                          args.timeout, result))
+            probe.start()
+            probes.append(probe)
+        for probe in probes:
+            probe.join()
+        for process, result in zip(processes, results):
+            result.update(_memory_mb(process.pid))
+            if "error" in result or "first_answer_seconds" not in result:
+                print(f"{mode} worker {process.pid} failed: {result.get('error', 'no answer')}", file=sys.stderr)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    summary = {}
+    for key in ("import_seconds", "live_seconds", "ready_seconds", "first_answer_seconds", "rss_mb", "pss_mb"):
+        values = [result[key] for result in results if key in result]
+        if values:
+            summary[key] = {"mean": round(float(np.mean(values)), 3), "max": round(float(np.max(values)), 3)}
+    return {"workers": results, "summary": summary}
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench-index-") as tmp:
+        args.directory = Path(tmp)
+        configure(args.directory, args)
+
+        from bench.fixtures import build_index
+        from services.embeddings import get_embeddings
+        from services.numpy_index import NUMPY_INDEX_DIR, NumpyVectorIndex
+        from services.vectorstore import get_index_version, get_vectordb
+
+        build_index(args.directory, get_embeddings(), args.docs)
+        shutil.rmtree(args.directory / NUMPY_INDEX_DIR, ignore_errors=True)
+        before = _start(args, "before")
+
+        # What the indexer now writes after each run.
+        NumpyVectorIndex.from_chroma(get_vectordb(), get_index_version()).save(args.directory / NUMPY_INDEX_DIR)
+        after = _start(args, "after")
+
+    return {"docs": args.docs, "workers": args.workers, "embeddings": args.embeddings,
+            "before": before, "after": after}
+
+
+def _print(result: dict) -> None:
+    print(f"{result['workers']} workers, {result['docs']} chunks, {result['embeddings']} embeddings "
+          f"(mean / max over workers)")
+    print(f"{'':<7}{'import s':>14}{'live s':>14}{'ready s':>14}{'1st answer s':>14}{'RSS MB':>16}{'PSS MB':>16}")
+    for mode in ("before", "after"):
+        summary = result[mode]["summary"]
+        cells = []
+        for key in ("import_seconds", "live_seconds", "ready_seconds", "first_answer_seconds", "rss_mb", "pss_mb"):
+            value = summary.get(key)
+            width = 16 if key.endswith("_mb") else 14
+            cells.append(f"{value['mean']:.2f} / {value['max']:.2f}".rjust(width) if value else "-".rjust(width))
+        print(f"{mode:<7}" + "".join(cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import time, time to first answer and memory per worker")
+    parser.add_argument("--workers", type=int, default=4, help="server processes started at once")
+    parser.add_argument("--docs", type=int, default=20000, help="fixture index size in chunks")
+    parser.add_argument("--embeddings", choices=["fake", "torch", "onnx"], default="fake")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM seconds to first token")
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds a worker may take to answer")
+    parser.add_argument("--out", type=Path)
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=["before", "after"], help=argparse.SUPPRESS)
+    parser.add_argument("--directory", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.answer_cache = False
+    args.tokens_per_second = 200.0
+    args.answer_tokens = 20
+    args.prompt_tokens_per_second = 0.0
+
+    if args.worker:
+        _worker(args)
+        return
+
+    result = run(args)
+    _print(result)
+    if args.out:
+        args.out.write_text(json.dumps(result, ensure_ascii=False, indent=1), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
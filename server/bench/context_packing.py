@@ -0,0 +1,103 @@
+"""
+Prompt size and answer latency with and without context packing.
+
+Indexes fixture pages split with the indexer's chunking (so retrieved
+chunks overlap and share pages), then answers the fixed ``QUESTIONS`` with
+the real pipeline and ``FakeChatModel`` once per context budget; budget 0
+is the old behaviour of pasting every retrieved chunk. The fake model reads
+the prompt at ``--prompt-tokens-per-second``, so prompt size shows up in
+latency as it does with DeepSeek.
+
+    python -m bench.context_packing --budgets 0 800 1200 2000
+
+Fully offline with the default fake embeddings. Run from the ``server`` directory.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bench.offline import configure
+
+
+async def _answer_all(pipeline, questions: list, repeats: int) -> dict:
+    from services.llm import get_llm
+
+    llm = get_llm()
+    prompt_tokens, latencies, sources, chunks = [], [], [], []
+    for _ in range(repeats):
+        for question in questions:
+            before = llm.prompt_tokens
+            start = time.perf_counter()
+            result = await pipeline.ainvoke({"input": question, "chat_history": []})
+            latencies.append(time.perf_counter() - start)
+            prompt_tokens.append(llm.prompt_tokens - before)
+            sources.append(len(result["context"]))
+            chunks.append(sum(doc.metadata.get("chunks", 1) for doc in result["context"]))
+
+    ms = np.asarray(latencies) * 1000
+    return {
+        "prompt_tokens_mean": round(float(np.mean(prompt_tokens)), 1),
+        "prompt_tokens_max": int(np.max(prompt_tokens)),
+        "latency_p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "latency_p95_ms": round(float(np.percentile(ms, 95)), 1),
+        "sources_mean": round(float(np.mean(sources)), 2),
+        "chunks_used_mean": round(float(np.mean(chunks)), 2),
+    }
+
+
+async def _sweep(pipeline, budgets: list, questions: list, repeats: int) -> dict:
+    results = {}
+    for budget in budgets:
+        pipeline.context_budget = budget
+        results[str(budget)] = await _answer_all(pipeline, questions, repeats)
+    return results
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench-index-") as tmp:
+        directory = Path(tmp)
+        configure(directory, args)
+
+        from bench.fixtures import QUESTIONS, build_index, pages, split_pages
+        from services.embeddings import get_embeddings
+        from services.rag import get_qa_chain
+
+        items = split_pages(pages(args.pages))
+        build_index(directory, get_embeddings(), items=items)
+        pipeline = get_qa_chain()
+
+        results = asyncio.run(_sweep(pipeline, args.budgets, QUESTIONS, args.repeats))
+
+    return {"chunks_indexed": len(items), "budgets": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prompt tokens and latency per context token budget")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[0, 800, 1200, 2000],
+                        help="context token budgets; 0 disables packing")
+    parser.add_argument("--pages", type=int, default=300, help="fixture pages (several chunks each)")
+    parser.add_argument("--repeats", type=int, default=3, help="passes over the question set")
+    parser.add_argument("--embeddings", choices=["fake", "torch", "onnx"], default="fake")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake LLM seconds to first token")
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=4000.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--out", type=Path)
+    args = parser.parse_args()
+    # The cache would answer repeated questions without building a prompt.
+    args.answer_cache = False
+
+    output = json.dumps(run(args), ensure_ascii=False, indent=1)
+    if args.out:
+        args.out.write_text(output, encoding="utf-8")
+    sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
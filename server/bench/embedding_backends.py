@@ -0,0 +1,98 @@
+"""
+Torch vs int8 ONNX embedder: parity on our corpus, throughput, memory and
+cold start.
+
+Parity is the cosine similarity between the two backends' vectors for the
+same chunks. Each backend is then measured in a fresh subprocess so cold
+start (imports + model load) and peak RSS are not polluted by the other.
+
+Run from the ``server`` directory:
+``python -m bench.embedding_backends --corpus ../scraper/data/raw_docs.jsonl``.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+def _load_corpus(path: str, limit: int) -> list[str]:
+    texts = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            # Roughly chunk-sized pieces, like the indexer's splitter produces.
+            content = json.loads(line)["content"]
+            texts.extend(content[i:i + 1000] for i in range(0, len(content), 900))
+            if len(texts) >= limit:
+                break
+    return texts[:limit]
+
+
+def _child(backend: str, corpus: str, limit: int) -> None:
+    start = time.perf_counter()
+    from services.embeddings import build_base_embeddings, onnx_model_directory
+    embeddings = build_base_embeddings(backend, onnx_model_directory())
+    embeddings.embed_query("warm-up")
+    cold_start = time.perf_counter() - start
+
+    texts = _load_corpus(corpus, limit)
+    start = time.perf_counter()
+    embeddings.embed_documents(texts)
+    throughput = len(texts) / (time.perf_counter() - start)
+
+    print(json.dumps({
+        "backend": backend,
+        "cold_start_s": round(cold_start, 3),
+        "throughput_texts_s": round(throughput, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "torch_imported": "torch" in sys.modules,
+    }))
+
+
+def cosine_parity(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    """Row-wise cosine similarity between two backends' vectors for the same texts."""
+    cosine = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    return {
+        "texts": len(cosine),
+        "cosine_mean": round(float(cosine.mean()), 4),
+        "cosine_min": round(float(cosine.min()), 4),
+        "cosine_p1": round(float(np.percentile(cosine, 1)), 4),
+    }
+
+
+def _parity(corpus: str, limit: int) -> dict:
+    from services.embeddings import build_base_embeddings, onnx_model_directory
+    texts = _load_corpus(corpus, limit)
+    onnx_model_dir = onnx_model_directory()
+    torch_vectors = np.asarray(build_base_embeddings("torch", onnx_model_dir).embed_documents(texts))
+    onnx_vectors = np.asarray(build_base_embeddings("onnx", onnx_model_dir).embed_documents(texts))
+    return cosine_parity(torch_vectors, onnx_vectors)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", required=True, help="raw_docs.jsonl produced by the scraper")
+    parser.add_argument("--limit", type=int, default=2000, help="number of chunks to embed")
+    parser.add_argument("--child", choices=["torch", "onnx"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.corpus, args.limit)
+        return
+
+    print(json.dumps({"parity": _parity(args.corpus, args.limit)}))
+    for backend in ("torch", "onnx"):
+        subprocess.run(
+            [sys.executable, "-m", "bench.embedding_backends",
+             "--corpus", args.corpus, "--limit", str(args.limit), "--child", backend],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Query-embedding throughput at 1, 8 and 32 concurrent callers: the plain
+HuggingFace model versus ``BatchingEmbeddings`` (cache disabled, so every
+query is a real forward pass).
+
+Run from the ``server`` directory: ``python -m bench.embeddings``.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from services.embedding_batcher import BatchingEmbeddings
+
+MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def _queries_per_second(embeddings, callers: int, queries: int) -> float:
+    texts = [f"Коли дедлайн подачі документів на спеціальність {i}?" for i in range(queries)]
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        start = time.perf_counter()
+        list(pool.map(embeddings.embed_query, texts))
+        return queries / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--callers", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    model = HuggingFaceEmbeddings(model_name=MODEL, model_kwargs={"device": "cpu"})
+    model.embed_query("warm-up")
+    backends = {
+        "direct": model,
+        "batched": BatchingEmbeddings(model, cache_size=0),
+    }
+
+    for callers in args.callers:
+        for name, embeddings in backends.items():
+            qps = _queries_per_second(embeddings, callers, args.queries)
+            print(f"callers={callers:<3} {name:<8} {qps:8.1f} queries/s")
+
+
+if __name__ == "__main__":
+    main()
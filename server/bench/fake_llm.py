@@ -0,0 +1,92 @@
+"""
+Deterministic local stand-in for ``ChatDeepSeek``.
+
+Answers take ``first_token_latency`` seconds to start and then arrive at
+``tokens_per_second``, so benchmarks see realistic time-to-first-token and
+generation time without network or cost. With ``prompt_tokens_per_second``
+set, the first token also waits for the prompt to be "read", so prompt size
+shows up in latency as it does with a real model. The same prompt always produces
+the same answer. Condensation prompts get the last question back unchanged,
+so retrieval sees a sensible query.
+"""
+import asyncio
+import random
+import time
+import zlib
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from services.llm import get_llm_slots
+from services.tokens import estimate_tokens
+
+_WORDS = ("вступ документи бакалаврат магістратура спеціальність кафедра стипендія "
+          "гуртожиток розклад сесія деканат конкурс бюджет контракт факультет").split()
+# Marks the question-condensation prompt built by ``services.rag.build_condense_chain``.
+_CONDENSE_MARKER = "переформульовує"
+
+
+class FakeChatModel(BaseChatModel):
+    first_token_latency: float = 0.5
+    tokens_per_second: float = 50.0
+    answer_tokens: int = 120
+    prompt_tokens_per_second: float = 0.0
+    calls: int = 0
+    prompt_tokens: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-deepseek"
+
+    def _reply(self, messages: List[BaseMessage]) -> List[str]:
+        question = next((m.content for m in reversed(messages) if m.type == "human"), "")
+        if any(m.type == "system" and _CONDENSE_MARKER in m.content for m in messages):
+            return [word + " " for word in question.split()]
+        rng = random.Random(zlib.crc32("".join(m.content for m in messages).encode("utf-8")))
+        return [rng.choice(_WORDS) + " " for _ in range(self.answer_tokens)]
+
+    def _first_token(self, messages: List[BaseMessage]) -> float:
+        """Seconds to the first token; also counts the prompt into ``prompt_tokens``."""
+        prompt_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        self.prompt_tokens += prompt_tokens
+        if not self.prompt_tokens_per_second:
+            return self.first_token_latency
+        return self.first_token_latency + prompt_tokens / self.prompt_tokens_per_second
+
+    def _duration(self, messages: List[BaseMessage], tokens: int) -> float:
+        return self._first_token(messages) + tokens / self.tokens_per_second
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        tokens = self._reply(messages)
+        time.sleep(self._duration(messages, len(tokens)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        # Same concurrency cap as BoundedChatDeepSeek.
+        async with get_llm_slots():
+            self.calls += 1
+            tokens = self._reply(messages)
+            await asyncio.sleep(self._duration(messages, len(tokens)))
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self.calls += 1
+        time.sleep(self._first_token(messages))
+        for token in self._reply(messages):
+            time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async with get_llm_slots():
+            self.calls += 1
+            await asyncio.sleep(self._first_token(messages))
+            for token in self._reply(messages):
+                await asyncio.sleep(1 / self.tokens_per_second)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=token))
@@ -0,0 +1,187 @@
+"""
+Fixture corpus and workload for the offline benchmarks.
+
+The corpus is generated from templates about FICE topics (specialties,
+departments, admission, scholarships...), so every run indexes exactly the
+same chunks. The workload mixes first-turn questions with multi-turn
+dialogs whose follow-ups need condensation.
+"""
+import random
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from services.lexical import LEXICAL_INDEX_FILE, BM25Index
+from services.vectorstore import INDEX_VERSION_FILE
+
+COLLECTION = "bench_docs"
+
+SPECIALTIES = {
+    "121": "Інженерія програмного забезпечення",
+    "123": "Комп'ютерна інженерія",
+    "126": "Інформаційні системи та технології",
+}
+DEPARTMENTS = {
+    "ІПІ": "кафедра інформатики та програмної інженерії",
+    "ІСТ": "кафедра інформаційних систем та технологій",
+    "ОТ": "кафедра обчислювальної техніки",
+}
+TOPICS = [
+    ("вступ", "Прийом документів на {level} за спеціальністю {code} триває з {day} липня до {end} серпня. "
+              "Мотиваційний лист та сертифікати НМТ подаються через електронний кабінет вступника."),
+    ("стипендія", "Академічну стипендію на спеціальності {code} отримують студенти з рейтингом вище {score}. "
+                  "Соціальна стипендія призначається за поданням до деканату до {day} вересня."),
+    ("гуртожиток", "Поселення студентів {dept} до гуртожитку №{hostel} відбувається за наказом ректора. "
+                   "Вартість проживання становить {price} грн на місяць."),
+    ("розклад", "Розклад занять для груп {dept} на {level} публікується на сайті rozklad.kpi.ua "
+                "за тиждень до початку семестру; зміни погоджує деканат."),
+    ("сесія", "Зимова екзаменаційна сесія для {level} спеціальності {code} триває з {day} грудня. "
+              "Перескладання дозволяється не більше двох разів."),
+    ("практика", "Виробнича практика студентів {dept} проходить у партнерських IT-компаніях; "
+                 "договори укладаються до {day} травня."),
+]
+LEVELS = ["бакалаврат", "магістратуру", "аспірантуру"]
+
+
+def _page(rng: random.Random, index: int, min_paragraphs: int, max_paragraphs: int) -> Tuple[str, dict]:
+    topic, template = rng.choice(TOPICS)
+    code = rng.choice(list(SPECIALTIES))
+    dept = rng.choice(list(DEPARTMENTS))
+    text = "\n".join(template.format(
+        level=rng.choice(LEVELS), code=f"{code} «{SPECIALTIES[code]}»", dept=DEPARTMENTS[dept],
+        day=rng.randint(1, 28), end=rng.randint(1, 28), score=rng.randint(70, 95),
+        hostel=rng.randint(1, 20), price=rng.randint(600, 1500),
+    ) for _ in range(rng.randint(min_paragraphs, max_paragraphs)))
+    return text, {
+        "source": f"https://fiot.kpi.ua/{topic}/{dept.lower()}-{index}",
+        "title": f"{topic.capitalize()} — {dept}",
+    }
+
+
+def corpus(docs: int, seed: int = 0) -> List[Tuple[str, dict]]:
+    """``docs`` chunk-sized ``(text, metadata)`` pairs."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(docs):
+        text, metadata = _page(rng, i, 2, 5)
+        items.append((text[:1000], metadata))
+    return items
+
+
+def pages(count: int, seed: int = 0) -> List[Tuple[str, dict]]:
+    """``count`` pages several chunks long, to be split as the indexer does."""
+    rng = random.Random(seed)
+    return [_page(rng, i, 8, 16) for i in range(count)]
+
+
+def split_pages(items: List[Tuple[str, dict]], chunk_size: int = 1000,
+                chunk_overlap: int = 100) -> List[Tuple[str, dict]]:
+    """Chunks of ``items`` with ``start_index``, split like ``scraper/index_to_chroma.py``."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                              add_start_index=True)
+    chunks = splitter.create_documents([text for text, _ in items], [metadata for _, metadata in items])
+    return [(chunk.page_content, chunk.metadata) for chunk in chunks]
+
+
+def build_index(directory: Path, embeddings: Embeddings, docs: int = 2000,
+                items: Optional[List[Tuple[str, dict]]] = None) -> None:
+    """
+    Writes a Chroma collection, the BM25 index and an index version into
+    ``directory``, laid out as ``scraper/index_to_chroma.py`` does. Indexes
+    ``items`` if given, else ``corpus(docs)``.
+    """
+    from langchain_chroma import Chroma
+
+    items = items if items is not None else corpus(docs)
+    ids = [f"bench-{i}" for i in range(len(items))]
+    texts = [text for text, _ in items]
+    Chroma.from_texts(texts, embeddings, metadatas=[m for _, m in items], ids=ids,
+                      collection_name=COLLECTION, persist_directory=str(directory))
+    BM25Index.build(zip(ids, texts)).save(directory / LEXICAL_INDEX_FILE)
+    (directory / INDEX_VERSION_FILE).write_text(uuid.uuid4().hex, encoding="utf-8")
+
+
+# Retrieval evaluation: questions about one topic and the page attributes
+# (specialty code, department, study level) they name.
+LABELLED_QUESTIONS = [
+    ("вступ", "Коли триває прийом документів на {level} за спеціальністю {code}?"),
+    ("стипендія", "Який рейтинг потрібен для академічної стипендії на спеціальності {code}?"),
+    ("гуртожиток", "Скільки коштує гуртожиток для студентів, яких навчає {dept}?"),
+    ("розклад", "Де публікують розклад занять на {level} для груп, яких навчає {dept}?"),
+    ("сесія", "Коли починається зимова сесія на {level} за спеціальністю {code}?"),
+    ("практика", "Де проходять виробничу практику студенти, яких навчає {dept}?"),
+]
+
+
+def labelled_questions(items: List[Tuple[str, dict]]) -> List[dict]:
+    """
+    ``{"question", "sources"}`` pairs for the pages ``items`` (as returned by
+    ``pages``): every combination of the attributes a ``LABELLED_QUESTIONS``
+    template names, labelled with the URLs of the pages of that topic that
+    mention all of them. Combinations no page covers are left out.
+    """
+    departments = {dept.lower(): dept for dept in DEPARTMENTS}
+    labelled = []
+    for topic, template in LABELLED_QUESTIONS:
+        slots = {"level": LEVELS if "{level}" in template else [None],
+                 "code": list(SPECIALTIES) if "{code}" in template else [None],
+                 "dept": list(DEPARTMENTS) if "{dept}" in template else [None]}
+        for level in slots["level"]:
+            for code in slots["code"]:
+                for dept in slots["dept"]:
+                    sources = []
+                    for text, metadata in items:
+                        page_topic, page = metadata["source"].rsplit("/", 2)[-2:]
+                        if (page_topic == topic
+                                and (level is None or level in text)
+                                and (code is None or f"{code} «" in text)
+                                and (dept is None or departments[page.rsplit("-", 1)[0]] == dept)):
+                            sources.append(metadata["source"])
+                    if sources:
+                        question = template.format(level=level, code=code,
+                                                   dept=dept and DEPARTMENTS[dept])
+                        labelled.append({"question": question, "sources": sources})
+    return labelled
+
+
+QUESTIONS = [
+    "Коли закінчується прийом документів на бакалаврат?",
+    "Які спеціальності є на ФІОТ?",
+    "Як отримати академічну стипендію?",
+    "Що таке спеціальність 121?",
+    "Де знаходиться кафедра ІПІ?",
+    "Скільки коштує гуртожиток для студентів ФІОТ?",
+    "Коли починається зимова сесія?",
+    "Де подивитися розклад занять?",
+    "Як потрапити на практику в IT-компанію?",
+    "Чи можна перескласти екзамен?",
+]
+
+# Dialogs whose later turns only make sense with the earlier ones.
+DIALOGS = [
+    ["Коли прийом документів на спеціальність 123?", "А для магістрів?", "Які документи треба подати?"],
+    ["Як поселитися в гуртожиток?", "Скільки це коштує?", "А для студентів ІСТ теж так?"],
+    ["Яка стипендія на спеціальності 126?", "Який для неї потрібен рейтинг?"],
+    ["Коли сесія на бакалавраті?", "Скільки разів можна перескладати?"],
+]
+
+
+def conversations(seed: int = 0):
+    """
+    Endless stream of request conversations, as ``[{"role", "content"}]`` lists:
+    single questions and dialogs replayed turn by turn with earlier answers.
+    """
+    rng = random.Random(seed)
+    while True:
+        if rng.random() < 0.5:
+            yield [{"role": "user", "content": rng.choice(QUESTIONS)}]
+            continue
+        history: list = []
+        for turn in rng.choice(DIALOGS):
+            history.append({"role": "user", "content": turn})
+            yield list(history)
+            history.append({"role": "assistant", "content": f"Відповідь на «{turn}» з посиланням на джерело."})
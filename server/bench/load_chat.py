@@ -0,0 +1,51 @@
+"""
+Throughput of ``/chat`` on a single worker as the number of concurrent
+clients grows. Start the server first (``python main.py``), then run
+``python -m bench.load_chat --url http://localhost:8000``.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+QUESTIONS = [
+    "Коли закінчується прийом документів на бакалаврат?",
+    "Які спеціальності є на ФІОТ?",
+    "Як отримати стипендію?",
+    "Що таке спеціальність 121?",
+    "Де знаходиться кафедра ІПІ?",
+]
+
+
+async def _client(client: httpx.AsyncClient, url: str, requests: int, offset: int) -> None:
+    for i in range(requests):
+        question = QUESTIONS[(offset + i) % len(QUESTIONS)]
+        response = await client.post(
+            f"{url}/chat",
+            json={"conversation": [{"role": "user", "content": question}]},
+        )
+        response.raise_for_status()
+
+
+async def _run(url: str, clients: int, requests: int) -> float:
+    async with httpx.AsyncClient(timeout=300) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(_client(client, url, requests, c) for c in range(clients)))
+        return clients * requests / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=4, help="requests per client")
+    args = parser.parse_args()
+
+    for clients in args.clients:
+        throughput = asyncio.run(_run(args.url, clients, args.requests))
+        print(f"clients={clients:<3} throughput={throughput:6.2f} req/s")
+
+
+if __name__ == "__main__":
+    main()
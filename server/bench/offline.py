@@ -0,0 +1,280 @@
+"""
+Offline end-to-end benchmark of the chat server.
+
+Starts ``main.app`` under uvicorn with ``FakeChatModel`` in place of
+DeepSeek and a generated fixture index, then drives ``/chat`` (or
+``/chat/stream``) with concurrent clients replaying Ukrainian questions and
+multi-turn dialogs. For each concurrency level it reports throughput and
+p50/p95/p99 latency; for streaming, also time to first token. The mean time
+of each pipeline stage is read back from ``/metrics``. Results are
+written as JSON so runs can be compared between commits:
+
+    python -m bench.offline --clients 1 8 32 --out before.json
+    python -m bench.offline --clients 1 8 32 --out after.json
+    python -m bench.offline --compare before.json after.json
+
+Needs no network with the default fake embeddings (``--embeddings torch``
+or ``onnx`` use the real model if it is available locally). Run from the
+``server`` directory.
+
+Skipping the condensation rewrite, ``--clients 1 8 --requests 20`` (half
+the conversations are dialogs). ``before`` rewrites every turn with
+history (``FICE_CONDENSE_SIMILARITY_THRESHOLD=-1 FICE_CONDENSE_MEMO_SIZE=0``),
+``after`` uses the defaults:
+
+                         before     after
+    LLM calls               182       145
+    condense stage ms     217.0      17.0   (mean per request)
+    clients=1  p95 ms    3532.8    3522.2
+    clients=8  p95 ms    3533.2    2977.3   (p99 3559.2 -> 3201.0)
+
+p50 does not move: the median request has no history and never rewrote.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+
+def configure(directory: Path, args) -> None:
+    """
+    Points the settings at the fixture index and swaps in the fake models.
+    Must run before ``main`` (and through it ``services.rag``) is imported.
+    """
+    os.environ.update({
+        "FICE_API_KEY": "bench",
+        "FICE_DEEPSEEK_API_KEY": "bench",
+        "FICE_CHROMA_DIRECTORY": str(directory),
+        "FICE_CHROMA_COLLECTION": "bench_docs",
+        "FICE_HF_MODEL": "bench",
+        "FICE_ANSWER_CACHE_ENABLED": str(args.answer_cache).lower(),
+        "FICE_EMBEDDING_BACKEND": "torch" if args.embeddings == "fake" else args.embeddings,
+    })
+
+    import services.embeddings
+    import services.llm
+    from bench.fake_llm import FakeChatModel
+
+    if args.embeddings == "fake":
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        services.embeddings.build_base_embeddings = lambda *_: DeterministicFakeEmbedding(size=384)
+
+    @lru_cache
+    def get_fake_llm() -> FakeChatModel:
+        return FakeChatModel(first_token_latency=args.llm_latency, tokens_per_second=args.tokens_per_second,
+                             answer_tokens=args.answer_tokens,
+                             prompt_tokens_per_second=args.prompt_tokens_per_second)
+
+    services.llm.get_llm = get_fake_llm
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(port: int):
+    import uvicorn
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("server failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+async def _client(client, url: str, stream: bool, sessions: bool, client_id: int, requests: int,
+                  latencies: list, ttfts: list, errors: list) -> None:
+    from bench.fixtures import conversations
+
+    dialogs = conversations(seed=client_id)
+    for _ in range(requests):
+        conversation = next(dialogs)
+        if sessions:
+            if len(conversation) == 1:
+                await client.delete(f"{url}/chat/sessions/bench-{client_id}")
+            payload = {"session_id": f"bench-{client_id}", "message": conversation[-1]["content"]}
+        else:
+            payload = {"conversation": conversation}
+        start = time.perf_counter()
+        try:
+            if stream:
+                first = None
+                async with client.stream("POST", f"{url}/chat/stream", json=payload) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if first is None and line.startswith("event: token"):
+                            first = time.perf_counter() - start
+                        if line.startswith("event: error"):
+                            raise RuntimeError("stream error")
+                if first is not None:
+                    ttfts.append(first)
+            else:
+                response = await client.post(f"{url}/chat", json=payload)
+                response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(repr(e))
+
+
+def _percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    ms = np.asarray(values) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(ms, p)), 2) for p in (50, 95, 99)} | {
+        "mean_ms": round(float(ms.mean()), 2)}
+
+
+async def _level(url: str, clients: int, requests: int, stream: bool, sessions: bool) -> dict:
+    import httpx
+
+    latencies, ttfts, errors = [], [], []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(timeout=600, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(_client(client, url, stream, sessions, c, requests, latencies, ttfts, errors)
+                               for c in range(clients)))
+        elapsed = time.perf_counter() - start
+    result = {
+        "clients": clients,
+        "requests": len(latencies) + len(errors),
+        "errors": len(errors),
+        "seconds": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency": _percentiles(latencies),
+    }
+    if stream:
+        result["ttft"] = _percentiles(ttfts)
+    return result
+
+
+def _stage_means(url: str) -> dict:
+    """Mean milliseconds per pipeline stage, from the server's ``/metrics``."""
+    import httpx
+
+    sums, counts = {}, {}
+    for line in httpx.get(f"{url}/metrics", timeout=30).text.splitlines():
+        for suffix, target in (("_sum", sums), ("_count", counts)):
+            prefix = f"fice_rag_stage_seconds{suffix}{{stage=\""
+            if line.startswith(prefix):
+                name, value = line[len(prefix):].split("\"} ")
+                target[name] = float(value)
+    return {name: round(sums[name] / counts[name] * 1000, 2) for name in sorted(sums) if counts.get(name)}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench-index-") as tmp:
+        directory = Path(tmp)
+        configure(directory, args)
+
+        from bench.fixtures import build_index
+        from services.embeddings import get_embeddings
+
+        start = time.perf_counter()
+        build_index(directory, get_embeddings(), args.docs)
+        index_seconds = time.perf_counter() - start
+
+        port = _free_port()
+        server, thread = _serve(port)
+        url = f"http://127.0.0.1:{port}"
+        try:
+            # Warm-up pass so the first level does not pay for imports and index loading.
+            asyncio.run(_level(url, 1, 2, args.stream, args.sessions))
+            levels = [asyncio.run(_level(url, clients, args.requests, args.stream, args.sessions))
+                      for clients in args.clients]
+            stages = _stage_means(url)
+        finally:
+            server.should_exit = True
+            thread.join()
+
+    from services.llm import get_llm
+    from services.rag import get_chain_registry
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("out", "compare")},
+        "fixture_index_seconds": round(index_seconds, 2),
+        "llm_calls": get_llm().calls,
+        # Skip rate and rewrites of the history condensation, as in /admin/condense.
+        "condense": get_chain_registry().get().condenser.stats(),
+        "levels": levels,
+        "stage_mean_ms": stages,
+    }
+
+
+def compare(before_path: Path, after_path: Path) -> None:
+    before = json.loads(before_path.read_text(encoding="utf-8"))
+    after = json.loads(after_path.read_text(encoding="utf-8"))
+    print(f"{before['commit']} -> {after['commit']}")
+    previous = {level["clients"]: level for level in before["levels"]}
+    for level in after["levels"]:
+        old = previous.get(level["clients"])
+        if old is None:
+            continue
+        line = [f"clients={level['clients']:<4}"]
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            a, b = old["latency"].get(key), level["latency"].get(key)
+            if a and b:
+                line.append(f"{key} {a:9.1f} -> {b:9.1f} ({(b - a) / a:+.1%})")
+        a, b = old["throughput_rps"], level["throughput_rps"]
+        line.append(f"rps {a:.2f} -> {b:.2f}")
+        print("  ".join(line))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark of the chat server")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=20, help="requests per client and level")
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream and report time to first token")
+    parser.add_argument("--sessions", action="store_true", help="send session_id + message instead of history")
+    parser.add_argument("--docs", type=int, default=2000, help="fixture index size in chunks")
+    parser.add_argument("--embeddings", choices=["fake", "torch", "onnx"], default="fake")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fake LLM seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=0.0,
+                        help="fake LLM prompt reading speed; 0 makes latency independent of prompt size")
+    parser.add_argument("--answer-cache", action="store_true", help="keep the semantic answer cache on")
+    parser.add_argument("--out", type=Path, help="write the JSON results here as well as to stdout")
+    parser.add_argument("--compare", type=Path, nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run(args)
+    output = json.dumps(results, ensure_ascii=False, indent=1)
+    if args.out:
+        args.out.write_text(output, encoding="utf-8")
+    sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
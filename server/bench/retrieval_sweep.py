@@ -0,0 +1,192 @@
+"""
+Retrieval quality against cost for the chunking and MMR settings.
+
+For each ``--chunking`` config (``chunk_size:overlap``) the fixture pages are
+split as the indexer does and indexed in memory (NumPy vectors and BM25).
+The retriever the server builds (MMR, fused with BM25 unless
+``--dense-only``) then answers the labelled questions of
+``fixtures.labelled_questions`` for every ``fetch_k`` x ``k`` x
+``lambda_mult`` combination. Per setting it reports:
+
+- recall@k: share of questions with a labelled source among the retrieved chunks;
+- MRR: mean reciprocal rank of the first chunk from a labelled source;
+- retrieval latency p50/p95, query embedding excluded (it does not depend on
+  the swept settings and is cached after a warm-up pass);
+- context tokens of the retrieved chunks as the answer prompt renders them,
+  and after packing into ``--budget`` tokens.
+
+The server's current setting is marked ``*``; the last line names the fastest
+setting whose recall@k is within ``--tolerance`` of the best.
+
+    python -m bench.retrieval_sweep --chunking 500:50 1000:100 1500:150 --out sweep.json
+
+Fully offline with the default fake embeddings, whose vectors carry no
+meaning: only the BM25 half of the hybrid retriever finds anything, so use
+``--embeddings torch`` or ``onnx`` (the real model, if available locally) for
+numbers to choose settings by. Run from the ``server`` directory.
+"""
+import argparse
+import itertools
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bench.offline import configure
+
+
+def _chunking(value: str) -> tuple:
+    size, overlap = value.split(":")
+    return int(size), int(overlap)
+
+
+def _build(items: list, embeddings):
+    from services.lexical import BM25Index
+    from services.numpy_index import NumpyVectorIndex
+
+    ids = [f"bench-{i}" for i in range(len(items))]
+    texts = [text for text, _ in items]
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    index = NumpyVectorIndex(vectors, ids, texts, [metadata for _, metadata in items])
+    return index, BM25Index.build(zip(ids, texts))
+
+
+def _retriever(index, lexical, embeddings, fetch_k: int, k: int, lambda_mult: float, args):
+    from services.numpy_index import NumpyMMRRetriever
+    from services.rag import MMR_SEARCH_KWARGS, HybridRetriever
+
+    dense = NumpyMMRRetriever(index=index, embeddings=embeddings, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult,
+                              score_threshold=MMR_SEARCH_KWARGS["score_threshold"])
+    if args.dense_only:
+        return dense
+    return HybridRetriever(dense=dense, lexical=lexical, lookup=index.documents_by_id, k=k,
+                           lexical_k=args.lexical_k)
+
+
+def _context_tokens(docs: list) -> int:
+    from services.context_packing import DOCUMENT_TEMPLATE
+    from services.tokens import estimate_tokens
+
+    return sum(estimate_tokens(DOCUMENT_TEMPLATE.format(source=doc.metadata.get("source"),
+                                                        page_content=doc.page_content)) for doc in docs)
+
+
+def _evaluate(retriever, labelled: list, args) -> dict:
+    from services.context_packing import pack_context
+
+    hits, reciprocal_ranks, latencies, tokens, packed = [], [], [], [], []
+    for _ in range(args.repeats):
+        for item in labelled:
+            start = time.perf_counter()
+            docs = retriever.invoke(item["question"])
+            latencies.append(time.perf_counter() - start)
+
+            relevant = set(item["sources"])
+            rank = next((i for i, doc in enumerate(docs, 1) if doc.metadata.get("source") in relevant), None)
+            hits.append(rank is not None)
+            reciprocal_ranks.append(1 / rank if rank else 0.0)
+            tokens.append(_context_tokens(docs))
+            packed.append(_context_tokens(pack_context(docs, args.budget)) if args.budget > 0 else tokens[-1])
+
+    ms = np.asarray(latencies) * 1000
+    return {
+        "recall_at_k": round(float(np.mean(hits)), 3),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 3),
+        "latency_p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "latency_p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "context_tokens": round(float(np.mean(tokens)), 1),
+        "packed_tokens": round(float(np.mean(packed)), 1),
+    }
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench-index-") as tmp:
+        configure(Path(tmp), args)
+
+        from bench.fixtures import labelled_questions, pages, split_pages
+        from services.embeddings import get_embeddings
+
+        embeddings = get_embeddings()
+        corpus = pages(args.pages)
+        labelled = labelled_questions(corpus)
+        rows = []
+        for chunk_size, chunk_overlap in args.chunking:
+            items = split_pages(corpus, chunk_size, chunk_overlap)
+            index, lexical = _build(items, embeddings)
+            # Indexing went through the embedding cache too; bring the questions back.
+            for item in labelled:
+                embeddings.embed_query(item["question"])
+            for fetch_k, k, lambda_mult in itertools.product(args.fetch_k, args.k, args.lambda_mult):
+                if k > fetch_k:
+                    continue
+                retriever = _retriever(index, lexical, embeddings, fetch_k, k, lambda_mult, args)
+                rows.append({
+                    "chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "chunks": len(items),
+                    "fetch_k": fetch_k, "k": k, "lambda_mult": lambda_mult,
+                    **_evaluate(retriever, labelled, args),
+                })
+
+    return {"pages": args.pages, "questions": len(labelled), "embeddings": args.embeddings,
+            "hybrid": not args.dense_only, "budget": args.budget, "rows": rows}
+
+
+def _current(row: dict) -> bool:
+    from services.rag import MMR_SEARCH_KWARGS
+
+    return ((row["chunk_size"], row["chunk_overlap"]) == (1000, 100)
+            and all(row[key] == MMR_SEARCH_KWARGS[key] for key in ("fetch_k", "k", "lambda_mult")))
+
+
+def _print(result: dict, tolerance: float) -> None:
+    rows = result["rows"]
+    print(f"{result['questions']} questions over {result['pages']} pages, {result['embeddings']} embeddings, "
+          f"{'hybrid' if result['hybrid'] else 'dense only'}, context budget {result['budget']}")
+    print(f"  {'chunking':>9} {'chunks':>6} {'fetch_k':>7} {'k':>3} {'lambda':>6} {'recall@k':>8} {'MRR':>6} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'ctx tok':>8} {'packed':>7}")
+    for row in rows:
+        print(f"{'*' if _current(row) else ' '} {row['chunk_size']:>5}:{row['chunk_overlap']:<3} "
+              f"{row['chunks']:>6} {row['fetch_k']:>7} {row['k']:>3} {row['lambda_mult']:>6.2f} "
+              f"{row['recall_at_k']:>8.3f} {row['mrr']:>6.3f} {row['latency_p50_ms']:>7.2f} "
+              f"{row['latency_p95_ms']:>7.2f} {row['context_tokens']:>8.0f} {row['packed_tokens']:>7.0f}")
+
+    if rows:
+        best = max(row["recall_at_k"] for row in rows)
+        good = [row for row in rows if row["recall_at_k"] >= best - tolerance]
+        fastest = min(good, key=lambda row: (row["latency_p50_ms"], row["packed_tokens"]))
+        print(f"fastest within {tolerance:.3f} of the best recall@k ({best:.3f}): "
+              f"chunking {fastest['chunk_size']}:{fastest['chunk_overlap']}, fetch_k={fastest['fetch_k']}, "
+              f"k={fastest['k']}, lambda_mult={fastest['lambda_mult']} "
+              f"(recall@k {fastest['recall_at_k']:.3f}, p50 {fastest['latency_p50_ms']:.2f} ms, "
+              f"{fastest['packed_tokens']:.0f} context tokens)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recall, MRR, latency and context size per retrieval setting")
+    parser.add_argument("--chunking", type=_chunking, nargs="+", default=[(500, 50), (1000, 100), (1500, 150)],
+                        help="splitter configs as chunk_size:chunk_overlap")
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 8])
+    parser.add_argument("--lambda-mult", type=float, nargs="+", default=[0.3, 0.5, 0.7, 1.0])
+    parser.add_argument("--lexical-k", type=int, default=5, help="BM25 hits fused in (FICE_LEXICAL_K)")
+    parser.add_argument("--dense-only", action="store_true", help="MMR alone, as with FICE_HYBRID_SEARCH=false")
+    parser.add_argument("--budget", type=int, default=1200,
+                        help="context token budget to pack into (FICE_CONTEXT_TOKEN_BUDGET); 0 disables")
+    parser.add_argument("--pages", type=int, default=300, help="fixture pages (several chunks each)")
+    parser.add_argument("--repeats", type=int, default=3, help="passes over the questions, for latency")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="recall@k given up for speed")
+    parser.add_argument("--embeddings", choices=["fake", "torch", "onnx"], default="fake")
+    parser.add_argument("--out", type=Path)
+    args = parser.parse_args()
+    args.answer_cache = False
+
+    result = run(args)
+    _print(result, args.tolerance)
+    if args.out:
+        args.out.write_text(json.dumps(result, ensure_ascii=False, indent=1), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
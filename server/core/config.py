@@ -8,6 +8,39 @@ class Settings(BaseSettings):
     chroma_directory: str
     chroma_collection: str
     hf_model: str
+    vector_index: str = "numpy"
+    hybrid_search: bool = True
+    lexical_k: int = 5
+    context_token_budget: int = 1200
+    coalesce_requests: bool = True
+    blocking_workers: int = 8
+    warm_in_background: bool = True
+    llm_max_concurrency: int = 16
+    llm_max_queue: int = 64
+    answer_cache_enabled: bool = True
+    answer_cache_threshold: float = 0.95
+    answer_cache_ttl: int = 6 * 60 * 60
+    answer_cache_size: int = 2000
+    condense_similarity_threshold: float = 0.5
+    condense_memo_size: int = 1024
+    faq_enabled: bool = True
+    faq_directory: str = ""
+    faq_threshold: float = 0.92
+    embedding_backend: str = "torch"
+    onnx_model_dir: str = ""
+    embedding_batch_size: int = 32
+    embedding_batch_wait_ms: float = 5.0
+    embedding_cache_size: int = 4096
+    session_store: str = "memory"
+    session_redis_url: str = "redis://localhost:6379/0"
+    session_ttl: int = 24 * 60 * 60
+    session_max_sessions: int = 10000
+    session_max_turns: int = 3
+    session_answer_chars: int = 500
+    slow_trace_ms: float = 0.0
+    slow_trace_sample_rate: float = 0.1
+    slow_trace_file: str = "slow_traces.jsonl"
+    question_log_file: str = ""
 
     model_config = SettingsConfigDict(
         env_file=".env",
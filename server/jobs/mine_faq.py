@@ -0,0 +1,180 @@
+"""
+Mines the server's question log for its most frequent questions and
+pre-generates their answers into the FAQ artifact served by ``services.faq``.
+
+    python -m jobs.mine_faq --log questions.jsonl --top 200
+
+1. Reads the questions the server logged (``FICE_QUESTION_LOG_FILE``): only
+   those asked without history or rewritten into standalone ones, never a
+   follow-up that only makes sense with the previous turn.
+2. Counts them by normalized text and embeds each distinct question.
+3. Clusters the questions greedily by cosine similarity, most frequent
+   phrasing first, only among questions naming the same numbers and acronyms
+   (MiniLM puts "спеціальність 121" and "спеціальність 126" above any useful
+   threshold), and keeps the ``--top`` intents asked ``--min-count`` times.
+4. Answers each intent's most frequent phrasing with the RAG pipeline and
+   keeps the answers grounded in at least one retrieved source.
+
+The artifact is bound to the current index version and, since the answer
+prompt carries the date, to the day it was generated: the server ignores it
+after a re-index or at midnight. Re-run this job daily and after every
+``scraper/index_to_chroma.py``. Needs the server's ``.env``; run from the
+``server`` directory.
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from core.config import get_settings
+from services.embeddings import get_embeddings
+from services.faq import FaqStore, QuestionLog, faq_directory, normalize_question
+from services.key_terms import key_terms
+from services.vectorstore import get_index_version
+
+EMBED_BATCH = 256
+# Member phrasings kept per intent for exact matching.
+MAX_PHRASINGS = 50
+
+
+def user_questions(log: Path) -> List[str]:
+    # The log holds standalone questions only; history-dependent turns never reach it.
+    questions = [q.strip() for q in QuestionLog.read(log)]
+    return [q for q in questions if len(q) >= 5]
+
+
+def count_phrasings(questions: List[str]) -> List[Tuple[str, int, Counter]]:
+    """``(normalized question, count, original phrasings)``, most frequent first."""
+    by_key: Dict[str, Counter] = {}
+    for question in questions:
+        by_key.setdefault(normalize_question(question), Counter())[question] += 1
+    return sorted(((key, sum(c.values()), c) for key, c in by_key.items()), key=lambda item: -item[1])
+
+
+def embed(texts: List[str]) -> np.ndarray:
+    embeddings = get_embeddings()
+    vectors = np.concatenate([np.asarray(embeddings.embed_documents(texts[i:i + EMBED_BATCH]), dtype=np.float32)
+                              for i in range(0, len(texts), EMBED_BATCH)])
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def cluster(vectors: np.ndarray, weights: np.ndarray, groups: np.ndarray,
+            threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Greedy leader clustering of normalized ``vectors``, in the given order: a
+    vector joins the closest centroid of its group at ``threshold`` or above,
+    or starts a cluster. Centroids are weighted by ``weights``. Returns the
+    labels and the normalized centroids.
+    """
+    sums = np.zeros_like(vectors)
+    centroids = np.zeros_like(vectors)
+    cluster_groups = np.empty(len(vectors), dtype=np.int64)
+    labels = np.empty(len(vectors), dtype=np.int64)
+    clusters = 0
+    for i, vector in enumerate(vectors):
+        if clusters:
+            scores = centroids[:clusters] @ vector
+            scores[cluster_groups[:clusters] != groups[i]] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold:
+                labels[i] = best
+                sums[best] += weights[i] * vector
+                centroids[best] = sums[best] / np.linalg.norm(sums[best])
+                continue
+        labels[i] = clusters
+        cluster_groups[clusters] = groups[i]
+        sums[clusters] = weights[i] * vector
+        centroids[clusters] = vector
+        clusters += 1
+    return labels, centroids[:clusters]
+
+
+async def answer_all(questions: List[str], concurrency: int) -> Tuple[str, List[Tuple[str, List[str]]]]:
+    """
+    The answer prompt's date, and ``(answer, sources)`` for each question from
+    the RAG pipeline without any shortcut.
+    """
+    from services.rag import get_qa_chain
+
+    pipeline = get_qa_chain()
+    pipeline.faq = pipeline.cache = pipeline.flights = pipeline.question_log = None
+    slots = asyncio.Semaphore(concurrency)
+
+    async def answer(question: str) -> Tuple[str, List[str]]:
+        async with slots:
+            result = await pipeline.ainvoke({"input": question, "chat_history": []})
+        sources = list(dict.fromkeys(doc.metadata["source"] for doc in result["context"]
+                                     if doc.metadata.get("source")))
+        return result["answer"], sources
+
+    return pipeline.date, await asyncio.gather(*(answer(q) for q in questions))
+
+
+def mine(args) -> FaqStore:
+    settings = get_settings()
+    version = get_index_version()
+    questions = user_questions(args.log)
+    phrasings = count_phrasings(questions)
+    print(f"{len(questions)} questions, {len(phrasings)} distinct")
+    if not phrasings:
+        return FaqStore([], np.zeros((0, 0), dtype=np.float32), settings.faq_threshold, version, settings.hf_model)
+
+    start = time.perf_counter()
+    representatives = [counter.most_common(1)[0][0] for _, _, counter in phrasings]
+    vectors = embed(representatives)
+    counts = np.asarray([count for _, count, _ in phrasings], dtype=np.float32)
+    group_ids: Dict[frozenset, int] = {}
+    groups = np.asarray([group_ids.setdefault(key_terms(q), len(group_ids)) for q in representatives])
+    labels, centroids = cluster(vectors, counts, groups, args.cluster_threshold)
+    print(f"{len(centroids)} intents in {time.perf_counter() - start:.1f} s")
+
+    totals = np.bincount(labels, weights=counts)
+    intents = [int(c) for c in np.argsort(-totals) if totals[c] >= args.min_count][:args.top]
+    members = {c: [] for c in intents}
+    for i, label in enumerate(labels):
+        if int(label) in members:
+            members[int(label)].append(i)
+
+    # Members are in frequency order, so the first is the intent's most asked phrasing.
+    heads = [representatives[members[c][0]] for c in intents]
+    date, answers = asyncio.run(answer_all(heads, args.concurrency))
+
+    entries, kept = [], []
+    for c, head, (answer, sources) in zip(intents, heads, answers):
+        if not sources or not answer:
+            print(f"skipped (no sources): {head}")
+            continue
+        phrasings_of = [p for i in members[c] for p, _ in phrasings[i][2].most_common()][:MAX_PHRASINGS]
+        entries.append({"question": head, "questions": phrasings_of, "count": int(totals[c]),
+                        "answer": answer, "sources": sources})
+        kept.append(c)
+    covered = sum(entry["count"] for entry in entries)
+    print(f"{len(entries)} FAQ entries covering {covered / len(questions):.1%} of the questions")
+    return FaqStore(entries, centroids[kept], settings.faq_threshold, version, settings.hf_model, date)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mine frequent questions into the server's FAQ artifact")
+    parser.add_argument("--log", type=Path, default=get_settings().question_log_file or None,
+                        help="the server's question log (FICE_QUESTION_LOG_FILE)")
+    parser.add_argument("--top", type=int, default=200, help="intents to answer")
+    parser.add_argument("--min-count", type=int, default=3, help="times an intent must have been asked")
+    parser.add_argument("--cluster-threshold", type=float, default=0.85,
+                        help="cosine similarity for two phrasings to be one intent")
+    parser.add_argument("--concurrency", type=int, default=4, help="answers generated at once")
+    args = parser.parse_args()
+    if args.log is None:
+        parser.error("no question log: set FICE_QUESTION_LOG_FILE on the server or pass --log")
+
+    store = mine(args)
+    directory = faq_directory()
+    store.save(directory)
+    print(f"FAQ for index {store.version}, {store.date}, written to {directory}")
+
+
+if __name__ == "__main__":
+    main()
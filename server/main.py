@@ -1,17 +1,42 @@
+import asyncio
+import logging
+
 from fastapi import FastAPI
 from core.config import get_settings
+from api.admin import router as admin_router
 from api.chat import router as chat_router
+from api.health import router as health_router
+from api.metrics import router as metrics_router
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="FICE Chatbot")
 app.include_router(chat_router)
+app.include_router(admin_router)
+app.include_router(health_router)
+app.include_router(metrics_router)
+
+
+def _warm_in_background(registry) -> None:
+    try:
+        registry.warm()
+    except Exception as e:
+        # /health/ready reports the failure; requests still build the pipeline on demand.
+        logger.exception("Warm-up failed: %s", e)
 
 
 @app.on_event("startup")
-def _startup():
-    from services.vectorstore import get_vectordb
-    from services.llm import get_llm
-    get_vectordb()
-    get_llm()
+async def _startup():
+    from services.executor import get_executor
+    from services.rag import get_chain_registry
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(get_executor())
+    registry = get_chain_registry()
+    if get_settings().warm_in_background:
+        # Serve /health/live at once; the model and index load while /health/ready says "warming".
+        app.state.warm_up = loop.run_in_executor(None, _warm_in_background, registry)
+    else:
+        registry.warm()
 
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 
 class Msg(BaseModel):
@@ -8,8 +8,13 @@ class Msg(BaseModel):
 
 
 class ChatReq(BaseModel):
-    conversation: List[Msg]
+    conversation: List[Msg] = Field(default_factory=list)
+    # Session mode: the server keeps the history and answers the new ``message``;
+    # ``conversation`` then only seeds a session the server does not have.
+    session_id: Optional[str] = None
+    message: Optional[str] = None
 
 
 class ChatResp(BaseModel):
     answer: str
+    session_id: Optional[str] = None
@@ -0,0 +1,105 @@
+"""
+Admission control in front of the LLM: a bounded queue served round-robin
+across clients.
+
+A client (a Telegram chat, a session, an IP) that floods the server only
+lengthens its own queue: free slots go to the next client in turn, so the
+others keep their place. When the queue is full, new calls are shed at once
+with ``Overloaded`` instead of waiting behind work that cannot finish in time.
+
+The limiter lives in the process: with several workers, the slots
+(FICE_LLM_MAX_CONCURRENCY) and the queue (FICE_LLM_MAX_QUEUE) apply to each
+worker, and the server as a whole admits that many times more.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Deque, Dict, Hashable, Optional
+
+from services.metrics import Counter, Histogram, register
+
+QUEUE_SECONDS = Histogram("fice_llm_queue_seconds", "Time LLM calls waited for a slot.")
+SHED = Counter("fice_llm_shed_total", "LLM calls rejected because the queue was full.")
+register(QUEUE_SECONDS)
+register(SHED)
+
+# Set by the API for each request; LLM calls made on its behalf queue under it.
+current_client: ContextVar[Hashable] = ContextVar("fice_llm_client", default="anonymous")
+
+
+class Overloaded(Exception):
+    """The LLM queue is full; the caller should retry later."""
+
+
+class FairLimiter:
+    def __init__(self, slots: int, max_queue: int):
+        self._free = slots
+        self._max_queue = max_queue
+        self._queues: OrderedDict[Hashable, Deque[asyncio.Future]] = OrderedDict()
+        self._queued = 0
+
+    def queued(self) -> int:
+        return self._queued
+
+    def overloaded(self) -> bool:
+        return self._queued >= self._max_queue
+
+    def stats(self) -> Dict[str, float]:
+        return {"free_slots": self._free, "queued": self._queued, "queued_clients": len(self._queues)}
+
+    async def acquire(self, client: Optional[Hashable] = None) -> None:
+        if self._free and not self._queued:
+            self._free -= 1
+            QUEUE_SECONDS.observe(0.0)
+            return
+        if self.overloaded():
+            SHED.inc()
+            raise Overloaded
+
+        client = current_client.get() if client is None else client
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append(waiter)
+        self._queued += 1
+        start = time.perf_counter()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as we were cancelled: pass it on.
+                self.release()
+            else:
+                self._withdraw(client, waiter)
+            raise
+        QUEUE_SECONDS.observe(time.perf_counter() - start)
+
+    def release(self) -> None:
+        while self._queues:
+            client, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self._queued -= 1
+            if queue:
+                # Served once: to the back of the round.
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._free += 1
+
+    def _withdraw(self, client: Hashable, waiter: asyncio.Future) -> None:
+        queue = self._queues.get(client)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self._queued -= 1
+        if not queue:
+            del self._queues[client]
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
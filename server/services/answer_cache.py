@@ -0,0 +1,139 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from threading import Lock
+from typing import FrozenSet, Optional, Sequence
+
+import numpy as np
+
+from core.config import get_settings
+from services.key_terms import key_terms
+
+
+@dataclass
+class _Entry:
+    question: str
+    answer: str
+    created_at: float
+    key_terms: FrozenSet[str]
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by the embedding of the standalone question.
+
+    A lookup is a hit when a stored question's cosine similarity to the new one
+    reaches ``threshold`` and both name the same numbers and acronyms (121 and
+    126 embed almost identically). Entries expire after ``ttl`` seconds and the least
+    recently used one is evicted once ``max_size`` is reached. Every call
+    carries the current index version; when it changes the cache is emptied,
+    so re-indexing never serves answers built from the old collection.
+    """
+
+    def __init__(self, threshold: float, ttl: float, max_size: int):
+        self._threshold = threshold
+        self._ttl = ttl
+        self._max_size = max_size
+        self._lock = Lock()
+        self._version: Optional[str] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._valid = np.zeros(max_size, dtype=bool)
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def lookup(self, question: str, vector: Sequence[float], version: str) -> Optional[str]:
+        query = _normalize(vector)
+        terms = key_terms(question)
+        with self._lock:
+            self._check_version(version)
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            scores = self._vectors @ query
+            scores[~self._valid] = -np.inf
+            candidates = np.flatnonzero(scores >= self._threshold)
+            slot = next((int(c) for c in candidates[np.argsort(-scores[candidates])]
+                         if self._entries[int(c)].key_terms == terms), None)
+            if slot is None:
+                self.misses += 1
+                return None
+
+            entry = self._entries[slot]
+            if time.monotonic() - entry.created_at > self._ttl:
+                self._drop(slot)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return entry.answer
+
+    def store(self, question: str, vector: Sequence[float], answer: str, version: str) -> None:
+        query = _normalize(vector)
+        with self._lock:
+            self._check_version(version)
+            if self._vectors is None:
+                self._vectors = np.zeros((self._max_size, query.shape[0]), dtype=np.float32)
+
+            if len(self._entries) >= self._max_size:
+                oldest, _ = self._entries.popitem(last=False)
+                self._valid[oldest] = False
+                self.evictions += 1
+            slot = int(np.argmin(self._valid))
+
+            self._vectors[slot] = query
+            self._valid[slot] = True
+            self._entries[slot] = _Entry(question=question, answer=answer, created_at=time.monotonic(),
+                                         key_terms=key_terms(question))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._valid[:] = False
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "version": self._version,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "threshold": self._threshold,
+        }
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            self._entries.clear()
+            self._valid[:] = False
+            self._version = version
+
+    def _drop(self, slot: int) -> None:
+        del self._entries[slot]
+        self._valid[slot] = False
+
+
+def _normalize(vector: Sequence[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+@lru_cache
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    settings = get_settings()
+    if not settings.answer_cache_enabled:
+        return None
+    return SemanticAnswerCache(
+        threshold=settings.answer_cache_threshold,
+        ttl=settings.answer_cache_ttl,
+        max_size=settings.answer_cache_size,
+    )
@@ -0,0 +1,126 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable
+
+# Pronouns, demonstratives and elliptical openers that make a follow-up lean on
+# the previous turn ("а для магістрів?", "скільки це коштує?", "what about 126?").
+# Ukrainian pronouns take an н- form after prepositions ("для неї", "про нього").
+_FOLLOW_UP = re.compile(
+    r"\b(він|вона|воно|вони|"
+    r"його|нього|йому|ньому|ним|нім|її|неї|їй|ній|нею|їх|них|їм|ними|"
+    r"цей|ця|це|ці|цю|цього|цієї|цих|цьому|цій|цим|цією|цими|"
+    r"той|те|ті|ту|того|тієї|тих|тому|тій|тим|тією|тими|там|тут|туди|сюди|звідти|звідси|"
+    # "що таке 121?" asks for a definition; "IT" is the industry, not the pronoun.
+    r"такий|така|(?<!що\s)таке|такі|такого|такої|таких|теж|також|ще|"
+    r"(?-i:it|It)|its|this|that|these|those|they|them|their|there|same|also)\b",
+    re.IGNORECASE,
+)
+_ELLIPTICAL_START = re.compile(r"^\s*(а|і|й|та|ну|and|but|what about|how about)\b", re.IGNORECASE)
+
+
+def looks_like_follow_up(question: str) -> bool:
+    return bool(_ELLIPTICAL_START.search(question) or _FOLLOW_UP.search(question))
+
+
+class QuestionCondenser:
+    """
+    Turns the last question into a standalone one, calling the LLM only when needed.
+
+    The rewrite is skipped when there is no history, or when the question has
+    no pronoun/ellipsis markers and is not close (by embedding similarity) to
+    the previous user turn. Rewrites are memoized per (history, question).
+    """
+
+    def __init__(self,
+                 condense_chain: Runnable,
+                 embeddings: Embeddings,
+                 similarity_threshold: float,
+                 memo_size: int):
+        self._condense_chain = condense_chain
+        self._embeddings = embeddings
+        self._similarity_threshold = similarity_threshold
+        self._memo_size = memo_size
+        self._memo: OrderedDict[Tuple, str] = OrderedDict()
+        self._lock = Lock()
+        self.skipped_no_history = 0
+        self.skipped_self_contained = 0
+        self.rewritten = 0
+        self.memo_hits = 0
+        self.rewrite_seconds = 0.0
+
+    async def acondense(self, inputs: dict) -> str:
+        standalone, _ = await self.acondense_turn(inputs)
+        return standalone
+
+    async def acondense_turn(self, inputs: dict) -> Tuple[str, bool]:
+        """
+        The standalone question, and whether it stands on its own: asked without
+        history, or rewritten from it. A question judged self-contained but
+        asked after earlier turns may still depend on them.
+        """
+        question = inputs["input"]
+        history: Sequence[Tuple[str, str]] = inputs.get("chat_history") or []
+        if not history:
+            self.skipped_no_history += 1
+            return question, True
+
+        if not await self._needs_rewrite(question, history):
+            self.skipped_self_contained += 1
+            return question, False
+
+        key = (tuple(map(tuple, history)), question)
+        with self._lock:
+            standalone = self._memo.get(key)
+            if standalone is not None:
+                self._memo.move_to_end(key)
+                self.memo_hits += 1
+                return standalone, True
+
+        start = time.perf_counter()
+        standalone = await self._condense_chain.ainvoke(inputs)
+        self.rewrite_seconds += time.perf_counter() - start
+        self.rewritten += 1
+
+        with self._lock:
+            self._memo[key] = standalone
+            if len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+        return standalone, True
+
+    async def _needs_rewrite(self, question: str, history: Sequence[Tuple[str, str]]) -> bool:
+        if looks_like_follow_up(question):
+            return True
+        # Separate queries rather than one document batch: they go through the
+        # query cache, and the question's vector is reused by retrieval.
+        previous, current = np.asarray(
+            await asyncio.gather(
+                self._embeddings.aembed_query(history[-1][0]),
+                self._embeddings.aembed_query(question),
+            ),
+            dtype=np.float32,
+        )
+        norms = np.linalg.norm(previous) * np.linalg.norm(current)
+        return bool(norms) and float(previous @ current / norms) >= self._similarity_threshold
+
+    def stats(self) -> dict:
+        skipped = self.skipped_no_history + self.skipped_self_contained
+        total = skipped + self.rewritten + self.memo_hits
+        rewrite_avg = self.rewrite_seconds / self.rewritten if self.rewritten else 0.0
+        return {
+            "total": total,
+            "skipped_no_history": self.skipped_no_history,
+            "skipped_self_contained": self.skipped_self_contained,
+            "rewritten": self.rewritten,
+            "memo_hits": self.memo_hits,
+            "skip_rate": skipped / total if total else 0.0,
+            "rewrite_ms_avg": rewrite_avg * 1000,
+            # Every skip or memo hit on a turn with history saves one rewrite call.
+            "saved_ms_estimate": (self.skipped_self_contained + self.memo_hits) * rewrite_avg * 1000,
+        }
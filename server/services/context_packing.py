@@ -0,0 +1,123 @@
+"""
+Packs retrieved chunks into the answer prompt's context under a token budget.
+
+Chunks of the same page are merged into passages without the splitter's
+overlap, each source URL is cited once, and sources are added by relevance
+until the budget is spent.
+"""
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from services.tokens import estimate_tokens
+
+# How each packed source is rendered by the answer chain's document prompt.
+DOCUMENT_TEMPLATE = "Source: {source}. Content:\n{page_content}"
+PASSAGE_SEPARATOR = "\n…\n"
+# Shortest shared text taken as splitter overlap when chunks carry no ``start_index``.
+MIN_TEXT_OVERLAP = 20
+MAX_TEXT_OVERLAP = 400
+
+
+@dataclass
+class _Passage:
+    text: str
+    page: int
+    start: Optional[int]
+
+    @property
+    def end(self) -> Optional[int]:
+        return None if self.start is None else self.start + len(self.text)
+
+
+@dataclass
+class _Source:
+    url: str
+    title: Optional[str]
+    passages: List[_Passage] = field(default_factory=list)
+    chunks: int = 0
+
+    def render(self) -> str:
+        passages = sorted(self.passages, key=lambda p: (p.page, p.start if p.start is not None else 0))
+        return PASSAGE_SEPARATOR.join(p.text for p in passages)
+
+
+def _text_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of ``left`` that starts ``right``, if long enough to be splitter overlap."""
+    for size in range(min(len(left), len(right), MAX_TEXT_OVERLAP), MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _join(passage: _Passage, chunk: _Passage) -> Optional[_Passage]:
+    """``passage`` and ``chunk`` as one passage, or None if they are not neighbours on the page."""
+    if passage.page != chunk.page:
+        return None
+    if passage.start is not None and chunk.start is not None:
+        first, second = (passage, chunk) if passage.start <= chunk.start else (chunk, passage)
+        if second.start > first.end:
+            return None
+        return _Passage(first.text + second.text[first.end - second.start:], first.page, first.start) \
+            if second.end > first.end else first
+    if chunk.text in passage.text:
+        return passage
+    overlap = _text_overlap(passage.text, chunk.text)
+    if overlap:
+        return _Passage(passage.text + chunk.text[overlap:], passage.page, passage.start)
+    overlap = _text_overlap(chunk.text, passage.text)
+    if overlap:
+        return _Passage(chunk.text + passage.text[overlap:], passage.page, chunk.start)
+    return None
+
+
+def _add(source: _Source, chunk: _Passage) -> None:
+    source.chunks += 1
+    # A merged passage may now reach another one, so keep folding until nothing joins.
+    while True:
+        for i, passage in enumerate(source.passages):
+            joined = _join(passage, chunk)
+            if joined is not None:
+                del source.passages[i]
+                chunk = joined
+                break
+        else:
+            source.passages.append(chunk)
+            return
+
+
+def _group(docs: List[Document]) -> Dict[str, _Source]:
+    """Chunks by source URL, in order of each source's best-ranked chunk."""
+    sources: Dict[str, _Source] = {}
+    for doc in docs:
+        url = doc.metadata.get("source", "")
+        source = sources.get(url)
+        if source is None:
+            source = sources[url] = _Source(url, doc.metadata.get("title"))
+        _add(source, _Passage(doc.page_content, doc.metadata.get("page", 0), doc.metadata.get("start_index")))
+    return sources
+
+
+def _tokens(sources: Dict[str, _Source], count: Callable[[str], int]) -> int:
+    return sum(count(DOCUMENT_TEMPLATE.format(source=s.url, page_content=s.render())) for s in sources.values())
+
+
+def pack_context(docs: List[Document],
+                 budget_tokens: int,
+                 count_tokens: Callable[[str], int] = estimate_tokens) -> List[Document]:
+    """
+    One document per source URL, built from ``docs`` (best first) while the
+    rendered context fits ``budget_tokens``. A chunk that would overflow the
+    budget is skipped, so a shorter, less relevant one can still fit; the best
+    chunk is always kept.
+    """
+    selected: List[Document] = []
+    for doc in docs:
+        if selected and _tokens(_group(selected + [doc]), count_tokens) > budget_tokens:
+            continue
+        selected.append(doc)
+
+    return [Document(page_content=source.render(),
+                     metadata={"source": source.url, "title": source.title, "chunks": source.chunks})
+            for source in _group(selected).values()]
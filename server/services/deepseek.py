@@ -0,0 +1,19 @@
+from langchain_deepseek import ChatDeepSeek
+
+from services.llm import get_llm_slots
+
+
+class BoundedChatDeepSeek(ChatDeepSeek):
+    """
+    ChatDeepSeek that caps the number of concurrent in-flight async calls;
+    the rest queue fairly per client, or are shed when the queue is full.
+    """
+
+    async def _agenerate(self, *args, **kwargs):
+        async with get_llm_slots():
+            return await super()._agenerate(*args, **kwargs)
+
+    async def _astream(self, *args, **kwargs):
+        async with get_llm_slots():
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
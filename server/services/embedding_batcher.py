@@ -0,0 +1,163 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an ``Embeddings`` model with an LRU cache by text. Vectors are kept
+    as float32 arrays, to keep the memory per entry small, so repeated queries
+    and repeated chunks skip the model entirely.
+
+    Free of server configuration: the indexer wraps its own model in it.
+    """
+
+    def __init__(self, inner: Embeddings, cache_size: int = 4096):
+        self.inner = inner
+        self._cache_size = cache_size
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = {text: self._cache_get(text) for text in texts}
+        missing = [text for text, vector in vectors.items() if vector is None]
+        if missing:
+            for text, vector in zip(missing, self.inner.embed_documents(missing)):
+                vectors[text] = vector
+                self._cache_put(text, vector)
+        return [vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._cache_get(text)
+        if vector is not None:
+            return vector
+        vector = self.inner.embed_query(text)
+        self._cache_put(text, vector)
+        return vector
+
+    def stats(self) -> dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "cache_size": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": self.cache_hits / lookups if lookups else 0.0,
+        }
+
+    def _cache_get(self, text: str) -> Optional[List[float]]:
+        with self._cache_lock:
+            vector = self._cache.get(text)
+            if vector is None:
+                self.cache_misses += 1
+                return None
+            self._cache.move_to_end(text)
+            self.cache_hits += 1
+            return vector.tolist()
+
+    def _cache_put(self, text: str, vector: List[float]) -> None:
+        if self._cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[text] = np.asarray(vector, dtype=np.float32)
+            self._cache.move_to_end(text)
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+
+class BatchingEmbeddings(CachedEmbeddings):
+    """
+    ``CachedEmbeddings`` with query micro-batching.
+
+    Concurrent ``embed_query`` / ``aembed_query`` calls that miss the cache are
+    queued to a single worker thread, which waits up to ``max_wait_ms`` for
+    more queries (at most ``max_batch_size``) and embeds them in one forward
+    pass.
+    """
+
+    def __init__(self,
+                 inner: Embeddings,
+                 max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0,
+                 cache_size: int = 4096):
+        super().__init__(inner, cache_size)
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait_ms / 1000
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self.batches = 0
+        self.batched_queries = 0
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._cache_get(text)
+        if vector is not None:
+            return vector
+        return self._submit(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self._cache_get(text)
+        if vector is not None:
+            return vector
+        return await asyncio.wrap_future(self._submit(text))
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "batches": self.batches,
+            "avg_batch_size": self.batched_queries / self.batches if self.batches else 0.0,
+        }
+
+    def _submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((text, future))
+        return future
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._max_wait
+            while len(batch) < self._max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Drop callers that gave up while queued; the rest can no longer be cancelled.
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = dict(zip(texts, self.inner.embed_documents(texts)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.batched_queries += len(batch)
+            for text, vector in vectors.items():
+                self._cache_put(text, vector)
+            for text, future in batch:
+                future.set_result(vectors[text])
@@ -1,12 +1,44 @@
-from langchain_huggingface import HuggingFaceEmbeddings
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
 from core.config import get_settings
 from functools import lru_cache
 
+from services.embedding_batcher import BatchingEmbeddings
+from services.numpy_index import NUMPY_INDEX_DIR, SNAPSHOT_ONNX_DIR
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+
+def build_base_embeddings(backend: str, onnx_model_dir: str) -> Embeddings:
+    """
+    The raw embedding model. Backends are imported lazily so the ONNX one never
+    pulls torch into the process.
+    """
+    if backend == "onnx":
+        from services.onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings(onnx_model_dir)
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+            model_kwargs={"device": "cpu"}
+        )
+    raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {EMBEDDING_BACKENDS}")
+
+
+def onnx_model_directory() -> str:
+    """``FICE_ONNX_MODEL_DIR``, or when empty the model shipped in the index snapshot."""
+    settings = get_settings()
+    return settings.onnx_model_dir or str(Path(settings.chroma_directory) / NUMPY_INDEX_DIR / SNAPSHOT_ONNX_DIR)
+
 
 @lru_cache
-def get_embeddings() -> HuggingFaceEmbeddings:
+def get_embeddings() -> BatchingEmbeddings:
     settings = get_settings()
-    return HuggingFaceEmbeddings(
-        model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-        model_kwargs={"device": "cpu"}
+    return BatchingEmbeddings(
+        build_base_embeddings(settings.embedding_backend, onnx_model_directory()),
+        max_batch_size=settings.embedding_batch_size,
+        max_wait_ms=settings.embedding_batch_wait_ms,
+        cache_size=settings.embedding_cache_size,
     )
@@ -0,0 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from core.config import get_settings
+
+
+@lru_cache
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Bounded pool for blocking work (Chroma queries, embedding forward passes).
+
+    Installed as the event loop's default executor at startup, so LangChain's
+    ``run_in_executor`` fallbacks for sync-only components land here too.
+    """
+    settings = get_settings()
+    return ThreadPoolExecutor(
+        max_workers=settings.blocking_workers,
+        thread_name_prefix="rag-blocking",
+    )
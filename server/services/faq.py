@@ -0,0 +1,167 @@
+"""
+Precomputed answers to the most frequent questions, mined from the server's
+question log by ``jobs/mine_faq.py``.
+
+The artifact is a directory with ``vectors.npy`` (one normalized centroid per
+intent) and ``faq.json`` (answers, sources, member questions, and the index
+version and prompt date they were generated with). A question is matched first by its
+normalized text, a dictionary lookup, then by the cosine similarity of its
+embedding to the centroids. Either way the question must name the same
+numbers and acronyms as the intent's head question. An artifact built for another index version or
+embedding model is not loaded, and the pipeline only serves answers generated
+for its own date, so stale answers are never served.
+"""
+import json
+import logging
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core.config import get_settings
+from services.key_terms import key_terms
+from services.vectorstore import get_index_version
+
+logger = logging.getLogger(__name__)
+
+FAQ_DIR = "faq"
+FAQ_FILE = "faq.json"
+VECTORS_FILE = "vectors.npy"
+
+
+def normalize_question(text: str) -> str:
+    """Case, spacing and final punctuation do not change what is being asked."""
+    return " ".join(text.casefold().split()).rstrip("?!.… ")
+
+
+class QuestionLog:
+    """
+    Appends the questions the pipeline answers, as JSON lines, for
+    ``jobs/mine_faq.py``. Only questions that stand on their own are recorded
+    (asked without history, or rewritten from it), so each line means the
+    same in any chat.
+    """
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._lock = Lock()
+
+    def record(self, question: str) -> None:
+        line = json.dumps({"time": time.time(), "question": question}, ensure_ascii=False)
+        with self._lock, self._path.open("a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+
+    @staticmethod
+    def read(path: Path) -> List[str]:
+        with path.open(encoding="utf-8") as fh:
+            return [json.loads(line)["question"] for line in fh if line.strip()]
+
+
+class FaqStore:
+    def __init__(self, entries: List[dict], vectors: np.ndarray, threshold: float, version: str, model: str,
+                 date: Optional[str] = None):
+        self.entries = entries
+        self.vectors = vectors
+        self.version = version
+        self.model = model
+        # The answer prompt's date when the answers were generated; they may depend on it.
+        self.date = date
+        self._threshold = threshold
+        self._key_terms = [key_terms(entry["question"]) for entry in entries]
+        # Phrasings naming other numbers than the head (121 vs 126) never map to its answer.
+        self._exact: Dict[str, int] = {normalize_question(q): i
+                                       for i, entry in enumerate(entries) for q in entry["questions"]
+                                       if key_terms(q) == self._key_terms[i]}
+        self._lock = Lock()
+        self.exact_hits = 0
+        self.vector_hits = 0
+        self.misses = 0
+
+    def exact(self, question: str) -> Optional[str]:
+        i = self._exact.get(normalize_question(question))
+        if i is None:
+            return None
+        with self._lock:
+            self.exact_hits += 1
+        return self.entries[i]["answer"]
+
+    def nearest(self, question: str, vector: Sequence[float]) -> Optional[str]:
+        if not self.entries:
+            return None
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        scores = self.vectors @ query
+        terms = key_terms(question)
+        scores[[entry_terms != terms for entry_terms in self._key_terms]] = -np.inf
+        i = int(np.argmax(scores))
+        with self._lock:
+            if scores[i] < self._threshold:
+                self.misses += 1
+                return None
+            self.vector_hits += 1
+        return self.entries[i]["answer"]
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.vector_hits + self.misses
+        return {
+            "version": self.version,
+            "entries": len(self.entries),
+            "exact_hits": self.exact_hits,
+            "vector_hits": self.vector_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.vector_hits) / lookups if lookups else 0.0,
+        }
+
+    def save(self, directory: Path) -> None:
+        """Writes the artifact through temporary files, so a crash never leaves a truncated one."""
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp_vectors = directory / (VECTORS_FILE + ".tmp")
+        with open(tmp_vectors, "wb") as fh:
+            np.save(fh, self.vectors.astype(np.float32))
+        tmp_meta = directory / (FAQ_FILE + ".tmp")
+        tmp_meta.write_text(json.dumps({"version": self.version, "model": self.model, "date": self.date,
+                                        "threshold": self._threshold, "entries": self.entries},
+                                       ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_vectors, directory / VECTORS_FILE)
+        os.replace(tmp_meta, directory / FAQ_FILE)
+
+    @classmethod
+    def load(cls, directory: Path, threshold: float) -> "FaqStore":
+        with open(directory / FAQ_FILE, encoding="utf-8") as fh:
+            meta = json.load(fh)
+        vectors = np.load(directory / VECTORS_FILE, mmap_mode="r")
+        return cls(meta["entries"], vectors, threshold, meta["version"], meta["model"], meta.get("date"))
+
+
+def faq_directory() -> Path:
+    settings = get_settings()
+    return Path(settings.faq_directory or Path(settings.chroma_directory) / FAQ_DIR)
+
+
+@lru_cache
+def get_faq_store() -> Optional[FaqStore]:
+    """
+    The mined FAQ for the current index, or None when disabled, not mined yet
+    or mined before the last re-index. Its date is checked by the pipeline.
+    """
+    settings = get_settings()
+    if not settings.faq_enabled:
+        return None
+    directory = faq_directory()
+    try:
+        store = FaqStore.load(directory, settings.faq_threshold)
+    except FileNotFoundError:
+        return None
+    if store.version != get_index_version():
+        logger.warning("FAQ in %s was mined for index %s, not the current %s; re-run jobs.mine_faq",
+                       directory, store.version, get_index_version())
+        return None
+    if store.model != settings.hf_model:
+        logger.warning("FAQ in %s was embedded with %s, not %s; re-run jobs.mine_faq",
+                       directory, store.model, settings.hf_model)
+        return None
+    return store
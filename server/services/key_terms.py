@@ -0,0 +1,22 @@
+"""
+The numbers and acronyms a question names: specialty codes (121, 126),
+years, group numbers, department abbreviations (ІПІ, ІСТ).
+
+Sentence embeddings barely separate questions that differ only in these, so
+a stored answer is reused only for a question naming exactly the same ones.
+"""
+import re
+from typing import FrozenSet
+
+_WORDS = re.compile(r"[^\W_]+", re.UNICODE)
+_DIGITS = re.compile(r"\d+")
+
+
+def key_terms(text: str) -> FrozenSet[str]:
+    terms = set()
+    for word in _WORDS.findall(text):
+        terms.update(_DIGITS.findall(word))
+        letters = _DIGITS.sub("", word)
+        if len(letters) >= 2 and letters.isupper():
+            terms.add(letters)
+    return frozenset(terms)
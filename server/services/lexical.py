@@ -0,0 +1,154 @@
+"""
+BM25 inverted index over the indexed chunks.
+
+Built by ``scraper/index_to_chroma.py`` next to the Chroma collection and
+loaded by the server, so both sides share this tokenizer. Kept free of server
+configuration for that reason.
+"""
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+LEXICAL_INDEX_FILE = "bm25.npz"
+
+_TOKEN = re.compile(r"[^\W_]+(?:['’ʼ][^\W_]+)*")
+_APOSTROPHES = str.maketrans({"’": "'", "ʼ": "'", "`": "'"})
+# Common Ukrainian inflectional endings, longest first. Stripping them lets
+# "стипендії" match "стипендія"; short tokens (codes, acronyms) are kept as is.
+_UK_ENDINGS = tuple(sorted((
+    "ами", "ями", "ах", "ях", "ові", "еві", "ого", "ому", "ими", "іми", "их", "іх",
+    "ій", "ий", "ої", "ою", "ею", "єю", "ам", "ям", "ом", "ем", "ів", "ей",
+    "ія", "ії", "ію", "ья", "а", "я", "у", "ю", "о", "е", "і", "ї", "и", "ь",
+), key=len, reverse=True))
+_EN_ENDINGS = ("ing", "es", "s")
+_MIN_STEM = 4
+
+
+def _stem(token: str) -> str:
+    if token.isdigit() or len(token) <= _MIN_STEM:
+        return token
+    endings = _EN_ENDINGS if token.isascii() else _UK_ENDINGS
+    for ending in endings:
+        if token.endswith(ending) and len(token) - len(ending) >= _MIN_STEM:
+            return token[:-len(ending)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased word/number tokens with light Ukrainian/English stemming.
+    Numbers ("121", "126") and acronyms ("ІПІ", "ІСТ") survive intact.
+    """
+    return [_stem(token) for token in _TOKEN.findall(text.translate(_APOSTROPHES).lower())]
+
+
+class BM25Index:
+    """
+    Postings in CSR layout: ``offsets[t]:offsets[t + 1]`` slices ``postings``
+    (chunk rows, int32) and ``frequencies`` (term counts, uint16) for term ``t``.
+    """
+
+    def __init__(self,
+                 terms: Sequence[str],
+                 offsets: np.ndarray,
+                 postings: np.ndarray,
+                 frequencies: np.ndarray,
+                 doc_lengths: np.ndarray,
+                 ids: Sequence[str],
+                 k1: float = 1.2,
+                 b: float = 0.75):
+        self.ids = list(ids)
+        self._vocabulary = {term: i for i, term in enumerate(terms)}
+        self._terms = list(terms)
+        self._offsets = offsets
+        self._postings = postings
+        self._frequencies = frequencies
+        self._doc_lengths = doc_lengths
+        self._k1 = k1
+        # Per-document part of the BM25 denominator, precomputed once.
+        average_length = float(doc_lengths.mean()) if len(doc_lengths) else 1.0
+        self._length_norm = (k1 * (1 - b + b * doc_lengths / average_length)).astype(np.float32)
+        n = len(self.ids)
+        df = np.diff(offsets)
+        self._idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    @classmethod
+    def build(cls, documents: Iterable[Tuple[str, str]]) -> "BM25Index":
+        """
+        Args:
+            documents: ``(chunk_id, text)`` pairs.
+        """
+        ids: List[str] = []
+        doc_lengths: List[int] = []
+        term_postings = defaultdict(list)
+        for row, (chunk_id, text) in enumerate(documents):
+            counts = Counter(tokenize(text))
+            ids.append(chunk_id)
+            doc_lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                term_postings[term].append((row, min(count, 65535)))
+
+        terms = sorted(term_postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(term_postings[t]) for t in terms])
+        flat = [posting for term in terms for posting in term_postings[term]]
+        postings = np.fromiter((row for row, _ in flat), dtype=np.int32, count=len(flat))
+        frequencies = np.fromiter((count for _, count in flat), dtype=np.uint16, count=len(flat))
+        return cls(terms, offsets, postings, frequencies, np.asarray(doc_lengths, dtype=np.int32), ids)
+
+    def save(self, path: Path) -> None:
+        with path.open("wb") as fh:
+            np.savez(
+                fh,
+                terms=np.asarray(self._terms, dtype=str),
+                offsets=self._offsets,
+                postings=self._postings,
+                frequencies=self._frequencies,
+                doc_lengths=self._doc_lengths,
+                ids=np.asarray(self.ids, dtype=str),
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["terms"].tolist(), data["offsets"], data["postings"], data["frequencies"],
+                       data["doc_lengths"], data["ids"].tolist())
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Returns up to ``k`` ``(chunk_id, score)`` pairs with a positive BM25 score.
+        """
+        term_ids = {self._vocabulary[t] for t in tokenize(query) if t in self._vocabulary}
+        if not term_ids or not len(self):
+            return []
+
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            rows = self._postings[start:end]
+            tf = self._frequencies[start:end].astype(np.float32)
+            scores[rows] += self._idf[term_id] * tf * (self._k1 + 1) / (tf + self._length_norm[rows])
+
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[row], float(scores[row])) for row in top]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """
+    Merges ranked id lists by summing ``1 / (k + rank)``; best first.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] += 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
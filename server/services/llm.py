@@ -1,12 +1,22 @@
-from langchain_deepseek import ChatDeepSeek
+from langchain_core.language_models import BaseChatModel
 from core.config import get_settings
+from services.admission import FairLimiter
 from functools import lru_cache
 
 
 @lru_cache
-def get_llm() -> ChatDeepSeek:
+def get_llm_slots() -> FairLimiter:
     settings = get_settings()
-    return ChatDeepSeek(
+    return FairLimiter(settings.llm_max_concurrency, settings.llm_max_queue)
+
+
+@lru_cache
+def get_llm() -> BaseChatModel:
+    # The DeepSeek client (and the OpenAI SDK under it) loads with the pipeline, off the import path.
+    from services.deepseek import BoundedChatDeepSeek
+
+    settings = get_settings()
+    return BoundedChatDeepSeek(
         model="deepseek-chat",
         api_key=settings.deepseek_api_key,
         temperature=0.2,
@@ -0,0 +1,228 @@
+"""
+Low-overhead pipeline instrumentation: Prometheus counters and histograms,
+per-request traces and a sampled dump of slow requests.
+
+Recording a stage costs two ``perf_counter`` calls, a bisect and a few
+increments under a lock, so it stays on in production. Kept free of server
+configuration; the settings are passed in by the callers.
+"""
+import asyncio
+import json
+import random
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds: sub-millisecond vector math up to multi-second LLM generations.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = Lock()
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._lock = Lock()
+        # labels -> (per-bucket counts, the last one for +Inf; sum)
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} "
+                                 f"{cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total[0])}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("fice_rag_stage_seconds", "Time spent in each RAG pipeline stage.")
+REQUEST_SECONDS = Histogram("fice_rag_request_seconds", "End-to-end RAG pipeline time per request.")
+REQUESTS = Counter("fice_rag_requests_total", "RAG pipeline runs by outcome.")
+RETRIEVED_CHUNKS = Histogram("fice_rag_retrieved_chunks", "Chunks passed to the answer prompt.", COUNT_BUCKETS)
+CONTEXT_TOKENS = Histogram("fice_rag_context_tokens", "Estimated tokens of retrieved context per prompt.",
+                           TOKEN_BUCKETS)
+PROMPT_TOKENS = Histogram("fice_rag_prompt_tokens", "Estimated tokens of the whole answer prompt.", TOKEN_BUCKETS)
+
+_METRICS = [STAGE_SECONDS, REQUEST_SECONDS, REQUESTS, RETRIEVED_CHUNKS, CONTEXT_TOKENS, PROMPT_TOKENS]
+# ``(name, type, help, {labels: value})``, type being "gauge" or "counter".
+Sample = Tuple[str, str, str, Dict[Labels, float]]
+# Each returns the samples read at scrape time.
+_collectors: List[Callable[[], List[Sample]]] = []
+
+
+def register(metric) -> None:
+    _METRICS.append(metric)
+
+
+def register_collector(collector: Callable[[], List[Sample]]) -> None:
+    _collectors.append(collector)
+
+
+def render() -> str:
+    """The Prometheus text exposition format (0.0.4) of every metric."""
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        for name, kind, help_text, samples in collector():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}"
+                         for labels, value in samples.items())
+    return "\n".join(lines) + "\n"
+
+
+@dataclass
+class RequestTrace:
+    """Stages of one pipeline run, kept for the slow-request dump."""
+
+    started: float = field(default_factory=time.perf_counter)
+    spans: List[Tuple[str, float, float]] = field(default_factory=list)
+    attributes: Dict[str, object] = field(default_factory=dict)
+
+    def add(self, name: str, start: float, seconds: float) -> None:
+        self.spans.append((name, round((start - self.started) * 1000, 3), round(seconds * 1000, 3)))
+
+    def to_dict(self, total: float) -> dict:
+        return {
+            "total_ms": round(total * 1000, 3),
+            "spans": [{"stage": name, "start_ms": start, "duration_ms": duration}
+                      for name, start, duration in self.spans],
+            **self.attributes,
+        }
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("fice_rag_trace", default=None)
+
+
+def record_stage(name: str, start: float, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, start, seconds)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, start, time.perf_counter() - start)
+
+
+def annotate(**attributes: object) -> None:
+    """Adds attributes (chunk counts, token sizes...) to the current request's trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+class SlowTraceDump:
+    """
+    Appends the trace of requests slower than ``threshold_ms`` as JSON lines to
+    ``path``, for a ``sample_rate`` share of them.
+    """
+
+    def __init__(self, path: Path, threshold_ms: float, sample_rate: float):
+        self._path = path
+        self._threshold = threshold_ms / 1000
+        self._sample_rate = sample_rate
+        self._lock = Lock()
+
+    def offer(self, trace: RequestTrace, total: float) -> None:
+        if total < self._threshold or random.random() >= self._sample_rate:
+            return
+        line = json.dumps({"time": time.time(), **trace.to_dict(total)}, ensure_ascii=False)
+        with self._lock, self._path.open("a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+
+
+@contextmanager
+def request_trace(dump: Optional[SlowTraceDump] = None) -> Iterator[RequestTrace]:
+    """
+    Times one pipeline run: records the request histogram and its outcome, and
+    collects its stages for ``dump``. The outcome defaults to ``answered``;
+    set ``trace.attributes["outcome"]`` to override it.
+    """
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    outcome = "error"
+    try:
+        yield trace
+        outcome = str(trace.attributes.get("outcome", "answered"))
+    except (asyncio.CancelledError, GeneratorExit):
+        # The client went away mid-request or mid-stream.
+        outcome = "cancelled"
+        raise
+    finally:
+        total = time.perf_counter() - trace.started
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # An async generator closed from another context; the variable dies with it.
+            pass
+        REQUEST_SECONDS.observe(total)
+        REQUESTS.inc(outcome=outcome)
+        trace.attributes["outcome"] = outcome
+        if dump is not None:
+            dump.offer(trace, total)
@@ -0,0 +1,214 @@
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from services.metrics import stage
+
+# The index snapshot: written by the indexer next to the collection (or
+# exported from Chroma by the server) and memory-mapped by every worker.
+# Each save goes to its own subdirectory; CURRENT_FILE names the published one.
+NUMPY_INDEX_DIR = "numpy_index"
+CURRENT_FILE = "CURRENT"
+VECTORS_FILE = "vectors.npy"
+META_FILE = "meta.json"
+# Superseded snapshots kept for workers that read CURRENT just before a swap.
+KEEP_SNAPSHOTS = 2
+# Optional copy of the ONNX embedding model inside the snapshot.
+SNAPSHOT_ONNX_DIR = "onnx"
+
+
+class NumpyVectorIndex:
+    """
+    The whole collection as one contiguous float32 matrix of unit vectors plus
+    parallel ``ids`` / ``texts`` / ``metadatas`` lists.
+
+    Scoring is a single matrix-vector product (cosine similarity); MMR re-ranks
+    the top ``fetch_k`` candidates with vectorized updates.
+    """
+
+    def __init__(self,
+                 vectors: np.ndarray,
+                 ids: List[str],
+                 texts: List[str],
+                 metadatas: List[Dict[str, Any]],
+                 version: str = ""):
+        self.vectors = vectors
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.version = version
+        self._rows_by_id: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_chroma(cls, vectordb, version: str = "") -> "NumpyVectorIndex":
+        data = vectordb.get(include=["embeddings", "documents", "metadatas"])
+        vectors = np.asarray(data["embeddings"], dtype=np.float32).reshape(len(data["ids"]), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+        return cls(vectors, list(data["ids"]), list(data["documents"]),
+                   [m or {} for m in data["metadatas"]], version)
+
+    def save(self, directory: Path) -> None:
+        """
+        Writes the vectors and metadata into a new subdirectory, then publishes
+        it by atomically replacing ``CURRENT``. Readers follow ``CURRENT`` to
+        one complete pair of files, never new vectors with old metadata.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"{self.version or 'unversioned'}-{uuid.uuid4().hex[:8]}"
+        snapshot = directory / name
+        snapshot.mkdir()
+        with (snapshot / VECTORS_FILE).open("wb") as fh:
+            np.save(fh, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        with (snapshot / META_FILE).open("w", encoding="utf-8") as fh:
+            json.dump({"version": self.version, "rows": len(self.ids), "ids": self.ids, "texts": self.texts,
+                       "metadatas": self.metadatas}, fh, ensure_ascii=False)
+
+        tmp = directory / f"{CURRENT_FILE}.{os.getpid()}.tmp"
+        tmp.write_text(json.dumps({"version": self.version, "directory": name}), encoding="utf-8")
+        os.replace(tmp, directory / CURRENT_FILE)
+        _prune(directory, name)
+
+    @classmethod
+    def load(cls, directory: Path) -> "NumpyVectorIndex":
+        current = _read_current(directory)
+        if current is None:
+            raise FileNotFoundError(directory / CURRENT_FILE)
+        snapshot = directory / current["directory"]
+        vectors = np.load(snapshot / VECTORS_FILE, mmap_mode="r")
+        with (snapshot / META_FILE).open(encoding="utf-8") as fh:
+            meta = json.load(fh)
+        if meta.get("rows") != len(meta["ids"]) or vectors.shape[0] != len(meta["ids"]) \
+                or meta.get("version") != current["version"]:
+            raise ValueError(f"Index snapshot {snapshot} is inconsistent: {vectors.shape[0]} vectors, "
+                             f"{len(meta['ids'])} ids, version {meta.get('version')} for {current['version']}")
+        return cls(vectors, meta["ids"], meta["texts"], meta["metadatas"], meta.get("version", ""))
+
+    @staticmethod
+    def stored_version(directory: Path) -> Optional[str]:
+        current = _read_current(directory)
+        return current["version"] if current is not None else None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def mmr(self,
+            query: np.ndarray,
+            k: int,
+            fetch_k: int,
+            lambda_mult: float,
+            score_threshold: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        Returns ``(row, similarity)`` pairs for up to ``k`` rows picked by
+        maximal marginal relevance among the ``fetch_k`` most similar rows
+        whose cosine similarity reaches ``score_threshold``.
+        """
+        candidates, relevance = self.search(query, fetch_k, score_threshold)
+        return self.rerank(candidates, relevance, k, lambda_mult)
+
+    def search(self,
+               query: np.ndarray,
+               fetch_k: int,
+               score_threshold: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """The ``fetch_k`` most similar rows above ``score_threshold`` and their similarities, best first."""
+        if not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        scores = self.vectors @ query
+
+        fetch_k = min(fetch_k, len(scores))
+        candidates = np.argpartition(-scores, fetch_k - 1)[:fetch_k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        if score_threshold is not None:
+            candidates = candidates[scores[candidates] >= score_threshold]
+        return candidates, scores[candidates]
+
+    def rerank(self,
+               candidates: np.ndarray,
+               relevance: np.ndarray,
+               k: int,
+               lambda_mult: float) -> List[Tuple[int, float]]:
+        """Picks up to ``k`` of the ``search`` candidates by maximal marginal relevance."""
+        if not len(candidates):
+            return []
+        candidate_vectors = self.vectors[candidates]
+        redundancy = candidate_vectors @ candidate_vectors.T
+
+        selected = [0]
+        max_redundancy = redundancy[0].copy()
+        available = np.ones(len(candidates), dtype=bool)
+        available[0] = False
+        while len(selected) < min(k, len(candidates)):
+            mmr_scores = lambda_mult * relevance - (1 - lambda_mult) * max_redundancy
+            mmr_scores[~available] = -np.inf
+            best = int(np.argmax(mmr_scores))
+            selected.append(best)
+            available[best] = False
+            np.maximum(max_redundancy, redundancy[best], out=max_redundancy)
+
+        return [(int(candidates[i]), float(relevance[i])) for i in selected]
+
+    def document(self, row: int) -> Document:
+        return Document(page_content=self.texts[row], metadata=self.metadatas[row], id=self.ids[row])
+
+    def documents_by_id(self, ids: List[str]) -> List[Document]:
+        if self._rows_by_id is None:
+            self._rows_by_id = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        return [self.document(self._rows_by_id[i]) for i in ids if i in self._rows_by_id]
+
+
+def _read_current(directory: Path) -> Optional[dict]:
+    try:
+        return json.loads((directory / CURRENT_FILE).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+def _prune(directory: Path, published: str) -> None:
+    """Removes all but the newest ``KEEP_SNAPSHOTS`` snapshots, never the published one."""
+    snapshots = sorted((path for path in directory.iterdir()
+                        if path.name != published and (path / META_FILE).is_file()),
+                       key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in snapshots[KEEP_SNAPSHOTS - 1:]:
+        # Workers that mapped these files keep their pages until they reload.
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class NumpyMMRRetriever(BaseRetriever):
+    """LangChain retriever over a ``NumpyVectorIndex`` with the same knobs as Chroma's MMR."""
+
+    index: Any
+    embeddings: Embeddings
+    k: int = 5
+    fetch_k: int = 50
+    lambda_mult: float = 0.5
+    score_threshold: Optional[float] = None
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        with stage("embed_query"):
+            vector = self.embeddings.embed_query(query)
+        return self._search(vector)
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        with stage("embed_query"):
+            vector = await self.embeddings.aembed_query(query)
+        return self._search(vector)
+
+    def _search(self, vector: List[float]) -> List[Document]:
+        with stage("vector_search"):
+            candidates, relevance = self.index.search(np.asarray(vector, dtype=np.float32), self.fetch_k,
+                                                      self.score_threshold)
+        with stage("mmr"):
+            hits = self.index.rerank(candidates, relevance, self.k, self.lambda_mult)
+        return [self.index.document(row) for row, _ in hits]
@@ -0,0 +1,102 @@
+"""
+int8-quantized ONNX Runtime version of the MiniLM sentence embedder.
+
+Produces the same mean-pooled vectors as ``HuggingFaceEmbeddings`` for
+``paraphrase-multilingual-MiniLM-L12-v2`` without importing torch at runtime.
+Export once (needs torch and transformers, e.g. on the indexing machine):
+
+    python -m services.onnx_embeddings --out ../models/minilm-onnx-int8
+"""
+import argparse
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+MODEL_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+MAX_SEQ_LENGTH = 128
+
+
+class OnnxEmbeddings(Embeddings):
+    def __init__(self, model_dir: str, batch_size: int = 32, intra_op_threads: int = 0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        self._batch_size = batch_size
+        self._tokenizer = Tokenizer.from_file(str(model_dir / TOKENIZER_FILE))
+        self._tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self._tokenizer.enable_padding(pad_id=self._tokenizer.token_to_id("<pad>"), pad_token="<pad>")
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = onnxruntime.InferenceSession(
+            str(model_dir / MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for i in range(0, len(texts), self._batch_size):
+            vectors.extend(self._embed(texts[i:i + self._batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        token_embeddings = self._session.run(
+            None, {"input_ids": input_ids, "attention_mask": attention_mask}
+        )[0]
+        # Mean pooling over non-padding tokens, as the sentence-transformers model does.
+        mask = attention_mask[..., None].astype(np.float32)
+        return (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+def export(model_name: str, out_dir: str) -> Path:
+    """
+    Exports ``model_name`` to ONNX, quantizes its weights to int8 and saves the
+    fast tokenizer next to it.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["Приклад речення"], return_tensors="pt")
+    float_path = out / "model.onnx"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            str(float_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["token_embeddings"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "token_embeddings": {0: "batch", 1: "sequence"},
+            },
+            opset_version=17,
+        )
+    quantize_dynamic(str(float_path), str(out / MODEL_FILE), weight_type=QuantType.QInt8)
+    float_path.unlink()
+    tokenizer.backend_tokenizer.save(str(out / TOKENIZER_FILE))
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedder to int8 ONNX")
+    parser.add_argument("--model", default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    print(f"Exported to {export(args.model, args.out)}")
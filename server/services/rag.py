@@ -1,31 +1,128 @@
+import logging
+import time
 from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+from uuid import UUID
 
-from langchain.prompts import ChatPromptTemplate
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains.history_aware_retriever import create_history_aware_retriever
-from langchain.chains.retrieval import create_retrieval_chain
-from langchain_core.globals import set_debug
-from langchain_core.prompts import PromptTemplate
+from langchain_core.callbacks import (
+    AsyncCallbackHandler,
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable
 
+from core.config import get_settings
 from core.prompt import SYSTEM_PROMPT
-from services.llm import get_llm
-from services.vectorstore import get_vectordb
+from services.answer_cache import SemanticAnswerCache, get_answer_cache
+from services.condense import QuestionCondenser
+from services.context_packing import DOCUMENT_TEMPLATE, pack_context
+from services.embeddings import get_embeddings
+from services.faq import FaqStore, QuestionLog, get_faq_store, normalize_question
+from services.llm import get_llm, get_llm_slots
+from services.lexical import reciprocal_rank_fusion
+from services.metrics import (
+    CONTEXT_TOKENS,
+    PROMPT_TOKENS,
+    RETRIEVED_CHUNKS,
+    SlowTraceDump,
+    annotate,
+    record_stage,
+    request_trace,
+    stage,
+)
+from services.numpy_index import NumpyMMRRetriever
+from services.single_flight import SingleFlight
+from services.tokens import estimate_tokens
+from services.vectorstore import get_index_version, get_lexical_index, get_vector_index, get_vectordb
 
-set_debug(True)
 
-def get_qa_chain():
-    llm = get_llm()
-    vectordb = get_vectordb()
-    retriever = vectordb.as_retriever(
-        search_type="mmr",
-        search_kwargs={
-            "fetch_k": 50,
-            "k": 5,
-            "lambda_mult": 0.3,
-            "score_threshold": 0.2
-        }
+logger = logging.getLogger(__name__)
+
+
+def _today() -> str:
+    return datetime.now().strftime("%d.%m.%Y")
+
+
+MMR_SEARCH_KWARGS = {
+    "fetch_k": 50,
+    "k": 5,
+    "lambda_mult": 0.3,
+    "score_threshold": 0.2
+}
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses the dense (MMR) results with BM25 hits by reciprocal rank fusion, so
+    exact tokens such as specialty codes or department acronyms are not lost.
+    """
+
+    dense: BaseRetriever
+    lexical: Any
+    lookup: Callable[[List[str]], List[Document]]
+    k: int = 5
+    lexical_k: int = 5
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self._fuse(self.dense.invoke(query), query)
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        return self._fuse(await self.dense.ainvoke(query), query)
+
+    def _fuse(self, dense_docs: List[Document], query: str) -> List[Document]:
+        with stage("lexical_search"):
+            lexical_ids = [chunk_id for chunk_id, _ in self.lexical.search(query, self.lexical_k)]
+        docs = {doc.id: doc for doc in dense_docs}
+        fused = reciprocal_rank_fusion([list(docs), lexical_ids], k=self.rrf_k)[:self.k]
+        missing = [chunk_id for chunk_id in fused if chunk_id not in docs]
+        if missing:
+            docs.update((doc.id, doc) for doc in self.lookup(missing))
+        return [docs[chunk_id] for chunk_id in fused if chunk_id in docs]
+
+
+def build_retriever() -> BaseRetriever:
+    settings = get_settings()
+    if settings.vector_index == "numpy":
+        index = get_vector_index()
+        dense = NumpyMMRRetriever(
+            index=index,
+            embeddings=get_embeddings(),
+            **MMR_SEARCH_KWARGS,
+        )
+        lookup = index.documents_by_id
+    else:
+        # Chroma's MMR search ignores score_threshold.
+        vectordb = get_vectordb()
+        dense = vectordb.as_retriever(
+            search_type="mmr",
+            search_kwargs=MMR_SEARCH_KWARGS,
+        )
+        lookup = vectordb.get_by_ids
+
+    lexical = get_lexical_index()
+    if not settings.hybrid_search or lexical is None:
+        return dense
+    return HybridRetriever(
+        dense=dense,
+        lexical=lexical,
+        lookup=lookup,
+        k=MMR_SEARCH_KWARGS["k"],
+        lexical_k=settings.lexical_k,
     )
 
+
+def build_condense_chain(llm) -> Runnable:
     history_prompt = ChatPromptTemplate.from_messages([
         ("system",
          "Ти асистент, який переформульовує останнє питання, враховуючи "
@@ -33,20 +130,350 @@ def get_qa_chain():
         ("user", "{chat_history}"),
         ("user", "{input}")
     ])
+    return history_prompt | llm | StrOutputParser()
 
-    history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, history_prompt
-    )
+
+def build_doc_chain(llm, date: str) -> Runnable:
+    # Pulls in the whole ``langchain`` package: imported when the pipeline is built, not with the app.
+    from langchain.chains.combine_documents import create_stuff_documents_chain
 
     answer_prompt = ChatPromptTemplate.from_messages([
         ("system", SYSTEM_PROMPT),
         ("user", "{input}")
-    ]).partial(date=datetime.now().strftime("%d.%m.%Y"))
+    ]).partial(date=date)
+
+    return create_stuff_documents_chain(llm,
+                                        answer_prompt,
+                                        document_prompt=PromptTemplate.from_template(DOCUMENT_TEMPLATE))
+
+
+class _GenerationTimer(AsyncCallbackHandler):
+    """
+    Splits the answer chain's time into prompt assembly, time to first token
+    (streaming only) and generation, and measures the prompt size.
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._prompt_ready: Optional[float] = None
+        self._first_token = False
+
+    async def on_chat_model_start(self, serialized: dict, messages: List[List[BaseMessage]], *,
+                                  run_id: UUID, **kwargs: Any) -> None:
+        self._prompt_ready = time.perf_counter()
+        record_stage("prompt", self._start, self._prompt_ready - self._start)
+        prompt_tokens = sum(estimate_tokens(str(m.content)) for batch in messages for m in batch)
+        PROMPT_TOKENS.observe(prompt_tokens)
+        annotate(prompt_tokens=prompt_tokens)
+
+    async def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        if not self._first_token and self._prompt_ready is not None:
+            self._first_token = True
+            record_stage("llm_first_token", self._prompt_ready, time.perf_counter() - self._prompt_ready)
+
+    async def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        if self._prompt_ready is not None:
+            record_stage("llm_generate", self._prompt_ready, time.perf_counter() - self._prompt_ready)
+
+
+def _flight_key(inputs: dict) -> tuple:
+    """Requests that only differ in case, spacing or final punctuation get the same answer."""
+    question = normalize_question(inputs["input"])
+    history = tuple(tuple(turn) for turn in inputs.get("chat_history") or ())
+    return question, history
+
+
+class RagPipeline:
+    """
+    Condense (only when needed) → (mined FAQ) → (answer cache) → retrieve → generate.
+
+    Accepts the same ``{"input", "chat_history"}`` inputs as the LangChain
+    retrieval chain it replaces and returns/streams dicts with an ``answer``
+    key, so callers can treat it as that chain. The condensed question is
+    reported under ``standalone`` (first chunk when streaming).
+
+    Retrieved chunks are packed into at most ``context_budget`` tokens
+    (0 keeps them as retrieved). With ``coalesce``, concurrent requests with
+    the same question and history share one run. Every stage is timed into
+    ``services.metrics``; runs slower than the configured threshold are
+    sampled into ``trace_dump``.
+    """
+
+    def __init__(self,
+                 retriever: BaseRetriever,
+                 condenser: QuestionCondenser,
+                 doc_chain: Runnable,
+                 date: str,
+                 cache: Optional[SemanticAnswerCache] = None,
+                 trace_dump: Optional[SlowTraceDump] = None,
+                 context_budget: int = 0,
+                 coalesce: bool = False,
+                 faq: Optional[FaqStore] = None,
+                 question_log: Optional[QuestionLog] = None):
+        self.retriever = retriever
+        self.condenser = condenser
+        self.doc_chain = doc_chain
+        self.date = date
+        self.cache = cache
+        self.trace_dump = trace_dump
+        self.context_budget = context_budget
+        self.flights: Optional[SingleFlight] = SingleFlight() if coalesce else None
+        # Like the cache (keyed on the date too), FAQ answers only hold for the date they were generated with.
+        if faq is not None and faq.date != date:
+            logger.warning("FAQ answers were generated for %s, not %s; re-run jobs.mine_faq", faq.date, date)
+            faq = None
+        self.faq = faq
+        self.question_log = question_log
+
+    def with_date(self, llm, date: str, faq: Optional[FaqStore]) -> "RagPipeline":
+        return RagPipeline(self.retriever, self.condenser, build_doc_chain(llm, date), date, self.cache,
+                           self.trace_dump, self.context_budget, self.flights is not None, faq,
+                           self.question_log)
+
+    async def ainvoke(self, inputs: dict) -> dict:
+        if self.flights is None:
+            return await self._ainvoke(inputs)
+        result = await self.flights.call(("invoke", *_flight_key(inputs)), lambda: self._ainvoke(inputs), "invoke")
+        # Shared by every coalesced caller.
+        return dict(result)
+
+    async def astream(self, inputs: dict) -> AsyncIterator[dict]:
+        if self.flights is None:
+            chunks = self._astream(inputs)
+        else:
+            chunks = self.flights.stream(("stream", *_flight_key(inputs)), lambda: self._astream(inputs), "stream")
+        async for chunk in chunks:
+            yield chunk
+
+    async def _ainvoke(self, inputs: dict) -> dict:
+        with request_trace(self.trace_dump) as trace:
+            standalone, shareable = await self._condense(inputs)
+            ready, outcome, vector = await self._ready_answer(standalone, shareable)
+            if ready is not None:
+                trace.attributes["outcome"] = outcome
+                return {"answer": ready, "context": [], "standalone": standalone}
+
+            docs = await self._retrieve(standalone)
+            answer = await self.doc_chain.ainvoke({**inputs, "context": docs},
+                                                  config={"callbacks": [_GenerationTimer()]})
+            self._cache_store(standalone, vector, answer)
+            return {"answer": answer, "context": docs, "standalone": standalone}
+
+    async def _astream(self, inputs: dict) -> AsyncIterator[dict]:
+        with request_trace(self.trace_dump) as trace:
+            standalone, shareable = await self._condense(inputs)
+            yield {"standalone": standalone}
+            ready, outcome, vector = await self._ready_answer(standalone, shareable)
+            if ready is not None:
+                trace.attributes["outcome"] = outcome
+                yield {"answer": ready}
+                return
+
+            docs = await self._retrieve(standalone)
+            answer = ""
+            async for token in self.doc_chain.astream({**inputs, "context": docs},
+                                                      config={"callbacks": [_GenerationTimer()]}):
+                answer += token
+                yield {"answer": token}
+            self._cache_store(standalone, vector, answer)
+
+    async def _condense(self, inputs: dict) -> Tuple[str, bool]:
+        with stage("condense"):
+            standalone, shareable = await self.condenser.acondense_turn(inputs)
+        annotate(question=standalone[:200])
+        if shareable and self.question_log is not None:
+            self.question_log.record(standalone)
+        return standalone, shareable
+
+    async def _retrieve(self, standalone: str) -> List[Document]:
+        with stage("retrieve"):
+            docs = await self.retriever.ainvoke(standalone)
+        RETRIEVED_CHUNKS.observe(len(docs))
+        annotate(chunks=len(docs))
+        if self.context_budget > 0:
+            with stage("pack_context"):
+                docs = pack_context(docs, self.context_budget)
+        context_tokens = sum(estimate_tokens(doc.page_content) for doc in docs)
+        CONTEXT_TOKENS.observe(context_tokens)
+        annotate(sources=len(docs), context_tokens=context_tokens)
+        return docs
+
+    async def _ready_answer(self, standalone: str,
+                            shareable: bool) -> Tuple[Optional[str], Optional[str], Optional[list[float]]]:
+        """
+        A mined FAQ answer or a cached one, which of the two (``faq`` or
+        ``cached``), and the question's embedding if one was needed.
+
+        A question asked after earlier turns and not rewritten may mean
+        something else in another chat ("Скільки це коштує?"): it neither
+        reads nor, without a vector, feeds the shared FAQ and cache.
+        """
+        if not shareable:
+            return None, None, None
+        if self.faq is not None:
+            with stage("faq_lookup"):
+                answer = self.faq.exact(standalone)
+            if answer is not None:
+                return answer, "faq", None
+
+        vector = await self._query_vector(standalone)
+        if self.faq is not None and vector is not None:
+            with stage("faq_lookup"):
+                answer = self.faq.nearest(standalone, vector)
+            if answer is not None:
+                return answer, "faq", vector
+
+        answer = self._cache_lookup(standalone, vector)
+        return answer, "cached" if answer is not None else None, vector
+
+    async def _query_vector(self, standalone: str) -> Optional[list[float]]:
+        if self.cache is None and self.faq is None:
+            return None
+        with stage("embed_query"):
+            return await get_embeddings().aembed_query(standalone)
+
+    def _cache_version(self) -> str:
+        return f"{get_index_version()}@{self.date}"
+
+    def _cache_lookup(self, standalone: str, vector: Optional[list[float]]) -> Optional[str]:
+        if self.cache is None or vector is None:
+            return None
+        with stage("cache_lookup"):
+            return self.cache.lookup(standalone, vector, self._cache_version())
+
+    def _cache_store(self, standalone: str, vector: Optional[list[float]], answer: str) -> None:
+        if self.cache is not None and vector is not None and answer:
+            self.cache.store(standalone, vector, answer, self._cache_version())
+
+
+def build_trace_dump() -> Optional[SlowTraceDump]:
+    settings = get_settings()
+    if settings.slow_trace_ms <= 0:
+        return None
+    return SlowTraceDump(Path(settings.slow_trace_file), settings.slow_trace_ms, settings.slow_trace_sample_rate)
+
+
+def build_question_log() -> Optional[QuestionLog]:
+    settings = get_settings()
+    return QuestionLog(Path(settings.question_log_file)) if settings.question_log_file else None
+
+
+def build_condenser(llm) -> QuestionCondenser:
+    settings = get_settings()
+    return QuestionCondenser(
+        condense_chain=build_condense_chain(llm),
+        embeddings=get_embeddings(),
+        similarity_threshold=settings.condense_similarity_threshold,
+        memo_size=settings.condense_memo_size,
+    )
+
+
+def get_qa_chain() -> RagPipeline:
+    llm = get_llm()
+    today = _today()
+    return RagPipeline(
+        retriever=build_retriever(),
+        condenser=build_condenser(llm),
+        doc_chain=build_doc_chain(llm, today),
+        date=today,
+        cache=get_answer_cache(),
+        trace_dump=build_trace_dump(),
+        context_budget=get_settings().context_token_budget,
+        coalesce=get_settings().coalesce_requests,
+        faq=get_faq_store(),
+        question_log=build_question_log(),
+    )
+
+
+class ChainRegistry:
+    """
+    Holds the process-wide RAG pipeline.
+
+    The retriever and prompts are built once; only the answer prompt's
+    ``{date}`` partial is rebuilt when the day changes. ``reload`` builds a
+    complete new pipeline aside and swaps it in with a single assignment, so
+    requests in flight keep using the pipeline they started with.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._pipeline: RagPipeline | None = None
+        self.warm_state = "cold"
+        self.warm_seconds: Optional[float] = None
+        self.warm_error: Optional[str] = None
+
+    def get(self) -> RagPipeline:
+        pipeline = self._pipeline
+        if pipeline is None or pipeline.date != _today():
+            pipeline = self._refresh()
+        return pipeline
+
+    def ready_pipeline(self) -> Optional[RagPipeline]:
+        """
+        The current pipeline once warm-up has finished, else None. Never builds
+        one, so monitoring can call it during or after a failed warm-up.
+        """
+        return self._pipeline if self.warm_state == "ready" else None
+
+    def warm(self) -> None:
+        """
+        Builds the pipeline and loads the embedding model, moving ``warm_state``
+        from ``warming`` to ``ready`` (or ``failed``, re-raising the error).
+        """
+        self.warm_state = "warming"
+        start = time.perf_counter()
+        try:
+            self.get()
+            get_embeddings().embed_query("warm-up")
+        except Exception as e:
+            self.warm_state, self.warm_error = "failed", repr(e)
+            raise
+        self.warm_seconds = time.perf_counter() - start
+        self.warm_state = "ready"
+
+    def status(self) -> dict:
+        status = {"status": self.warm_state, "index_version": get_index_version()}
+        if self.warm_seconds is not None:
+            status["warm_seconds"] = round(self.warm_seconds, 3)
+        if self.warm_error is not None:
+            status["error"] = self.warm_error
+        return status
+
+    def reload(self) -> None:
+        get_settings.cache_clear()
+        get_vectordb.cache_clear()
+        get_vector_index.cache_clear()
+        get_lexical_index.cache_clear()
+        get_faq_store.cache_clear()
+        get_llm.cache_clear()
+        # New limits apply to new LLM calls; calls already admitted or queued
+        # release to the limiter they entered, which drains away.
+        get_llm_slots.cache_clear()
+        # Both depend on settings, and cached vectors or answers may come from the old model or index.
+        get_embeddings.cache_clear()
+        get_answer_cache.cache_clear()
+        pipeline = get_qa_chain()
+        with self._lock:
+            self._pipeline = pipeline
+
+    def _refresh(self) -> RagPipeline:
+        with self._lock:
+            today = _today()
+            pipeline = self._pipeline
+            if pipeline is None:
+                pipeline = get_qa_chain()
+            elif pipeline.date != today:
+                # A FAQ re-mined for the new day is picked up with it.
+                get_faq_store.cache_clear()
+                pipeline = pipeline.with_date(get_llm(), today, get_faq_store())
+            self._pipeline = pipeline
+            return pipeline
+
+
+@lru_cache
+def get_chain_registry() -> ChainRegistry:
+    return ChainRegistry()
 
-    doc_chain = create_stuff_documents_chain(llm,
-                                             answer_prompt,
-                                             document_prompt=PromptTemplate.from_template(
-                                                 "Source: {source}. Content:\n{page_content}"))
-    rag_chain = create_retrieval_chain(history_aware_retriever, doc_chain)
 
-    return rag_chain
+def get_chain() -> RagPipeline:
+    return get_chain_registry().get()
@@ -0,0 +1,114 @@
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from threading import Lock
+from typing import List, Optional, Tuple
+
+from core.config import get_settings
+
+SESSION_STORES = ("memory", "redis")
+
+
+@dataclass
+class SessionState:
+    """
+    What the server remembers of a conversation: the last few turns, with each
+    question already rewritten to its standalone form. That is all the
+    condensation step needs for a follow-up.
+    """
+
+    turns: List[Tuple[str, str]] = field(default_factory=list)
+
+    def chain_inputs(self, message: str) -> dict:
+        return {"input": message, "chat_history": list(self.turns)}
+
+    def record(self, standalone: str, answer: str, max_turns: int, answer_chars: int) -> None:
+        # Answers only give the condenser the topic; their head is enough.
+        self.turns.append((standalone, answer[:answer_chars]))
+        del self.turns[:-max_turns]
+
+    def to_json(self) -> str:
+        return json.dumps({"turns": self.turns}, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "SessionState":
+        data = json.loads(raw)
+        return cls([tuple(turn) for turn in data["turns"]])
+
+
+class InMemorySessionStore:
+    """
+    Sessions of this process, least recently used evicted beyond ``max_sessions``,
+    expired ``ttl`` seconds after their last turn.
+    """
+
+    def __init__(self, max_sessions: int, ttl: float):
+        self._max_sessions = max_sessions
+        self._ttl = ttl
+        self._lock = Lock()
+        self._sessions: OrderedDict[str, Tuple[SessionState, float]] = OrderedDict()
+
+    async def get(self, session_id: str) -> Optional[SessionState]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            state, saved_at = entry
+            if time.monotonic() - saved_at > self._ttl:
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return state
+
+    async def save(self, session_id: str, state: SessionState) -> None:
+        with self._lock:
+            self._sessions[session_id] = (state, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self._max_sessions:
+                self._sessions.popitem(last=False)
+
+    async def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        return {"store": "memory", "sessions": len(self._sessions), "max_sessions": self._max_sessions}
+
+
+class RedisSessionStore:
+    """
+    Sessions shared by every worker through a Redis-compatible server
+    (Redis, Valkey, KeyDB...), one JSON value per session with a TTL.
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str = "fice:session:"):
+        from redis.asyncio import Redis
+
+        self._redis = Redis.from_url(url, decode_responses=True)
+        self._ttl = int(ttl)
+        self._prefix = prefix
+
+    async def get(self, session_id: str) -> Optional[SessionState]:
+        raw = await self._redis.get(self._prefix + session_id)
+        return SessionState.from_json(raw) if raw else None
+
+    async def save(self, session_id: str, state: SessionState) -> None:
+        await self._redis.set(self._prefix + session_id, state.to_json(), ex=self._ttl)
+
+    async def delete(self, session_id: str) -> None:
+        await self._redis.delete(self._prefix + session_id)
+
+    def stats(self) -> dict:
+        return {"store": "redis"}
+
+
+@lru_cache
+def get_session_store():
+    settings = get_settings()
+    if settings.session_store == "redis":
+        return RedisSessionStore(settings.session_redis_url, settings.session_ttl)
+    if settings.session_store == "memory":
+        return InMemorySessionStore(settings.session_max_sessions, settings.session_ttl)
+    raise ValueError(f"Unknown session store {settings.session_store!r}, expected one of {SESSION_STORES}")
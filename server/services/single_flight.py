@@ -0,0 +1,110 @@
+"""
+Single-flight execution: concurrent callers with the same key share one run.
+
+The run is a separate task that publishes its chunks to every subscriber;
+late subscribers first get the chunks published so far. A subscriber that
+leaves does not affect the others, and the run is cancelled only when all
+of them have left. An error in the run is raised to every subscriber.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from services.metrics import Counter, register
+
+COALESCED = Counter("fice_rag_coalesced_total", "Requests that joined an identical run already in flight.")
+register(COALESCED)
+
+
+class _Flight:
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: Any) -> None:
+        self.chunks.append(chunk)
+        self._wake()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._wake()
+
+    def _wake(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def follow(self) -> AsyncIterator[Any]:
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.chunks):
+                yield self.chunks[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def stream(self, key: Hashable, run: Callable[[], AsyncIterator[Any]],
+                     label: str = "stream") -> AsyncIterator[Any]:
+        """Chunks of ``run()``, shared with every concurrent caller of the same ``key``."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._run(key, flight, run))
+        else:
+            COALESCED.inc(mode=label)
+
+        flight.subscribers += 1
+        try:
+            async for chunk in flight.follow():
+                yield chunk
+        finally:
+            flight.subscribers -= 1
+            if not flight.subscribers and not flight.done:
+                # Nobody is waiting for the rest: stop paying for it.
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    async def call(self, key: Hashable, run: Callable[[], Awaitable[Any]], label: str = "call") -> Any:
+        """The result of ``await run()``, shared with every concurrent caller of the same ``key``."""
+        async def once() -> AsyncIterator[Any]:
+            yield await run()
+
+        results = self.stream(key, once, label)
+        try:
+            async for result in results:
+                return result
+        finally:
+            await results.aclose()
+
+    async def _run(self, key: Hashable, flight: _Flight, run: Callable[[], AsyncIterator[Any]]) -> None:
+        try:
+            async for chunk in run():
+                flight.publish(chunk)
+        except asyncio.CancelledError:
+            flight.finish(asyncio.CancelledError())
+            raise
+        except Exception as e:
+            flight.finish(e)
+        else:
+            flight.finish()
+        finally:
+            self._forget(key, flight)
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -1,11 +1,28 @@
-from langchain_chroma import Chroma
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+
 from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
 from core.config import get_settings
 from services.embeddings import get_embeddings
+from services.lexical import LEXICAL_INDEX_FILE, BM25Index
+from services.numpy_index import NUMPY_INDEX_DIR, NumpyVectorIndex
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION_FILE = "index_version"
+EXPORT_LOCK_FILE = ".export.lock"
 
 
 @lru_cache
-def get_vectordb() -> Chroma:
+def get_vectordb() -> "Chroma":
+    # chromadb is slow to import; with an up-to-date snapshot the server never opens it.
+    from langchain_chroma import Chroma
+
     settings = get_settings()
 
     return Chroma(
@@ -13,3 +30,67 @@ def get_vectordb() -> Chroma:
         collection_name=settings.chroma_collection,
         embedding_function=get_embeddings(),
     )
+
+
+def get_index_version() -> str:
+    """
+    Version stamp written by ``scraper/index_to_chroma.py`` next to the collection.
+    """
+    settings = get_settings()
+    try:
+        return (Path(settings.chroma_directory) / INDEX_VERSION_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return "unversioned"
+
+
+@lru_cache
+def get_vector_index() -> NumpyVectorIndex:
+    """
+    The collection as an in-process NumPy index.
+
+    Memory-mapped from the snapshot next to the collection, so restarts and
+    sibling workers share the vectors through the OS page cache. The indexer
+    writes the snapshot; one missing or older than the index is exported from
+    Chroma first, by one worker while the others wait for it.
+    """
+    settings = get_settings()
+    directory = Path(settings.chroma_directory) / NUMPY_INDEX_DIR
+    version = get_index_version()
+    if NumpyVectorIndex.stored_version(directory) != version:
+        with _export_lock(directory):
+            # Another worker may have exported it while this one waited.
+            if NumpyVectorIndex.stored_version(directory) != version:
+                logger.warning("No index snapshot for version %s in %s; exporting it from Chroma",
+                               version, directory)
+                NumpyVectorIndex.from_chroma(get_vectordb(), version).save(directory)
+    return NumpyVectorIndex.load(directory)
+
+
+@contextmanager
+def _export_lock(directory: Path):
+    """Exclusive lock across the workers on this host; none where ``fcntl`` is missing (Windows)."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    directory.mkdir(parents=True, exist_ok=True)
+    with (directory / EXPORT_LOCK_FILE).open("a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+@lru_cache
+def get_lexical_index() -> Optional[BM25Index]:
+    """
+    BM25 index written by the indexer next to the collection, or None for an
+    index built before lexical search existed.
+    """
+    settings = get_settings()
+    path = Path(settings.chroma_directory) / LEXICAL_INDEX_FILE
+    if not path.exists():
+        return None
+    return BM25Index.load(path)
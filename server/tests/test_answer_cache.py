@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.runnables import RunnableLambda
+
+import services.rag
+from services.answer_cache import SemanticAnswerCache
+from services.condense import QuestionCondenser
+from services.rag import RagPipeline
+
+# No pronoun or elliptical opener: only the embedding gate could send it to the rewrite.
+FOLLOW_UP = "Скільки разів можна перескладати?"
+
+
+class _NoDocuments:
+    async def ainvoke(self, query):
+        return []
+
+
+def _answer(inputs: dict) -> str:
+    history = inputs["chat_history"]
+    return f"Про «{history[-1][0]}»" if history else f"Про «{inputs['input']}»"
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    embeddings = DeterministicFakeEmbedding(size=32)
+    monkeypatch.setattr(services.rag, "get_embeddings", lambda: embeddings)
+    monkeypatch.setattr(services.rag, "get_index_version", lambda: "test")
+    condenser = QuestionCondenser(
+        condense_chain=RunnableLambda(lambda inputs: pytest.fail("unexpected rewrite")),
+        embeddings=embeddings,
+        # Unrelated fake vectors: the follow-up is judged self-contained.
+        similarity_threshold=0.99,
+        memo_size=0,
+    )
+    cache = SemanticAnswerCache(threshold=0.95, ttl=3600, max_size=16)
+    return RagPipeline(_NoDocuments(), condenser, RunnableLambda(_answer), "01.01.2025", cache=cache)
+
+
+def test_unrewritten_follow_up_skips_the_cache(pipeline):
+    dorm = {"input": FOLLOW_UP, "chat_history": [("Як поселитися в гуртожиток?", "Подайте заяву.")]}
+    tuition = {"input": FOLLOW_UP, "chat_history": [("Скільки коштує контракт?", "Залежить від програми.")]}
+
+    first = asyncio.run(pipeline.ainvoke(dorm))
+    second = asyncio.run(pipeline.ainvoke(tuition))
+
+    assert first["answer"] == "Про «Як поселитися в гуртожиток?»"
+    assert second["answer"] == "Про «Скільки коштує контракт?»"
+    assert pipeline.cache.stats()["size"] == 0
+    assert pipeline.cache.hits == pipeline.cache.misses == 0
+
+
+def test_question_without_history_is_cached(pipeline):
+    inputs = {"input": FOLLOW_UP, "chat_history": []}
+
+    first = asyncio.run(pipeline.ainvoke(inputs))
+    second = asyncio.run(pipeline.ainvoke(inputs))
+
+    assert second["answer"] == first["answer"]
+    assert pipeline.cache.hits == 1
@@ -0,0 +1,39 @@
+import pytest
+
+from bench.fixtures import DIALOGS, QUESTIONS
+from services.condense import looks_like_follow_up
+
+# The turns of the bench dialogs that point back with a pronoun or an elliptical
+# opener. The others ("Які документи треба подати?") only share the topic and
+# are left to the embedding-similarity gate.
+MARKED_FOLLOW_UPS = [
+    "А для магістрів?",
+    "Скільки це коштує?",
+    "А для студентів ІСТ теж так?",
+    "Який для неї потрібен рейтинг?",
+]
+
+
+def test_marked_follow_ups_come_from_the_dialogs():
+    follow_ups = {turn for dialog in DIALOGS for turn in dialog[1:]}
+    assert set(MARKED_FOLLOW_UPS) <= follow_ups
+
+
+@pytest.mark.parametrize("question", MARKED_FOLLOW_UPS + [
+    "Що про нього відомо?",
+    "Скільки йому років?",
+    "Що в ньому вивчають?",
+    "Які бали потрібні для них?",
+    "Хто в ній викладає?",
+    "Як з ним зв'язатися?",
+    "Коли цю заяву подавати?",
+    "А в цій групі?",
+    "What about 126?",
+])
+def test_follow_ups_are_detected(question):
+    assert looks_like_follow_up(question)
+
+
+@pytest.mark.parametrize("question", QUESTIONS)
+def test_self_contained_questions_are_not(question):
+    assert not looks_like_follow_up(question)
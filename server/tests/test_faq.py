@@ -0,0 +1,55 @@
+import asyncio
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.runnables import RunnableLambda
+
+import services.rag
+from services.condense import QuestionCondenser
+from services.faq import FaqStore, QuestionLog
+from services.rag import RagPipeline
+
+TODAY = "01.01.2025"
+QUESTION = "Як поселитися в гуртожиток?"
+
+
+class _NoDocuments:
+    async def ainvoke(self, query):
+        return []
+
+
+def _faq(date: str) -> FaqStore:
+    entry = {"question": QUESTION, "questions": [QUESTION], "count": 5, "answer": "З FAQ", "sources": ["x"]}
+    return FaqStore([entry], np.zeros((1, 32), dtype=np.float32), 0.92, "test", "bench", date)
+
+
+def _pipeline(monkeypatch, faq=None, question_log=None) -> RagPipeline:
+    embeddings = DeterministicFakeEmbedding(size=32)
+    monkeypatch.setattr(services.rag, "get_embeddings", lambda: embeddings)
+    condenser = QuestionCondenser(condense_chain=RunnableLambda(lambda inputs: pytest.fail("unexpected rewrite")),
+                                  embeddings=embeddings, similarity_threshold=0.99, memo_size=0)
+    return RagPipeline(_NoDocuments(), condenser, RunnableLambda(lambda inputs: "Згенеровано"), TODAY,
+                       faq=faq, question_log=question_log)
+
+
+def test_faq_is_served_on_its_own_date(monkeypatch):
+    pipeline = _pipeline(monkeypatch, faq=_faq(TODAY))
+    assert asyncio.run(pipeline.ainvoke({"input": QUESTION, "chat_history": []}))["answer"] == "З FAQ"
+
+
+def test_faq_from_another_date_is_not_served(monkeypatch):
+    pipeline = _pipeline(monkeypatch, faq=_faq("31.12.2024"))
+    assert pipeline.faq is None
+    assert asyncio.run(pipeline.ainvoke({"input": QUESTION, "chat_history": []}))["answer"] == "Згенеровано"
+
+
+def test_question_log_skips_unrewritten_follow_ups(monkeypatch, tmp_path):
+    path = tmp_path / "questions.jsonl"
+    pipeline = _pipeline(monkeypatch, question_log=QuestionLog(path))
+
+    asyncio.run(pipeline.ainvoke({"input": QUESTION, "chat_history": []}))
+    asyncio.run(pipeline.ainvoke({"input": "Скільки разів можна перескладати?",
+                                  "chat_history": [("Коли сесія на бакалавраті?", "У січні.")]}))
+
+    assert QuestionLog.read(path) == [QUESTION]
@@ -0,0 +1,63 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from bench.embedding_backends import cosine_parity
+from bench.fixtures import QUESTIONS, corpus
+from services.embeddings import build_base_embeddings
+from services.onnx_embeddings import MODEL_FILE
+
+# Where ``python -m services.onnx_embeddings --out`` is documented to export the model.
+ONNX_MODEL_DIR = Path(os.getenv("FICE_ONNX_MODEL_DIR") or Path(__file__).parents[2] / "models" / "minilm-onnx-int8")
+
+# int8 dynamic quantization keeps MiniLM's vectors within a few hundredths of torch's.
+MIN_COSINE_MEAN = 0.99
+MIN_COSINE = 0.97
+# Share of questions whose nearest chunk is the same under both backends.
+MIN_TOP1_AGREEMENT = 0.9
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("langchain_huggingface")
+    if not (ONNX_MODEL_DIR / MODEL_FILE).exists():
+        pytest.skip(f"no ONNX export in {ONNX_MODEL_DIR}: python -m services.onnx_embeddings --out {ONNX_MODEL_DIR}")
+    try:
+        reference = build_base_embeddings("torch", str(ONNX_MODEL_DIR))
+    except OSError as exc:
+        pytest.skip(f"reference model not available: {exc}")
+    onnx = build_base_embeddings("onnx", str(ONNX_MODEL_DIR))
+
+    chunks = [text for text, _ in corpus(200)]
+    return {
+        name: (np.asarray(embeddings.embed_documents(chunks)),
+               np.asarray([embeddings.embed_query(question) for question in QUESTIONS]))
+        for name, embeddings in (("torch", reference), ("onnx", onnx))
+    }
+
+
+def test_onnx_vectors_match_torch(vectors):
+    parity = cosine_parity(vectors["torch"][0], vectors["onnx"][0])
+    assert parity["cosine_mean"] >= MIN_COSINE_MEAN, parity
+    assert parity["cosine_min"] >= MIN_COSINE, parity
+
+
+def test_onnx_query_vectors_match_torch(vectors):
+    parity = cosine_parity(vectors["torch"][1], vectors["onnx"][1])
+    assert parity["cosine_mean"] >= MIN_COSINE_MEAN, parity
+    assert parity["cosine_min"] >= MIN_COSINE, parity
+
+
+def test_onnx_retrieves_the_same_nearest_chunk(vectors):
+    def unit(matrix):
+        return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    nearest = {
+        name: np.argmax(unit(queries) @ unit(chunks).T, axis=1)
+        for name, (chunks, queries) in vectors.items()
+    }
+    agreement = float((nearest["torch"] == nearest["onnx"]).mean())
+    assert agreement >= MIN_TOP1_AGREEMENT